@@ -1,21 +1,29 @@
 import os
-import requests
+import time
 import json
+import threading
+import uuid
+from concurrent.futures import CancelledError
+from app.code_context import get_index
+from app.context_builder import ContextBuilder, estimate_tokens
+from app.cycle_recorder import outcome_name
+from app.http_client import get_transport
+from app.llm_cache import LLM_CACHE_PATH, LLMCache, cache_key
 from app.memory import Memory
+from app.metrics import get_metrics
 from app.snapshot import SnapshotManager
 from app.self_improve import SelfImproveEngine
-from app.self_improve_env import SelfImproveEnv
-from stable_baselines3 import PPO
-from stable_baselines3.common.utils import check_for_correct_spaces
 
 MODEL_PATH = "ppo_self_improve.zip"
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+LLM_MODEL = os.getenv("OLLAMA_MODEL", "mistral")
+CODE_BLOCK = "### BEGIN {path}\n{content}\n### END {path}\n"
 
 class Agent:
-    def __init__(self, use_real_llm: bool = False, test_cmd: str = "pytest"):
+    def __init__(self, use_real_llm: bool = False, test_cmd: str = "pytest", cache_path: str = LLM_CACHE_PATH):
         self.use_real_llm = use_real_llm
         if not self.use_real_llm:
-            def stub_ask_llm(prompt: str) -> str:
+            def stub_ask_llm(prompt: str, history_k: int = 0, options: dict = None) -> str:
                 return (
                     "diff --git a/app/__init__.py b/app/__init__.py\n"
                     "index e69de29..e69de29 100644\n"
@@ -24,27 +32,75 @@ class Agent:
                     "@@ -0,0 +1 @@\n"
                     " # no-op patch (stub)\n"
                 )
+            def stub_ask_llm_stream(prompt: str, history_k: int = 0, options: dict = None):
+                yield stub_ask_llm(prompt)
             self.ask_llm = stub_ask_llm
-        self.memory = Memory("memory.db")
+            self.ask_llm_stream = stub_ask_llm_stream
+        self.memory = Memory("memory.db", write_behind=True)
+        self.session_id = uuid.uuid4().hex
+        self.history_k = 3  # past messages pulled into chat prompts
         self.snapshot = SnapshotManager("app", "backups")
-        from app.self_improve import SelfImproveEngine
-        self.improver = SelfImproveEngine(self, use_real_llm=use_real_llm, test_cmd=test_cmd)
-        self.rl_env = SelfImproveEnv(self, use_real_llm=True, max_steps=50)
-        self.policy = None
-        if os.path.isfile("ppo_self_improve.zip"):
-            try:
-                candidate = PPO.load("ppo_self_improve.zip", env=self.rl_env)
-                check_for_correct_spaces(self.rl_env, candidate.observation_space, candidate.action_space)
-                self.policy = candidate
-                print("[Agent] Loaded existing PPO policy.")
-            except Exception as e:
-                print(f"[Agent] Failed to load old PPO policy {e}, starting new training.")
-        self.rl_model = None
+        self.code_index = get_index("app")
+        self.context = ContextBuilder(self.code_index)
+        self.transport = get_transport()
+        self.cancel_event = threading.Event()
+        self._active_responses = set()  # concurrent requests (best-of-K cycles)
+        # Replies of ask_llm keyed by model/prompt/options; an empty path disables it
+        self.llm_cache = LLMCache(cache_path) if cache_path and use_real_llm else None
+        self.metrics = get_metrics()
+        self.improver = SelfImproveEngine(self, use_real_llm=use_real_llm, test_cmd=test_cmd, metrics=self.metrics)
+        self.temperature = 0.5
+        # The RL env and PPO policy (stable_baselines3/torch) are only needed for
+        # self-improve cycles, so they are built on first use instead of here.
+        self._rl_env = None
+        self._policy = None
+        self._policy_loaded = False
+        self._rl_lock = threading.Lock()
+
+    @property
+    def rl_env(self):
+        """The :class:`SelfImproveEnv` driving temperature choice, built on first use."""
+        with self._rl_lock:
+            if self._rl_env is None:
+                from app.self_improve_env import SelfImproveEnv
+                self._rl_env = SelfImproveEnv(self, use_real_llm=True, max_steps=50)
+            return self._rl_env
+
+    @property
+    def policy(self):
+        """The PPO policy from ``MODEL_PATH``, loaded once on first use (None if unavailable)."""
+        if not self._policy_loaded:
+            env = self.rl_env
+            with self._rl_lock:
+                if not self._policy_loaded:
+                    self._policy = self._load_policy(env)
+                    self._policy_loaded = True
+        return self._policy
+
+    def _load_policy(self, env):
         path = os.path.join(os.getcwd(), MODEL_PATH)
-        if os.path.isfile(path):
-            self.rl_model = PPO.load(path)
-        else:
-            self.rl_model = None
+        if not os.path.isfile(path):
+            return None
+        try:
+            from stable_baselines3 import PPO
+            from stable_baselines3.common.utils import check_for_correct_spaces
+            candidate = PPO.load(path, env=env)
+            check_for_correct_spaces(env, candidate.observation_space, candidate.action_space)
+            print("[Agent] Loaded existing PPO policy.")
+            return candidate
+        except Exception as e:
+            print(f"[Agent] Failed to load old PPO policy {e}, starting new training.")
+            return None
+
+    def choose_temperature(self) -> float:
+        """Let the PPO policy pick the sampling temperature for the next cycle."""
+        if self.policy is None:
+            return 0.5
+        obs, _ = self.rl_env.reset()  # fresh obs [last_reward, pending, progress]
+        action, _ = self.policy.predict(obs, deterministic=False)
+        temperature = float(action[0])
+        print(f"[RL] Chosen temperature: {temperature:.3f}")
+        return temperature
 
     def get_features(self):
         session = self.memory.Session()
@@ -52,105 +108,205 @@ class Agent:
         session.close()
         return [(r.id, r.description) for r in rows]
     
+    def count_features(self, refresh: bool = False) -> int:
+        """
+        Pending feature count from Memory's maintained counter (no table scan).
+        ``refresh=True`` re-reads it to include other processes' writes.
+        """
+        return self.memory.count_features(refresh=refresh)
+
     def delete_feature(self, feature_id):
         """Called by the GUI to remove a stored feature."""
         self.memory.delete_feature(feature_id)
 
 
+    def cancel(self):
+        """
+        Abort the in-flight request from another thread: the LLM stream stops at
+        the next chunk and a running test subprocess is killed. Both surface as
+        ``concurrent.futures.CancelledError`` in the thread running ``handle``.
+        """
+        self.cancel_event.set()
+        for response in list(self._active_responses):
+            try:
+                response.close()
+            except Exception:
+                pass
+
     def handle(self, text):
-        text = text.strip()
-        self.memory.save_message("user", text)
-
-        # —— RL policy picks a temperature before any action —— #
-        obs, _ = self.rl_env.reset()  # get fresh obs [last_reward, pending]
-        if self.policy is not None:
-            action, _ = self.policy.predict(obs, deterministic=False)
-            self.temperature = float(action[0])
-            print(f"[RL] Chosen temperature: {self.temperature:.3f}")
+        """Blocking wrapper around :meth:`handle_stream`; returns the full reply."""
+        return "".join(self.handle_stream(text))
+
+    def handle_stream(self, text):
+        """
+        Process one user message and return an iterator over the reply.
+        Chat replies are yielded token by token as the LLM produces them;
+        commands (feature requests, self improve) yield a single message.
+        A :meth:`cancel` any time after this call returns aborts the request,
+        even before the iterator is first advanced.
+        """
+        self.cancel_event.clear()
+        return self._handle_stream(text.strip())
+
+    def _handle_stream(self, text):
+        if self.cancel_event.is_set():
+            raise CancelledError("request cancelled before it started")
+        lowered = text.lower()
+        if lowered.startswith("i want you to implement") or lowered.startswith("please implement"):
+            kind = "feature"
         else:
-            self.temperature = 0.5
-
-        # —— now your existing logic —— #
-        # Detect feature requests
-        if text.lower().startswith("i want you to implement") \
-           or text.lower().startswith("please implement"):
-            self.memory.save_feature(text)
-            return (f"Feature request received: '{text}'. "
-                    "I will include this in the next self-improve cycle.")
-
-        # Self-improve trigger
-        if text.lower() == "self improve":
-            result = self.improver.run_cycle()
-            if self.rl_model is not None:
-                obs = [getattr(self, "last_reward", 0),
-                       len(self.memory.list_features())]
-                action, _ = self.rl_model.predict(obs, deterministic=True)
-                self.temperature = float(action[0])
-            result = self.improver.run_cycle()
-            return (
-                "Self-improvement successful." if result in ("success", "partial")
-                else "Self-improvement failed; rolled back."
-            )
-
-        # Normal chat
-        response = self.ask_llm(text)
-        self.memory.save_message("ai", response)
-        return response
-    
-    def ask_llm(self, prompt):
-        # 1) Read in all your existing Python code under app/ as context
-        code_context = []
-        for dirpath, _, files in os.walk('app'):
-            for fname in files:
-                if fname.endswith('.py'):
-                    path = os.path.join(dirpath, fname)
-                    try:
-                        with open(path, 'r', encoding='utf-8') as cf:
-                            content = cf.read()
-                        code_context.append(f"### BEGIN {path}\n{content}\n### END {path}\n")
-                    except Exception:
-                        continue
-
-        # 2) Build the full prompt with code context and pending features
-        full_prompt = "".join(code_context) + "\n" + prompt
+            kind = "self_improve" if lowered == "self improve" else "chat"
+
+        with self.metrics.span("handle", kind=kind) as span:
+            with self.metrics.span("handle.save_message"):
+                self.memory.save_message("user", text, session_id=self.session_id)
+
+            # Detect feature requests
+            if kind == "feature":
+                self.memory.save_feature(text)
+                yield (f"Feature request received: '{text}'. "
+                       "I will include this in the next self-improve cycle "
+                       f"({self.count_features()} pending).")
+                return
+
+            # Self-improve trigger
+            if kind == "self_improve":
+                # RL policy picks the temperature for this cycle
+                with self.metrics.span("handle.choose_temperature"):
+                    self.temperature = self.choose_temperature()
+                result = self.improver.run_cycle()
+                if self.cancel_event.is_set():
+                    raise CancelledError("self-improve cancelled")
+                span.outcome = outcome_name(result)
+                if result == "success":
+                    yield "Self-improvement successful."
+                elif result == "partial":
+                    yield "Self-improvement produced a patch with failing tests; app/ left unchanged."
+                else:
+                    yield "Self-improvement failed; app/ left unchanged."
+                return
+
+            # Normal chat
+            collected = []
+            start = time.perf_counter()
+            with self.metrics.span("handle.llm_stream") as stream_span:
+                for delta in self.ask_llm_stream(text, history_k=self.history_k):
+                    if not collected:
+                        stream_span.attrs["first_delta"] = round(time.perf_counter() - start, 6)
+                    collected.append(delta)
+                    yield delta
+            self.memory.save_message("ai", "".join(collected), session_id=self.session_id)
+
+    def ask_llm(self, prompt, history_k: int = 0, options: dict = None, use_cache: bool = True):
+        """
+        Blocking variant of :meth:`ask_llm_stream`; returns the full reply.
+        Replies are cached by (model, full prompt, the sampling options sent,
+        including the agent's temperature and ``num_ctx``); pass
+        ``use_cache=False`` when a fresh sample is wanted for the same prompt.
+        """
+        full_prompt = self._build_prompt(prompt, history_k)
+        options = self._request_options(options)
+        key = None
+        if use_cache and self.llm_cache is not None:
+            key = cache_key(LLM_MODEL, full_prompt, options)
+            cached = self.llm_cache.get(key)
+            if cached is not None:
+                return cached
+        reply = "".join(self._chat_stream(full_prompt, options))
+        if key is not None and reply:
+            self.llm_cache.put(key, reply, model=LLM_MODEL)
+        return reply
+
+    def ask_llm_stream(self, prompt, history_k: int = 0, options: dict = None):
+        """
+        Yield content deltas from the LLM as soon as each NDJSON chunk arrives.
+        With ``history_k > 0`` the top-k past messages most relevant to ``prompt``
+        (full-text ranked by Memory.search) are added to the context.
+        ``options`` are passed through as Ollama sampling options
+        (e.g. ``{"temperature": 0.7, "seed": 1}``) over the agent's temperature.
+        """
+        yield from self._chat_stream(self._build_prompt(prompt, history_k), self._request_options(options))
+
+    def _request_options(self, options: dict = None) -> dict:
+        """Ollama options for a request: context size and the agent's temperature unless overridden."""
+        return {"num_ctx": self.context.num_ctx, "temperature": self.temperature, **(options or {})}
+
+    def _build_prompt(self, prompt, history_k: int = 0) -> str:
+        # 1) Pending features and relevant history go after the request
+        extra = ""
         features = self.get_features()
         if features:
-            feature_text = "\nImplement these features:\n" + "\n".join(f"- {f}" for f in features)
-            full_prompt += feature_text
+            extra += "\nImplement these features:\n" + "\n".join(f"- {f}" for f in features)
+        if history_k > 0:
+            snippets = [h["text"] for h in self.memory.search(prompt, limit=history_k + 1, kinds=("message",))
+                        if h["text"] != prompt][:history_k]
+            if snippets:
+                extra += "\nRelevant past conversation:\n" + "\n".join(f"- {t}" for t in snippets)
 
+        # 2) Code under app/ most relevant to the request, within the num_ctx budget
+        code_context = self.context.build(prompt + extra, CODE_BLOCK,
+                                          reserved=estimate_tokens(prompt + extra))
+        return code_context + "\n" + prompt + extra
+
+    def _chat_stream(self, full_prompt: str, options: dict = None):
         # 3) Call the LLM
-        payload = {"model": "mistral", "messages": [{"role": "user", "content": full_prompt}]}
+        payload = {"model": LLM_MODEL, "messages": [{"role": "user", "content": full_prompt}],
+                   "options": options if options is not None else self._request_options()}
         try:
-            r = requests.post(f"{OLLAMA_URL}/api/chat", json=payload, stream=True)
+            start = time.perf_counter()
+            r = self.transport.post(f"{OLLAMA_URL}/api/chat", json=payload, stream=True,
+                                    stat="ollama.chat.headers")
             r.raise_for_status()
+            self._active_responses.add(r)
         except Exception:
             if not self.use_real_llm:
-                return "*** Begin patch \n*** End patch\n"
+                yield "*** Begin patch \n*** End patch\n"
+                return
             raise
 
-        # 4) Stream-assemble the response, handling different signatures of iter_lines()
-        collected = []
+        # 4) Stream the response, handling different signatures of iter_lines()
+        yielded = False
         try:
-            lines = r.iter_lines(decode_unicode=True)
-        except TypeError:
             try:
-                # some mocks expect a single positional argument
-                lines = r.iter_lines(True)
+                lines = r.iter_lines(decode_unicode=True)
             except TypeError:
-                lines = r.iter_lines()
-        for line in lines:
-            if not line:
-                continue
-            try:
-                part = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-            msg = part.get('message', {})
-            content = msg.get('content')
-            done = part.get('done', False)
-            if content:
-                collected.append(content)
-            if done:
-                break
-
-        return "".join(collected) if collected else r.text.strip()
+                try:
+                    # some mocks expect a single positional argument
+                    lines = r.iter_lines(True)
+                except TypeError:
+                    lines = r.iter_lines()
+            for line in lines:
+                if self.cancel_event.is_set():
+                    raise CancelledError("LLM stream cancelled")
+                if not line:
+                    continue
+                try:
+                    part = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                msg = part.get('message', {})
+                content = msg.get('content')
+                done = part.get('done', False)
+                if content:
+                    if not yielded:
+                        self.transport.stats.record("ollama.chat.first_token", time.perf_counter() - start)
+                    yielded = True
+                    yield content
+                if done:
+                    break
+            if not yielded:
+                # Non-NDJSON reply: fall back to the raw body
+                text = r.text.strip()
+                if text:
+                    yield text
+        except Exception as e:
+            # cancel() closes the response under us; report that as a cancellation
+            if self.cancel_event.is_set() and not isinstance(e, CancelledError):
+                raise CancelledError("LLM stream cancelled") from e
+            raise
+        finally:
+            self._active_responses.discard(r)
+            self.transport.stats.record("ollama.chat.total", time.perf_counter() - start)
+            close = getattr(r, "close", None)
+            if callable(close):
+                close()
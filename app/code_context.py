@@ -0,0 +1,187 @@
+import hashlib
+import os
+import threading
+import time
+
+# Files modified this close to the moment we read them may be rewritten again
+# within the same mtime tick, so their stat signature cannot be trusted yet.
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+class _Entry:
+    __slots__ = ("mtime_ns", "size", "digest", "content", "racy")
+
+    def __init__(self, mtime_ns, size, digest, content, racy):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+        self.content = content
+        self.racy = racy
+
+
+class CodeContextIndex:
+    """
+    Incremental index of the source files under ``root`` used for prompt assembly.
+
+    Every file is tracked by ``(mtime_ns, size, sha256)``. A refresh only re-reads
+    files whose stat signature changed, and the directory tree is only walked
+    again when one of the directory mtimes moved. Rendered prompt blocks are
+    cached per template until a file's content hash actually changes.
+    """
+
+    def __init__(self, root: str = "app", suffix: str = ".py"):
+        self.root = root
+        self.suffix = suffix
+        self._lock = threading.RLock()
+        self._dirs = {}       # dirpath -> mtime_ns
+        self._paths = []      # sorted file paths, '/'-separated
+        self._entries = {}    # path -> _Entry
+        self._rendered = {}   # template -> (version, text)
+        self._version = 0
+
+    # ------------------------------------------------------------------ #
+    # Public API
+    # ------------------------------------------------------------------ #
+    def paths(self) -> list[str]:
+        """Return the indexed file paths (refreshing the index first)."""
+        with self._lock:
+            self.refresh()
+            return [p for p in self._paths if p in self._entries]
+
+    def contents(self) -> dict[str, str]:
+        """Return ``{path: source}`` for every indexed file."""
+        with self._lock:
+            self.refresh()
+            return {p: self._entries[p].content for p in self._paths if p in self._entries}
+
+    def files(self) -> list[tuple[str, str, str]]:
+        """Return ``(path, sha256, source)`` for every indexed file."""
+        with self._lock:
+            self.refresh()
+            return [(p, self._entries[p].digest, self._entries[p].content)
+                    for p in self._paths if p in self._entries]
+
+    def render(self, template: str) -> str:
+        """
+        Render every file through ``template`` (``str.format`` with ``path`` and
+        ``content``) and return the concatenated text, served from memory when
+        nothing changed since the last call.
+        """
+        with self._lock:
+            self.refresh()
+            cached = self._rendered.get(template)
+            if cached is not None and cached[0] == self._version:
+                return cached[1]
+            text = "".join(
+                template.format(path=p, content=self._entries[p].content)
+                for p in self._paths if p in self._entries
+            )
+            self._rendered[template] = (self._version, text)
+            return text
+
+    def invalidate(self, paths=None):
+        """
+        Forget cached state so the next access re-reads from disk.
+        With ``paths=None`` the whole index (including the tree listing) is dropped.
+        """
+        with self._lock:
+            if paths is None:
+                self._dirs = {}
+                self._paths = []
+                self._entries = {}
+            else:
+                self._dirs = {}
+                for p in paths:
+                    self._entries.pop(p.replace("\\", "/"), None)
+            self._rendered = {}
+            self._version += 1
+
+    def refresh(self) -> bool:
+        """Bring the index up to date with the tree; return True if anything changed."""
+        with self._lock:
+            changed = False
+            if self._tree_changed():
+                self._scan_tree()
+                for stale in set(self._entries) - set(self._paths):
+                    del self._entries[stale]
+                    changed = True
+            for path in self._paths:
+                if self._refresh_file(path):
+                    changed = True
+            if changed:
+                self._version += 1
+            return changed
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _tree_changed(self) -> bool:
+        if not self._dirs:
+            return True
+        for dirpath, mtime_ns in self._dirs.items():
+            try:
+                if os.stat(dirpath).st_mtime_ns != mtime_ns:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _scan_tree(self):
+        dirs = {}
+        paths = []
+        for dirpath, dirnames, files in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+            try:
+                dirs[dirpath] = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                continue
+            for fname in sorted(files):
+                if fname.endswith(self.suffix):
+                    paths.append(os.path.join(dirpath, fname).replace("\\", "/"))
+        self._dirs = dirs
+        self._paths = paths
+
+    def _refresh_file(self, path: str) -> bool:
+        entry = self._entries.get(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            if entry is not None:
+                del self._entries[path]
+                return True
+            return False
+        if (entry is not None and not entry.racy
+                and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size):
+            return False
+
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+            content = raw.decode("utf-8")
+        except Exception:
+            if entry is not None:
+                del self._entries[path]
+                return True
+            return False
+
+        digest = hashlib.sha256(raw).hexdigest()
+        racy = time.time_ns() - st.st_mtime_ns < _RACY_WINDOW_NS
+        if entry is not None and entry.digest == digest:
+            entry.mtime_ns, entry.size, entry.racy = st.st_mtime_ns, st.st_size, racy
+            return False
+        self._entries[path] = _Entry(st.st_mtime_ns, st.st_size, digest, content, racy)
+        return True
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: str = "app") -> CodeContextIndex:
+    """Return the process-wide index for ``root`` so Agent and engine share one cache."""
+    key = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = CodeContextIndex(root)
+        return index
@@ -0,0 +1,169 @@
+import ast
+import keyword
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# Context window requested from Ollama; prompts are budgeted against it.
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+# Tokens kept free for the model's reply.
+CONTEXT_RESERVE_TOKENS = int(os.getenv("CONTEXT_RESERVE_TOKENS", "2048"))
+OUTLINE_BLOCK = "### OUTLINE: {path}\n{content}\n"
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_STOPWORDS = set(keyword.kwlist) | {
+    "self", "cls", "the", "and", "for", "with", "this", "that", "from", "into", "none", "true", "false",
+    "def", "return", "str", "int", "dict", "list", "print", "should", "want", "implement", "please",
+}
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for code and English)."""
+    return (len(text) + 3) // 4
+
+
+def identifiers(text: str) -> Counter:
+    """Lower-cased identifier terms, with snake_case/CamelCase names also split into parts."""
+    terms = Counter()
+    for name in _IDENT_RE.findall(text):
+        parts = [p.lower() for chunk in name.split("_") for p in _CAMEL_RE.findall(chunk)]
+        for term in {name.lower(), *parts}:
+            if len(term) > 2 and term not in _STOPWORDS:
+                terms[term] += 1
+    return terms
+
+
+def outline(source: str) -> str:
+    """Signatures of the module's classes, functions and constants (no bodies)."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return "\n".join(source.splitlines()[:10])
+    lines = []
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            bases = ", ".join(ast.unparse(b) for b in node.bases)
+            lines.append(f"class {node.name}({bases}):" if bases else f"class {node.name}:")
+            lines.extend("    " + _signature(item) for item in node.body
+                         if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            lines.append(_signature(node))
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            names = [t.id for t in targets if isinstance(t, ast.Name) and t.id.isupper()]
+            lines.extend(f"{name} = ..." for name in names)
+    return "\n".join(lines)
+
+
+def _signature(node) -> str:
+    prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}: ..."
+
+
+class _FileInfo:
+    __slots__ = ("digest", "terms", "length", "tokens", "outline", "outline_tokens")
+
+    def __init__(self, digest, content, path):
+        self.digest = digest
+        self.terms = identifiers(content) + identifiers(path)
+        self.length = sum(self.terms.values())
+        self.tokens = estimate_tokens(content)
+        self.outline = outline(content)
+        self.outline_tokens = estimate_tokens(self.outline)
+
+
+class ContextBuilder:
+    """
+    Builds the code part of a prompt from a :class:`app.code_context.CodeContextIndex`
+    within a token budget. Files are ranked by BM25 over identifier terms
+    against a query (the request and pending features); the best-ranked
+    files are included whole while they fit, the rest as signature outlines.
+    Per-file terms and outlines are cached by content hash.
+    """
+
+    def __init__(self, index, num_ctx: int = OLLAMA_NUM_CTX, reserve: int = CONTEXT_RESERVE_TOKENS):
+        self.index = index
+        self.num_ctx = num_ctx
+        self.reserve = reserve
+        self._files = {}      # path -> _FileInfo
+        self._contents = {}   # path -> source at the last refresh
+        self.last_selection = {}   # path -> "full" | "outline" | "omitted"
+        self._lock = threading.RLock()   # shared by concurrent ask_llm calls
+
+    def build(self, query: str, template: str, reserved: int = 0) -> str:
+        """
+        Render the selected files through ``template`` (full sources) and
+        :data:`OUTLINE_BLOCK` (outlines). ``reserved`` is the token count of
+        the rest of the prompt, which is taken out of the budget.
+        """
+        with self._lock:
+            ranked = self.rank(query)
+            return self._render(ranked, template, self.num_ctx - self.reserve - reserved)
+
+    def rank(self, query: str) -> list[str]:
+        """Indexed paths ordered by relevance to ``query`` (ties: smaller files first)."""
+        with self._lock:
+            files = self._refresh()
+            query_terms = identifiers(query)
+            n = len(files) or 1
+            avg_len = sum(f.length for f in files.values()) / n or 1.0
+            df = Counter(t for f in files.values() for t in query_terms if t in f.terms)
+
+            def score(path):
+                info = files[path]
+                total = 0.0
+                for term in query_terms:
+                    tf = info.terms.get(term, 0)
+                    if tf:
+                        idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+                        total += idf * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * info.length / avg_len))
+                return total
+
+            return sorted(files, key=lambda p: (-score(p), files[p].tokens, p))
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _render(self, ranked: list, template: str, budget: int) -> str:
+        files = self._files
+        full, outlined = [], []
+        remaining = budget
+        for path in ranked:
+            info = files[path]
+            cost = estimate_tokens(template.format(path=path, content=""))
+            if info.tokens + cost <= remaining:
+                full.append(path)
+                remaining -= info.tokens + cost
+        for path in ranked:
+            info = files[path]
+            cost = estimate_tokens(OUTLINE_BLOCK.format(path=path, content=""))
+            if path not in full and info.outline and info.outline_tokens + cost <= remaining:
+                outlined.append(path)
+                remaining -= info.outline_tokens + cost
+
+        self.last_selection = {p: "full" if p in full else "outline" if p in outlined else "omitted"
+                               for p in ranked}
+        return (
+            "".join(template.format(path=p, content=self._contents[p]) for p in full)
+            + "".join(OUTLINE_BLOCK.format(path=p, content=files[p].outline) for p in outlined)
+        )
+
+    def _refresh(self) -> dict:
+        current = {}
+        contents = {}
+        for path, digest, content in self.index.files():
+            contents[path] = content
+            info = self._files.get(path)
+            if info is None or info.digest != digest:
+                info = _FileInfo(digest, content, path)
+            current[path] = info
+        self._files = current
+        self._contents = contents
+        return current
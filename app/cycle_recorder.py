@@ -0,0 +1,47 @@
+import json
+import os
+import threading
+import time
+
+CYCLE_LOG_PATH = os.getenv("CYCLE_LOG_PATH", "logs/cycles.jsonl")
+OUTCOMES = ("fail", "partial", "success")   # index == app.vec_env outcome code
+
+
+def outcome_name(result) -> str:
+    """Name of a ``run_cycle`` result (``True`` counts as success, like SelfImproveEnv)."""
+    if result is True or result == 'success':
+        return "success"
+    return "partial" if result == 'partial' else "fail"
+
+
+class CycleRecorder:
+    """Appends one JSON line per real self-improve cycle to ``path``."""
+
+    def __init__(self, path: str = CYCLE_LOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, temperature: float, pending: int, prompt_tokens: int, outcome, durations: dict):
+        row = {
+            "time": time.time(),
+            "temperature": float(temperature),
+            "pending": int(pending),
+            "prompt_tokens": int(prompt_tokens),
+            "outcome": outcome_name(outcome),
+            "durations": {k: round(float(v), 4) for k, v in durations.items()},
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(row) + "\n")
+
+    @staticmethod
+    def load(path: str = CYCLE_LOG_PATH) -> list[dict]:
+        rows = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    continue   # a torn last line from an interrupted run
+        return rows
@@ -0,0 +1,257 @@
+import glob
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import gymnasium as gym
+from stable_baselines3.common.vec_env import VecEnvWrapper
+
+EPISODE_LOG_DIR = os.getenv("EPISODE_LOG_DIR", "logs/episodes")
+# One fixed-width little-endian record per finished episode
+EPISODE_DTYPE = np.dtype([("time", "<f8"), ("reward", "<f8"), ("length", "<i4"), ("env", "<i4")])
+SHARD_MAGIC = b"AISEPLG1"
+SHARD_HEADER = len(SHARD_MAGIC)
+SHARD_PATTERN = "episodes-*.bin"
+LATEST = "latest"   # run selector: the run with the most recently written shard
+
+
+def current_run() -> str:
+    """
+    Id of this training run (a start timestamp unless ``EPISODE_RUN_ID`` is
+    set). It is stored in the environment so worker processes share it.
+    """
+    run = os.environ.get("EPISODE_RUN_ID")
+    if not run:
+        run = os.environ["EPISODE_RUN_ID"] = datetime.now().strftime("%Y%m%dT%H%M%S")
+    return run.replace("-", "_")   # "-" separates run and worker in shard names
+
+
+def shard_path(directory: str, worker, run: str = None) -> str:
+    return os.path.join(directory, f"episodes-{run or current_run()}-{worker}.bin")
+
+
+def shard_run(path: str) -> str:
+    """Run id of a shard (``""`` for shards written before runs were recorded)."""
+    stem = os.path.basename(path)[len("episodes-"):-len(".bin")]
+    return stem.split("-", 1)[0] if "-" in stem else ""
+
+
+def runs(directory: str = EPISODE_LOG_DIR) -> list:
+    """Run ids in ``directory``, least recently written first."""
+    written = {}
+    for path in glob.glob(os.path.join(directory, SHARD_PATTERN)):
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        run = shard_run(path)
+        written[run] = max(written.get(run, 0.0), mtime)
+    return sorted(written, key=lambda r: (written[r], r))
+
+
+class EpisodeLogWriter:
+    """
+    Append-only episode shard owned by one worker (default: this process).
+    Each batch of records goes out as a single ``O_APPEND`` write, so a crash
+    can at worst leave a torn last record, which readers ignore.
+    """
+
+    def __init__(self, directory: str = EPISODE_LOG_DIR, worker=None, run: str = None):
+        os.makedirs(directory, exist_ok=True)
+        self.path = shard_path(directory, os.getpid() if worker is None else worker, run)
+        self._lock = threading.Lock()
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(self._fd).st_size == 0:
+            os.write(self._fd, SHARD_MAGIC)
+
+    def write(self, rewards, lengths, envs, times=None):
+        """Append one record per element (``times`` default to now)."""
+        rewards = np.atleast_1d(rewards)
+        records = np.empty(len(rewards), dtype=EPISODE_DTYPE)
+        records["time"] = time.time() if times is None else times
+        records["reward"] = rewards
+        records["length"] = lengths
+        records["env"] = envs
+        with self._lock:
+            if self._fd is None:
+                raise ValueError("episode log is closed")
+            os.write(self._fd, records.tobytes())
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+class EpisodeLog:
+    """
+    Reader over the shards of one run in ``directory`` (``run``: an id,
+    :data:`LATEST`, or ``None`` for every run). Shards are memory-mapped only
+    when read, so nothing is parsed; :meth:`read` merges them by episode end time.
+    """
+
+    def __init__(self, directory: str = EPISODE_LOG_DIR, run: str = LATEST):
+        self.directory = directory
+        self.run = run
+
+    def shards(self) -> dict:
+        """``{path: memmap}`` of the complete records in each shard."""
+        shards = {}
+        for path, count in _shard_counts(self.directory, _resolve_run(self.directory, self.run)).items():
+            shards[path] = np.memmap(path, dtype=EPISODE_DTYPE, mode="r", offset=SHARD_HEADER, shape=(count,))
+        return shards
+
+    def __len__(self) -> int:
+        return sum(len(m) for m in self.shards().values())
+
+    def read(self, columns=None) -> np.ndarray:
+        """
+        All episodes ordered by end time, as a structured array with the
+        requested ``columns`` (default: all of them).
+        """
+        shards = list(self.shards().values())
+        if not shards:
+            return np.empty(0, dtype=EPISODE_DTYPE if columns is None else EPISODE_DTYPE[list(columns)])
+        order = np.argsort(np.concatenate([m["time"] for m in shards]), kind="stable")
+        if columns is None:
+            return np.concatenate(shards)[order]
+        return np.concatenate([np.asarray(m[list(columns)]) for m in shards])[order]
+
+    def column(self, name: str) -> np.ndarray:
+        return self.read([name])[name]
+
+
+class EpisodeTail:
+    """
+    Follows the shards of a run in ``directory`` while they grow. It remembers
+    how many records of each shard it has returned, so :meth:`poll` only maps
+    the new tail of each file. Shards created later are picked up too; with
+    :data:`LATEST`, so is a newer run (check :attr:`current` after polling).
+    """
+
+    def __init__(self, directory: str = EPISODE_LOG_DIR, run: str = LATEST):
+        self.directory = directory
+        self.run = run
+        self.current = None   # the run the last poll() read
+        self.offsets = {}     # path -> records already returned
+
+    def poll(self) -> np.ndarray:
+        """Episodes appended since the last call, ordered by end time."""
+        chunks = []
+        self.current = _resolve_run(self.directory, self.run)
+        for path, count in _shard_counts(self.directory, self.current).items():
+            start = self.offsets.get(path, 0)
+            if count > start:
+                chunks.append(np.array(np.memmap(path, dtype=EPISODE_DTYPE, mode="r", shape=(count - start,),
+                                                 offset=SHARD_HEADER + start * EPISODE_DTYPE.itemsize)))
+                self.offsets[path] = count
+        if not chunks:
+            return np.empty(0, dtype=EPISODE_DTYPE)
+        records = np.concatenate(chunks)
+        return records[np.argsort(records["time"], kind="stable")]
+
+
+def _resolve_run(directory: str, run):
+    if run != LATEST:
+        return run
+    written = runs(directory)
+    return written[-1] if written else None
+
+
+def _shard_counts(directory: str, run: str = None) -> dict:
+    """``{path: complete records}`` for every non-empty shard of ``run`` (None: all) in ``directory``."""
+    counts = {}
+    for path in sorted(glob.glob(os.path.join(directory, SHARD_PATTERN))):
+        if run is not None and shard_run(path) != run:
+            continue
+        try:
+            count = (os.path.getsize(path) - SHARD_HEADER) // EPISODE_DTYPE.itemsize
+            if count <= 0:
+                continue
+            with open(path, "rb") as f:
+                if f.read(SHARD_HEADER) != SHARD_MAGIC:
+                    print(f"[EpisodeLog] Skipping {path}: not an episode shard")
+                    continue
+        except OSError:
+            continue
+        counts[path] = count
+    return counts
+
+
+class VecEpisodeLogger(VecEnvWrapper):
+    """
+    VecMonitor replacement: tracks per-env returns and lengths, adds
+    ``info["episode"]`` when an env finishes and appends the episode to this
+    worker's shard.
+    """
+
+    def __init__(self, venv, directory: str = EPISODE_LOG_DIR, worker=None):
+        super().__init__(venv)
+        self.writer = EpisodeLogWriter(directory, worker)
+        self.episode_returns = np.zeros(self.num_envs, dtype=np.float64)
+        self.episode_lengths = np.zeros(self.num_envs, dtype=np.int64)
+        self.episode_starts = np.full(self.num_envs, time.time())
+
+    def reset(self):
+        self.episode_returns[:] = 0.0
+        self.episode_lengths[:] = 0
+        self.episode_starts[:] = time.time()
+        return self.venv.reset()
+
+    def step_wait(self):
+        obs, rewards, dones, infos = self.venv.step_wait()
+        self.episode_returns += rewards
+        self.episode_lengths += 1
+        done_idx = np.flatnonzero(dones)
+        if len(done_idx):
+            now = time.time()
+            for i in done_idx:
+                infos[i] = dict(infos[i])
+                infos[i]["episode"] = {"r": float(self.episode_returns[i]), "l": int(self.episode_lengths[i]),
+                                       "t": round(now - self.episode_starts[i], 6)}
+            self.writer.write(self.episode_returns[done_idx], self.episode_lengths[done_idx], done_idx, now)
+            self.episode_returns[done_idx] = 0.0
+            self.episode_lengths[done_idx] = 0
+            self.episode_starts[done_idx] = now
+        return obs, rewards, dones, infos
+
+    def close(self):
+        self.writer.close()
+        return self.venv.close()
+
+
+class EpisodeMonitor(gym.Wrapper):
+    """Single-env counterpart of :class:`VecEpisodeLogger` (replaces SB3's ``Monitor``)."""
+
+    def __init__(self, env, directory: str = EPISODE_LOG_DIR, worker=None, env_id: int = 0):
+        super().__init__(env)
+        self.writer = EpisodeLogWriter(directory, worker)
+        self.env_id = env_id
+        self.episode_return = 0.0
+        self.episode_length = 0
+        self.episode_start = time.time()
+
+    def reset(self, seed=None, options=None):
+        self.episode_return = 0.0
+        self.episode_length = 0
+        self.episode_start = time.time()
+        return self.env.reset(seed=seed, options=options)
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.episode_return += float(reward)
+        self.episode_length += 1
+        if terminated or truncated:
+            now = time.time()
+            info = dict(info)
+            info["episode"] = {"r": self.episode_return, "l": self.episode_length,
+                               "t": round(now - self.episode_start, 6)}
+            self.writer.write(self.episode_return, self.episode_length, self.env_id, now)
+        return obs, reward, terminated, truncated, info
+
+    def close(self):
+        self.writer.close()
+        return self.env.close()
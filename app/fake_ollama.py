@@ -0,0 +1,246 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_DIFF = (
+    "diff --git a/app/__init__.py b/app/__init__.py\n"
+    "--- a/app/__init__.py\n"
+    "+++ b/app/__init__.py\n"
+    "@@ -0,0 +1 @@\n"
+    "+# touched by fake ollama\n"
+)
+_TOKEN_RE = re.compile(r"\s*\S+|\s+")
+# The diff instruction of SelfImproveEngine._build_prompt. Anchored at a line start: prompts also
+# inline app/ code, where "diff" is common and the engine's own (indented, quoted) copy would match.
+DIFF_REQUEST_RE = re.compile(r"^Now, produce \*only\* a unified Git diff", re.MULTILINE)
+
+
+class FakeOllama:
+    """
+    Local stand-in for Ollama's ``/api/chat`` that streams NDJSON chunks with
+    controllable timing and failures, for offline load and latency tests.
+
+    * ``ttft``: seconds before the first chunk
+    * ``tokens_per_sec``: pacing of the following chunks (``0`` = as fast as possible)
+    * ``error_rate``: fraction of requests answered with ``error_status``
+    * ``stall_rate`` / ``stall_seconds``: fraction of streams that pause mid-reply
+    * ``diff``: canned reply when the last user message carries the self-improve
+      diff instruction (:data:`DIFF_REQUEST_RE`); other prompts get ``reply``
+
+    Random decisions come from ``seed``, so a sequence of requests is reproducible.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ttft: float = 0.0, tokens_per_sec: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500, stall_rate: float = 0.0,
+                 stall_seconds: float = 1.0, diff: str = DEFAULT_DIFF, reply: str = None, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.ttft = ttft
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.stall_rate = stall_rate
+        self.stall_seconds = stall_seconds
+        self.diff = diff
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "stalls": 0, "completed": 0, "disconnects": 0,
+                      "in_flight": 0, "max_in_flight": 0}
+        self.requests = []   # decoded request payloads, in arrival order
+        self._lock = threading.Lock()
+        self.server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self.server = _Server((self.host, self.port), _handler(self))
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self._thread.join()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reply_for(self, payload: dict) -> str:
+        """Reply text for a chat request: the canned diff when a self-improve diff is asked for."""
+        users = [m.get("content", "") for m in payload.get("messages", []) if m.get("role", "user") == "user"]
+        prompt = users[-1] if users else ""
+        if DIFF_REQUEST_RE.search(prompt):
+            return self.diff
+        if self.reply is not None:
+            return self.reply
+        words = prompt.split()
+        return "Fake reply to: " + " ".join(words[-12:])
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _begin(self, payload: dict):
+        """Count the request and draw its fate: ``(fail, stall_at)`` (stall_at in tokens, or None)."""
+        with self._lock:
+            self.requests.append(payload)
+            self.stats["requests"] += 1
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            fail = self.rng.random() < self.error_rate
+            stall = not fail and self.rng.random() < self.stall_rate
+            stall_fraction = self.rng.random()
+            if fail:
+                self.stats["errors"] += 1
+            if stall:
+                self.stats["stalls"] += 1
+        return fail, stall_fraction if stall else None
+
+    def _end(self, key: str = None):
+        with self._lock:
+            self.stats["in_flight"] -= 1
+            if key is not None:
+                self.stats[key] += 1
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients dropping idle keep-alive connections are routine under load
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def _chunk(model: str, content: str, done: bool, **extra) -> bytes:
+    body = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content}, "done": done, **extra}
+    return (json.dumps(body) + "\n").encode("utf-8")
+
+
+def _handler(fake: FakeOllama):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like Ollama
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._send_json(200, {"models": [{"name": "fake"}]})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": "invalid JSON"})
+                return
+            if self.path != "/api/chat":
+                self._send_json(404, {"error": "not found"})
+                return
+
+            fail, stall_at = fake._begin(payload)
+            if fail:
+                fake._end()
+                self._send_json(fake.error_status, {"error": "injected failure"})
+                return
+            self._stream(payload, stall_at)
+
+        def _stream(self, payload: dict, stall_at):
+            model = payload.get("model", "fake")
+            tokens = _TOKEN_RE.findall(fake.reply_for(payload)) or [""]
+            stall_index = int(stall_at * len(tokens)) if stall_at is not None else -1
+            interval = 1.0 / fake.tokens_per_sec if fake.tokens_per_sec > 0 else 0.0
+            start = time.perf_counter()
+            try:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                time.sleep(fake.ttft)
+                for i, token in enumerate(tokens):
+                    if i == stall_index:
+                        time.sleep(fake.stall_seconds)
+                        start += fake.stall_seconds   # resume the normal pace afterwards
+                    elif i and interval:
+                        # pace against the clock so per-chunk overhead doesn't accumulate
+                        delay = fake.ttft + i * interval - (time.perf_counter() - start)
+                        if delay > 0:
+                            time.sleep(delay)
+                    self._write_chunk(_chunk(model, token, False))
+                self._write_chunk(_chunk(model, "", True, done_reason="stop", eval_count=len(tokens),
+                                         total_duration=int((time.perf_counter() - start) * 1e9)))
+                self._write_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                fake._end("disconnects")
+                self.close_connection = True
+                return
+            fake._end("completed")
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama /api/chat server for offline load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=50.0, help="tokens per second (0 = unthrottled)")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--stall-rate", type=float, default=0.0)
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parser.add_argument("--diff-file", help="canned diff returned to prompts that ask for a diff")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    diff = DEFAULT_DIFF
+    if args.diff_file:
+        with open(args.diff_file, "r", encoding="utf-8") as f:
+            diff = f.read()
+    fake = FakeOllama(args.host, args.port, ttft=args.ttft, tokens_per_sec=args.tps, error_rate=args.error_rate,
+                      error_status=args.error_status, stall_rate=args.stall_rate, stall_seconds=args.stall_seconds,
+                      diff=diff, seed=args.seed).start()
+    print(f"[FakeOllama] Listening on {fake.url} (set OLLAMA_URL={fake.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.stop()
+        print(f"[FakeOllama] {fake.stats}")
+
+
+if __name__ == "__main__":
+    main()
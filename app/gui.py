@@ -1,14 +1,46 @@
+from concurrent.futures import CancelledError
+
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QTextEdit, QLineEdit,
     QPushButton, QListWidget, QLabel, QHBoxLayout, QListWidgetItem,
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+
+class AgentWorker(QObject):
+    """Consumes an ``agent.handle_stream`` reply off the GUI thread and reports back through signals."""
+    partial = pyqtSignal(str)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def run(self):
+        collected = []
+        try:
+            for delta in self.stream:
+                collected.append(delta)
+                self.partial.emit(delta)
+        except CancelledError:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        self.finished.emit("".join(collected))
+
 
 class MainWindow(QMainWindow):
     def __init__(self, agent):
         super().__init__()
         self.agent = agent
         self.setWindowTitle("Self-Evolving AI")
+        self._thread = None
+        self._worker = None
         self._build_ui()
 
     def _build_ui(self):
@@ -23,10 +55,15 @@ class MainWindow(QMainWindow):
         # Input line
         input_layout = QHBoxLayout()
         self.input_line = QLineEdit()
-        send_btn = QPushButton("Send")
-        send_btn.clicked.connect(self.on_send)
+        self.input_line.returnPressed.connect(self.on_send)
+        self.send_btn = QPushButton("Send")
+        self.send_btn.clicked.connect(self.on_send)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.on_cancel)
         input_layout.addWidget(self.input_line)
-        input_layout.addWidget(send_btn)
+        input_layout.addWidget(self.send_btn)
+        input_layout.addWidget(self.cancel_btn)
         layout.addLayout(input_layout)
 
         # Features list
@@ -58,16 +95,71 @@ class MainWindow(QMainWindow):
 
     def on_send(self):
         user_text = self.input_line.text().strip()
-        if not user_text:
+        if not user_text or self._thread is not None:
             return
         self.chat_display.append(f"<You> {user_text}")
         self.input_line.clear()
-        
-        reply = self.agent.handle(user_text)
-        self.chat_display.append(f"<AI> {reply}")
+        self.chat_display.append("<AI> ")
+
+        # Run the agent on a worker thread so the window stays responsive
+        self._thread = QThread(self)
+        # Submitted here, on the GUI thread, so a Cancel before the worker starts still counts
+        self._worker = AgentWorker(self.agent.handle_stream(user_text))
+        self._worker.moveToThread(self._thread)
+        self._thread.started.connect(self._worker.run)
+        self._worker.partial.connect(self.append_partial)
+        self._worker.finished.connect(self.on_reply_finished)
+        self._worker.failed.connect(self.on_reply_failed)
+        self._worker.cancelled.connect(self.on_reply_cancelled)
+        for signal in (self._worker.finished, self._worker.failed, self._worker.cancelled):
+            signal.connect(self._thread.quit)
+        self._thread.finished.connect(self._on_thread_done)
+        self._set_busy(True)
+        self._thread.start()
+
+    def on_cancel(self):
+        if self._thread is not None:
+            self.cancel_btn.setEnabled(False)
+            self.agent.cancel()
+
+    def on_reply_finished(self, reply):
         # reload features in case they changed
         self.load_features()
 
+    def on_reply_failed(self, message):
+        self.append_partial(f"[error: {message}]")
+
+    def on_reply_cancelled(self):
+        self.append_partial(" [cancelled]")
+        self.load_features()
+
+    def _on_thread_done(self):
+        self._worker.deleteLater()
+        self._thread.deleteLater()
+        self._worker = None
+        self._thread = None
+        self._set_busy(False)
+
+    def closeEvent(self, event):
+        # Don't leave a worker running against a destroyed window
+        if self._thread is not None:
+            self.agent.cancel()
+            self._thread.quit()
+            self._thread.wait()
+        super().closeEvent(event)
+
+    def _set_busy(self, busy):
+        self.send_btn.setEnabled(not busy)
+        self.cancel_btn.setEnabled(busy)
+
+    def append_partial(self, text):
+        """Append streamed text to the last chat line without starting a new paragraph."""
+        cursor = self.chat_display.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.chat_display.setTextCursor(cursor)
+        self.chat_display.ensureCursorVisible()
+
     def on_feature_selected(self):
         # Enable the delete button only when exactly one feature is selected
         has_sel = len(self.features_list.selectedItems()) == 1
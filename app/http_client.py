@@ -1,4 +1,115 @@
+import os
+import threading
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "300"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+
+
+class LatencyStats:
+    """Thread-safe per-endpoint latency counters (count, errors, total/min/max seconds)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        with self._lock:
+            s = self._data.setdefault(
+                name, {"count": 0, "errors": 0, "total": 0.0, "min": None, "max": 0.0, "last": 0.0}
+            )
+            s["count"] += 1
+            if not ok:
+                s["errors"] += 1
+            s["total"] += seconds
+            s["last"] = seconds
+            s["max"] = max(s["max"], seconds)
+            s["min"] = seconds if s["min"] is None else min(s["min"], seconds)
+
+    def snapshot(self) -> dict:
+        """Return a copy of the counters with a derived ``mean`` per endpoint."""
+        with self._lock:
+            out = {}
+            for name, s in self._data.items():
+                out[name] = dict(s, mean=s["total"] / s["count"] if s["count"] else 0.0)
+            return out
+
+    def reset(self):
+        with self._lock:
+            self._data.clear()
+
+
+class HttpTransport:
+    """
+    Shared HTTP transport: one keep-alive ``requests.Session`` with a connection
+    pool, default ``(connect, read)`` timeouts and bounded retries with
+    exponential backoff. Read/status retries only apply to idempotent methods;
+    connection failures (request never sent) are retried for any method.
+    """
+
+    def __init__(self, connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 max_retries: int = MAX_RETRIES, backoff_factor: float = BACKOFF_FACTOR,
+                 pool_size: int = POOL_SIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.stats = LatencyStats()
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url: str, timeout=None, stat: str = None, **kwargs):
+        return self._timed(self.session.get, "GET", url, timeout, stat, **kwargs)
+
+    def post(self, url: str, timeout=None, stat: str = None, **kwargs):
+        return self._timed(self.session.post, "POST", url, timeout, stat, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def _timed(self, send, method, url, timeout, stat, **kwargs):
+        # Latency is measured up to the response headers; streamed bodies are
+        # timed by the caller if needed.
+        name = stat or f"{method} {url}"
+        start = time.perf_counter()
+        try:
+            response = send(url, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+        except requests.RequestException:
+            self.stats.record(name, time.perf_counter() - start, ok=False)
+            raise
+        code = getattr(response, "status_code", None)
+        self.stats.record(name, time.perf_counter() - start, ok=not (isinstance(code, int) and code >= 400))
+        return response
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HttpTransport:
+    """Return the process-wide transport, creating it on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HttpTransport()
+        return _transport
+
 
 def fetch_url(url: str) -> str:
     """
@@ -8,7 +119,7 @@ def fetch_url(url: str) -> str:
       ValueError                  if the response status is not 200.
     """
     try:
-        response = requests.get(url, timeout=5)
+        response = get_transport().get(url, timeout=5)
         response.raise_for_status()   # HTTP errors -> RequestException
     except requests.RequestException as e:
         # Re-raise with a clearer message
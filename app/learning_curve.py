@@ -0,0 +1,168 @@
+import numpy as np
+
+
+class RunningStats:
+    """Count, mean, std, min and max over everything seen (Welford/Chan batch updates)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if not n:
+            return
+        batch_mean = float(values.mean())
+        delta = batch_mean - self.mean
+        total = self.count + n
+        self._m2 += float(((values - batch_mean) ** 2).sum()) + delta * delta * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def std(self) -> float:
+        return (self._m2 / self.count) ** 0.5 if self.count else 0.0
+
+
+class RollingWindow:
+    """
+    Mean and std over the last ``size`` values. Keeps only that window, so
+    each batch costs O(batch + size) no matter how long the history is.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._window = np.empty(0, dtype=np.float64)
+
+    def update(self, values) -> np.ndarray:
+        """Add ``values``; return the rolling mean after each of them."""
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return values
+        seq = np.concatenate([self._window, values])
+        cumsum = np.concatenate([[0.0], np.cumsum(seq)])
+        end = np.arange(len(self._window) + 1, len(seq) + 1)
+        start = np.maximum(end - self.size, 0)
+        self._window = seq[-self.size:]
+        return (cumsum[end] - cumsum[start]) / (end - start)
+
+    @property
+    def mean(self) -> float:
+        return float(self._window.mean()) if len(self._window) else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(self._window.std()) if len(self._window) else 0.0
+
+
+class Ewma:
+    """Exponentially weighted moving average with smoothing factor ``alpha``."""
+
+    def __init__(self, alpha: float = 0.05):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, values) -> np.ndarray:
+        """Add ``values``; return the average after each of them."""
+        out = np.empty(len(values), dtype=np.float64)
+        value = self.value
+        for i, x in enumerate(np.asarray(values, dtype=np.float64).tolist()):
+            value = x if value is None else value + self.alpha * (x - value)
+            out[i] = value
+        self.value = value
+        return out
+
+
+class GrowableArray:
+    """Append-only float64 buffer that doubles its capacity, so appends are amortised O(batch)."""
+
+    def __init__(self, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=np.float64)
+        self._size = 0
+
+    def extend(self, values):
+        end = self._size + len(values)
+        if end > len(self._data):
+            grown = np.empty(max(end, 2 * len(self._data)), dtype=np.float64)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        self._data[self._size:end] = values
+        self._size = end
+
+    @property
+    def values(self) -> np.ndarray:
+        """The filled part (a view; later appends do not change it)."""
+        return self._data[:self._size]
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class LearningCurve:
+    """
+    Learning-curve series and summary statistics of episode rewards, updated
+    incrementally from batches of :data:`app.episode_log.EPISODE_DTYPE`
+    records (e.g. from :class:`app.episode_log.EpisodeTail`).
+    """
+
+    def __init__(self, windows=(20, 50), alpha: float = 0.05):
+        self.rewards = RunningStats()
+        self.lengths = RunningStats()
+        self.windows = {w: RollingWindow(w) for w in windows}
+        self.ewma = Ewma(alpha)
+        self._rewards = GrowableArray()
+        self._rolling = {w: GrowableArray() for w in windows}
+        self._ewma = GrowableArray()
+        self.first_time = None
+        self.last_time = None
+
+    def update(self, records) -> int:
+        """Fold in new episode records; return how many there were."""
+        if not len(records):
+            return 0
+        rewards = np.asarray(records["reward"], dtype=np.float64)
+        self.rewards.update(rewards)
+        self.lengths.update(records["length"])
+        self._rewards.extend(rewards)
+        for w, window in self.windows.items():
+            self._rolling[w].extend(window.update(rewards))
+        self._ewma.extend(self.ewma.update(rewards))
+        if self.first_time is None:
+            self.first_time = float(records["time"][0])
+        self.last_time = float(records["time"][-1])
+        return len(records)
+
+    @property
+    def reward_series(self) -> np.ndarray:
+        return self._rewards.values
+
+    @property
+    def rolling_series(self) -> dict:
+        return {w: series.values for w, series in self._rolling.items()}
+
+    @property
+    def ewma_series(self) -> np.ndarray:
+        return self._ewma.values
+
+    def summary(self) -> dict:
+        stats = {
+            "episodes": self.rewards.count,
+            "mean_reward": self.rewards.mean,
+            "std_reward": self.rewards.std,
+            "min_reward": self.rewards.min if self.rewards.count else 0.0,
+            "max_reward": self.rewards.max if self.rewards.count else 0.0,
+            "mean_length": self.lengths.mean,
+            "ewma_reward": self.ewma.value or 0.0,
+        }
+        for w, window in self.windows.items():
+            stats[f"rolling{w}_mean"] = window.mean
+            stats[f"rolling{w}_std"] = window.std
+        if self.first_time is not None and self.last_time > self.first_time:
+            stats["episodes_per_sec"] = self.rewards.count / (self.last_time - self.first_time)
+        return stats
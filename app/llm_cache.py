@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import bindparam, create_engine, event, func, select, Column, Float, Integer, String, Text, Table, MetaData
+
+from app.memory import _apply_pragmas
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def cache_key(model: str, prompt: str, options: dict = None) -> str:
+    """Key for ``(model, sha256(prompt), temperature, other sampling options)``."""
+    options = dict(options or {})
+    temperature = options.pop("temperature", None)
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw = json.dumps([model, prompt_hash, temperature, options], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    LLM replies keyed by :func:`cache_key`: an in-memory LRU of the most
+    recent ``memory_entries`` replies in front of a SQLite table. The table is
+    trimmed least-recently-used first once its replies exceed ``max_bytes``.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.engine = create_engine(f"sqlite:///{path}", echo=False)
+        event.listen(self.engine, "connect", _apply_pragmas)
+        self.meta = MetaData()
+        self.entries = Table(
+            "llm_cache", self.meta,
+            Column("key", String, primary_key=True),
+            Column("model", String),
+            Column("response", Text, nullable=False),
+            Column("size", Integer, nullable=False),
+            Column("last_used", Float, nullable=False, index=True),
+        )
+        self.meta.create_all(self.engine)
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._touched = {}  # key -> time of in-memory hits not yet written to disk
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        with self.engine.connect() as conn:
+            self._bytes = conn.execute(select(func.coalesce(func.sum(self.entries.c.size), 0))).scalar()
+
+    def get(self, key: str):
+        """Cached reply for ``key``, or None (counted as a miss)."""
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                self._touched[key] = time.time()
+                self.hits += 1
+                self.memory_hits += 1
+                return self._lru[key]
+        with self.engine.begin() as conn:
+            row = conn.execute(select(self.entries.c.response).where(self.entries.c.key == key)).first()
+            if row is not None:
+                conn.execute(self.entries.update().where(self.entries.c.key == key).values(last_used=time.time()))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, row.response)
+        return row.response
+
+    def put(self, key: str, response: str, model: str = None):
+        size = len(response.encode("utf-8"))
+        with self.engine.begin() as conn:
+            old = conn.execute(select(self.entries.c.size).where(self.entries.c.key == key)).scalar()
+            conn.execute(self.entries.delete().where(self.entries.c.key == key))
+            conn.execute(self.entries.insert().values(
+                key=key, model=model, response=response, size=size, last_used=time.time()))
+            with self._lock:
+                self._bytes += size - (old or 0)
+                self._remember(key, response)
+            if self._bytes > self.max_bytes:
+                self._evict(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru),
+                "bytes": self._bytes,
+            }
+
+    def clear(self):
+        with self.engine.begin() as conn:
+            conn.execute(self.entries.delete())
+        with self._lock:
+            self._lru.clear()
+            self._touched.clear()
+            self._bytes = 0
+
+    def close(self):
+        self.engine.dispose()
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _remember(self, key: str, response: str):
+        # caller holds self._lock
+        self._lru[key] = response
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def _evict(self, conn):
+        """Drop least-recently-used rows until the table fits in ``max_bytes``."""
+        # in-memory hits only reach the table now, so recency is exact when it matters
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            conn.execute(
+                self.entries.update().where(self.entries.c.key == bindparam("k")).values(last_used=bindparam("t")),
+                [{"k": k, "t": t} for k, t in touched.items()],
+            )
+        rows = conn.execute(
+            select(self.entries.c.key, self.entries.c.size).order_by(self.entries.c.last_used)
+        ).all()
+        victims = []
+        excess = self._bytes - self.max_bytes
+        for row in rows:
+            if excess <= 0:
+                break
+            victims.append(row.key)
+            excess -= row.size
+        for start in range(0, len(victims), 500):
+            conn.execute(self.entries.delete().where(self.entries.c.key.in_(victims[start:start + 500])))
+        with self._lock:
+            self._bytes = excess + self.max_bytes
+            for key in victims:
+                self._lru.pop(key, None)
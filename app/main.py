@@ -1,14 +1,51 @@
+import argparse
 import sys
-from PyQt5.QtWidgets import QApplication
-from app.gui import MainWindow
 from app.agent import Agent
+from app.cycle_recorder import CycleRecorder
+from app.metrics import enable_export
+
+def run_cli(agent):
+    """Terminal chat loop that prints reply tokens as they stream in."""
+    print("Type 'exit' to quit.")
+    while True:
+        try:
+            user_text = input("You: ").strip()
+        except EOFError:
+            break
+        if user_text.lower() in ("exit", "quit"):
+            break
+        if not user_text:
+            continue
+        print("AI: ", end="", flush=True)
+        for delta in agent.handle_stream(user_text):
+            print(delta, end="", flush=True)
+        print()
 
 def main():
+    parser = argparse.ArgumentParser(description="Self-Evolving AI")
+    parser.add_argument("--cli", action="store_true", help="Chat in the terminal instead of the GUI")
+    args = parser.parse_args()
+
     agent = Agent()
+    # The app exports spans/metrics and logs real cycles under logs/; library use writes nothing
+    enable_export()
+    if agent.use_real_llm:
+        agent.improver.recorder = CycleRecorder()
+    if args.cli:
+        try:
+            run_cli(agent)
+        finally:
+            agent.memory.flush()
+        return
+
+    from PyQt5.QtWidgets import QApplication
+    from app.gui import MainWindow
     app = QApplication(sys.argv)
     window = MainWindow(agent)
     window.show()
-    sys.exit(app.exec_())
+    code = app.exec_()
+    agent.memory.flush()
+    sys.exit(code)
 
 if __name__ == '__main__':
     main()
@@ -1,10 +1,89 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Table, MetaData
+import atexit
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import (
+    create_engine, event, select, text, Column, DateTime, Index, Integer, String, Text, Table, MetaData,
+)
 from sqlalchemy.orm import sessionmaker
 
+# Applied to every new pooled connection. WAL lets readers run alongside one
+# writer (e.g. the vectorized env workers), and synchronous=NORMAL only fsyncs
+# at checkpoints instead of on every commit.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+
+
+def _apply_pragmas(dbapi_conn, _record):
+    cursor = dbapi_conn.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
+# External-content FTS5 indexes kept in sync with their base tables by triggers.
+FTS_SOURCES = (
+    # (fts table, base table, text column)
+    ("messages_fts", "messages", "content"),
+    ("features_fts", "features", "description"),
+)
+
+
+def _fts_statements(fts: str, base: str, col: str) -> list[str]:
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({col}, content='{base}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {base} BEGIN "
+        f"INSERT INTO {fts}(rowid, {col}) VALUES (new.id, new.{col}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {base} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.id, old.{col}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {col} ON {base} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.id, old.{col}); "
+        f"INSERT INTO {fts}(rowid, {col}) VALUES (new.id, new.{col}); END",
+        # index rows that existed before the FTS table did
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+# Row counts kept current by triggers, so counting never scans the table.
+COUNTED_TABLES = ("features",)
+
+
+def _counter_statements(table: str) -> list[str]:
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_count_ai AFTER INSERT ON {table} BEGIN "
+        f"UPDATE counters SET value = value + 1 WHERE name = '{table}'; END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_count_ad AFTER DELETE ON {table} BEGIN "
+        f"UPDATE counters SET value = value - 1 WHERE name = '{table}'; END",
+        # (re)seed from the table so counts stay right for databases created before the triggers
+        f"INSERT OR REPLACE INTO counters(name, value) SELECT '{table}', COUNT(*) FROM {table}",
+    ]
+
+
+def _fts_query(text: str, max_terms: int = 32) -> str:
+    """Turn free text into an OR query of quoted terms (safe against FTS syntax)."""
+    terms = []
+    for term in re.findall(r"\w+", text.lower()):
+        if len(term) > 1 and term not in terms:
+            terms.append(term)
+        if len(terms) >= max_terms:
+            break
+    return " OR ".join(f'"{t}"' for t in terms)
+
+
 class Memory:
-    def __init__(self, db_path: str = "memory.db"):
+    def __init__(self, db_path: str = "memory.db", write_behind: bool = False,
+                 flush_interval_ms: int = 50, flush_rows: int = 100):
         # Initialize database engine and metadata
         self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
+        event.listen(self.engine, "connect", _apply_pragmas)
         self.meta = MetaData()
 
         # Define messages table
@@ -13,6 +92,11 @@ class Memory:
             Column("id", Integer, primary_key=True),
             Column("role", String, nullable=False),
             Column("content", Text, nullable=False),
+            Column("created_at", DateTime, default=datetime.utcnow),
+            Column("session_id", String),
+            Index("ix_messages_role_id", "role", "id"),
+            Index("ix_messages_session_id", "session_id", "id"),
+            Index("ix_messages_created_at", "created_at"),
         )
 
         # Define features table
@@ -29,72 +113,278 @@ class Memory:
             Column("value", Integer, default=0),
         )
 
+        # Trigger-maintained row counts (see COUNTED_TABLES)
+        self.counters = Table(
+            "counters", self.meta,
+            Column("name", String, primary_key=True),
+            Column("value", Integer, nullable=False, default=0),
+        )
+
         # Create all tables if they do not exist
         self.meta.create_all(self.engine)
+        self._migrate()
+        self.fts_enabled = self._create_fts()
+        self._feature_count = self._create_counters()
         self.Session = sessionmaker(bind=self.engine)
 
-    def save_message(self, role: str, content: str):
+        # Optional write-behind queue for messages and rewards
+        self._writer = None
+        if write_behind:
+            self._writer = _WriteBehind(self, flush_interval_ms / 1000.0, flush_rows)
+            atexit.register(self.close)
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """Flush pending writes, stop the writer thread and release pooled connections."""
+        if self._writer is not None:
+            self._writer.stop()
+            self._writer = None
+        self.engine.dispose()
+
+    def _migrate(self):
+        """Add columns/indexes introduced after a database file was first created."""
+        with self.engine.begin() as conn:
+            existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(messages)")}
+            if "created_at" not in existing:
+                conn.exec_driver_sql("ALTER TABLE messages ADD COLUMN created_at DATETIME")
+            if "session_id" not in existing:
+                conn.exec_driver_sql("ALTER TABLE messages ADD COLUMN session_id VARCHAR")
+            for index in self.messages.indexes:
+                index.create(conn, checkfirst=True)
+
+    def _create_fts(self) -> bool:
+        """Create the FTS5 tables/triggers if missing; False if this SQLite lacks FTS5."""
+        try:
+            with self.engine.begin() as conn:
+                for fts, base, col in FTS_SOURCES:
+                    exists = conn.exec_driver_sql(
+                        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (fts,)
+                    ).first()
+                    if exists:
+                        continue
+                    for stmt in _fts_statements(fts, base, col):
+                        conn.exec_driver_sql(stmt)
+            return True
+        except Exception as e:
+            print(f"[Memory] Full-text search unavailable: {e}")
+            return False
+
+    def _create_counters(self) -> int:
+        """Install the counter triggers and return the current feature count."""
+        with self.engine.begin() as conn:
+            for table in COUNTED_TABLES:
+                for stmt in _counter_statements(table):
+                    conn.exec_driver_sql(stmt)
+            return self._read_feature_count(conn)
+
+    def _read_feature_count(self, conn) -> int:
+        return conn.execute(select(self.counters.c.value).where(self.counters.c.name == "features")).scalar() or 0
+
+    def search(self, query: str, limit: int = 5, kinds=("message", "feature")) -> list[dict]:
+        """
+        Ranked full-text search over message contents and feature descriptions.
+        Returns up to ``limit`` dicts ``{kind, id, text, score}`` ordered by BM25
+        relevance (lower score is better).
+        """
+        match = _fts_query(query)
+        if not self.fts_enabled or not match or limit <= 0:
+            return []
+        self.flush()
+        parts = []
+        if "message" in kinds:
+            parts.append("SELECT 'message' AS kind, rowid AS id, content AS text, "
+                         "bm25(messages_fts) AS score FROM messages_fts WHERE messages_fts MATCH :q")
+        if "feature" in kinds:
+            parts.append("SELECT 'feature' AS kind, rowid AS id, description AS text, "
+                         "bm25(features_fts) AS score FROM features_fts WHERE features_fts MATCH :q")
+        if not parts:
+            return []
+        sql = " UNION ALL ".join(parts) + " ORDER BY score LIMIT :limit"
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(sql), {"q": match, "limit": limit}).fetchall()
+        return [{"kind": r.kind, "id": r.id, "text": r.text, "score": r.score} for r in rows]
+
+    def save_message(self, role: str, content: str, session_id: str = None):
         """Persist a chat message (user or AI)."""
-        session = self.Session()
-        session.execute(
-            self.messages.insert().values(role=role, content=content)
-        )
-        session.commit()
-        session.close()
+        row = {"role": role, "content": content,
+               "created_at": datetime.utcnow(), "session_id": session_id}
+        if self._writer is not None:
+            self._writer.put("message", row)
+            return
+        with self.engine.begin() as conn:
+            conn.execute(self.messages.insert().values(**row))
 
     def list_messages(self) -> list[dict]:
         """Retrieve all messages as list of dicts."""
-        session = self.Session()
-        rows = session.execute(self.messages.select()).fetchall()
-        session.close()
-        return [{"id": r.id, "role": r.role, "content": r.content} for r in rows]
+        return list(self.iter_messages())
+
+    def iter_messages(self, role: str = None, session_id: str = None, before_id: int = None,
+                      after_id: int = None, limit: int = None, newest_first: bool = False):
+        """
+        Stream messages matching the filters, ordered by id (oldest first unless
+        ``newest_first``). Rows are fetched from a server-side cursor so only
+        the requested window is ever held in memory.
+        """
+        self.flush()
+        m = self.messages
+        query = select(m)
+        if role is not None:
+            query = query.where(m.c.role == role)
+        if session_id is not None:
+            query = query.where(m.c.session_id == session_id)
+        if before_id is not None:
+            query = query.where(m.c.id < before_id)
+        if after_id is not None:
+            query = query.where(m.c.id > after_id)
+        query = query.order_by(m.c.id.desc() if newest_first else m.c.id)
+        if limit is not None:
+            query = query.limit(limit)
+        with self.engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=256).execute(query)
+            for r in result:
+                yield {"id": r.id, "role": r.role, "content": r.content,
+                       "created_at": r.created_at, "session_id": r.session_id}
+
+    def recent_messages(self, n: int, role: str = None, session_id: str = None,
+                        before_id: int = None) -> list[dict]:
+        """Return the last ``n`` matching messages in chronological order."""
+        rows = list(self.iter_messages(role=role, session_id=session_id, before_id=before_id,
+                                       limit=n, newest_first=True))
+        rows.reverse()
+        return rows
 
     def save_feature(self, description: str):
         """Add a new feature request if not already present."""
-        session = self.Session()
         try:
-            session.execute(self.features.insert().values(description=description))
-            session.commit()
+            with self.engine.begin() as conn:
+                conn.execute(self.features.insert().values(description=description))
+                count = self._read_feature_count(conn)
+            self._feature_count = count
         except Exception:
-            session.rollback()  # likely duplicate
-        finally:
-            session.close()
+            pass  # likely duplicate
 
     def list_features(self) -> list[str]:
         """Get all pending feature descriptions."""
-        session = self.Session()
-        rows = session.execute(self.features.select()).fetchall()
-        session.close()
+        with self.engine.connect() as conn:
+            rows = conn.execute(self.features.select()).fetchall()
         return [r.description for r in rows]
 
     def delete_feature(self, feature_id: int):
         """Remove a feature by its ID."""
-        session = self.Session()
-        session.execute(
-            self.features.delete().where(self.features.c.id == feature_id)
-        )
-        session.commit()
-        session.close()
+        with self.engine.begin() as conn:
+            conn.execute(self.features.delete().where(self.features.c.id == feature_id))
+            count = self._read_feature_count(conn)
+        self._feature_count = count
+
+    def count_features(self, refresh: bool = False) -> int:
+        """
+        Number of pending features. Served from memory; the value is re-read
+        in the same transaction as every save/delete through this instance.
+        Pass ``refresh=True`` to pick up writes made by other processes.
+        """
+        if refresh:
+            with self.engine.connect() as conn:
+                self._feature_count = self._read_feature_count(conn)
+        return self._feature_count
 
     def add_reward(self, delta: int):
         """Update cumulative reward score."""
-        session = self.Session()
+        if self._writer is not None:
+            self._writer.put("reward", delta)
+            return
+        with self.engine.begin() as conn:
+            self._apply_reward(conn, delta)
+
+    def get_score(self) -> int:
+        """Retrieve the current cumulative reward score."""
+        self.flush()
+        with self.engine.connect() as conn:
+            row = conn.execute(self.scores.select()).first()
+        return row.value if row else 0
+
+    def _apply_reward(self, conn, delta: int):
         # Check if a score row exists
-        row = session.execute(self.scores.select()).first()
+        row = conn.execute(self.scores.select()).first()
         if row:
-            new_val = row.value + delta
-            session.execute(
-                self.scores.update().values(value=new_val).where(self.scores.c.id == row.id)
+            conn.execute(
+                self.scores.update().values(value=row.value + delta).where(self.scores.c.id == row.id)
             )
         else:
             # First reward entry
-            session.execute(self.scores.insert().values(value=delta))
-        session.commit()
-        session.close()
+            conn.execute(self.scores.insert().values(value=delta))
 
-    def get_score(self) -> int:
-        """Retrieve the current cumulative reward score."""
-        session = self.Session()
-        row = session.execute(self.scores.select()).first()
-        session.close()
-        return row.value if row else 0
+    def _write_batch(self, messages: list, reward_delta: int):
+        """Group-commit a batch drained from the write-behind queue."""
+        with self.engine.begin() as conn:
+            if messages:
+                conn.execute(self.messages.insert(), messages)
+            if reward_delta:
+                self._apply_reward(conn, reward_delta)
+
+
+class _WriteBehind:
+    """
+    Background thread that drains queued writes and commits them in one
+    transaction every ``interval`` seconds or ``max_rows`` rows, whichever
+    comes first.
+    """
+
+    def __init__(self, memory: Memory, interval: float, max_rows: int):
+        self.memory = memory
+        self.interval = interval
+        self.max_rows = max(1, max_rows)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="memory-write-behind", daemon=True)
+        self._thread.start()
+
+    def put(self, kind: str, item):
+        self._queue.put((kind, item))
+
+    def flush(self):
+        if not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def stop(self):
+        if self._thread.is_alive():
+            self._queue.put(("stop", None))
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            kind, item = self._queue.get()
+            messages, reward, waiters, stop = [], 0, [], False
+            deadline = time.monotonic() + self.interval
+            while True:
+                if kind == "message":
+                    messages.append(item)
+                elif kind == "reward":
+                    reward += item
+                elif kind == "flush":
+                    waiters.append(item)
+                elif kind == "stop":
+                    stop = True
+                if waiters or stop or len(messages) >= self.max_rows:
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    kind, item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if messages or reward:
+                try:
+                    self.memory._write_batch(messages, reward)
+                except Exception as e:
+                    print(f"[Memory] Write-behind batch of {len(messages)} messages failed: {e}")
+            for done in waiters:
+                done.set()
+            if stop:
+                return
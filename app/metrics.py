@@ -0,0 +1,264 @@
+import bisect
+import json
+import os
+import threading
+import time
+from concurrent.futures import CancelledError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# File export is switched on by the app entry point (enable_export); library use writes nothing.
+# Every finished span as one JSON line (empty disables)
+METRICS_LOG_PATH = os.getenv("METRICS_LOG_PATH", "logs/spans.jsonl")
+# Prometheus text file rewritten after each top-level span, for a textfile collector (empty disables)
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", "logs/metrics.prom")
+# Serve the same text on http://METRICS_HOST:METRICS_PORT/metrics when > 0
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+PREFIX = "aisapp"
+
+
+class Histogram:
+    """Fixed-bucket duration histogram (counts per upper bound, plus sum and count)."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # last slot: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """``[(upper_bound, count <= bound), ...]`` ending with ``inf``."""
+        total, out = 0, []
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            total += n
+            out.append((bound, total))
+        return out
+
+
+class Span:
+    """
+    Times one phase. Set :attr:`outcome` inside the block to label the result;
+    an exception marks it ``error`` (``cancelled`` for cancellation).
+    """
+
+    __slots__ = ("registry", "name", "attrs", "outcome", "duration", "parent", "_start")
+
+    def __init__(self, registry, name: str, attrs: dict):
+        self.registry = registry
+        self.name = name
+        self.attrs = attrs
+        self.outcome = "ok"
+        self.duration = 0.0
+        self.parent = None
+
+    def __enter__(self):
+        stack = self.registry._stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._start
+        if exc_type is not None:
+            self.outcome = "cancelled" if issubclass(exc_type, (CancelledError, GeneratorExit)) else "error"
+        stack = self.registry._stack()
+        if self in stack:   # normally the top; a generator span may close out of order
+            stack.remove(self)
+        self.registry._finish(self, top_level=not stack)
+        return False
+
+
+class MetricsRegistry:
+    """
+    Span durations (histogram per span name) and outcome counters (per span
+    name and outcome). Finished spans are appended to ``log_path`` as JSON
+    lines; the Prometheus text exposition is rewritten to ``prom_path`` after
+    every top-level span and can also be served over HTTP.
+    """
+
+    def __init__(self, log_path: str = "", prom_path: str = "", buckets=DURATION_BUCKETS):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self.buckets = buckets
+        self.histograms = {}   # span name -> Histogram
+        self.counters = {}     # (span name, outcome) -> count
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._log_file = None   # kept open (line-buffered) while log_path stays the same
+        self._local = threading.local()
+        self.server = None
+
+    def span(self, name: str, **attrs) -> Span:
+        return Span(self, name, attrs)
+
+    def current(self):
+        """The innermost open span on this thread, or None."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def bind(self, fn):
+        """
+        Wrap ``fn`` to run under the span that is current now. Pool workers
+        start with an empty span stack, so without this their spans would be
+        top level and lose their parent.
+        """
+        parent = self.current()
+        if parent is None:
+            return fn
+
+        def run(*args, **kwargs):
+            stack = self._stack()
+            stack.append(parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stack.remove(parent)
+        return run
+
+    def observe(self, name: str, seconds: float, outcome: str = "ok"):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(self.buckets)
+            hist.observe(seconds)
+            self.counters[(name, outcome)] = self.counters.get((name, outcome), 0) + 1
+
+    def snapshot(self) -> dict:
+        """``{span: {"count", "sum", "mean", "outcomes": {outcome: n}}}``."""
+        with self._lock:
+            out = {name: {"count": h.count, "sum": h.sum, "mean": h.sum / h.count if h.count else 0.0,
+                          "outcomes": {}} for name, h in self.histograms.items()}
+            for (name, outcome), n in self.counters.items():
+                out[name]["outcomes"][outcome] = n
+            return out
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = [f"# HELP {PREFIX}_span_duration_seconds Duration of instrumented phases.",
+                 f"# TYPE {PREFIX}_span_duration_seconds histogram"]
+        with self._lock:
+            for name in sorted(self.histograms):
+                hist = self.histograms[name]
+                label = f'span="{_escape(name)}"'
+                for bound, count in hist.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f'{PREFIX}_span_duration_seconds_bucket{{{label},le="{le}"}} {count}')
+                lines.append(f"{PREFIX}_span_duration_seconds_sum{{{label}}} {hist.sum!r}")
+                lines.append(f"{PREFIX}_span_duration_seconds_count{{{label}}} {hist.count}")
+            lines += [f"# HELP {PREFIX}_span_total Finished spans by outcome.",
+                      f"# TYPE {PREFIX}_span_total counter"]
+            for (name, outcome), n in sorted(self.counters.items()):
+                lines.append(f'{PREFIX}_span_total{{span="{_escape(name)}",outcome="{_escape(outcome)}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str = None):
+        path = path or self.prom_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        text = self.prometheus()
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)   # scrapers never see a half-written file
+
+    def serve(self, port: int = METRICS_PORT, host: str = METRICS_HOST):
+        """Serve ``/metrics`` from a daemon thread; returns the server (``server_address`` has the port)."""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"[Metrics] Serving http://{host}:{self.server.server_address[1]}/metrics")
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self._io_lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, span: Span, top_level: bool):
+        self.observe(span.name, span.duration, span.outcome)
+        try:
+            if self.log_path:
+                row = {"time": time.time(), "span": span.name, "duration": round(span.duration, 6),
+                       "outcome": span.outcome, "parent": span.parent, **span.attrs}
+                line = json.dumps(row, default=str) + "\n"
+                with self._io_lock:
+                    f = self._log_file
+                    if f is None or f.name != self.log_path:
+                        if f is not None:
+                            f.close()
+                        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                        f = self._log_file = open(self.log_path, "a", encoding="utf-8", buffering=1)
+                    f.write(line)
+            if top_level and self.prom_path:
+                self.write_prometheus()
+        except OSError as e:
+            print(f"[Metrics] Export failed: {e}")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def enable_export(log_path: str = METRICS_LOG_PATH, prom_path: str = METRICS_PROM_PATH) -> MetricsRegistry:
+    """Turn on the JSONL and Prometheus file export of the process-wide registry."""
+    metrics = get_metrics()
+    metrics.log_path, metrics.prom_path = log_path, prom_path
+    return metrics
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    Return the process-wide registry (serving ``/metrics`` if ``METRICS_PORT``
+    is set). It exports no files until :func:`enable_export` is called.
+    """
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = MetricsRegistry()
+            if METRICS_PORT > 0:
+                try:
+                    _metrics.serve(METRICS_PORT)
+                except OSError as e:
+                    print(f"[Metrics] Could not serve on port {METRICS_PORT}: {e}")
+        return _metrics
@@ -1,151 +1,369 @@
-import subprocess
+import contextlib
 import os
-import shutil
-import re
+import shlex
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 
+from app.code_context import get_index
+from app.context_builder import ContextBuilder, estimate_tokens
+from app.cycle_recorder import CycleRecorder, outcome_name
+from app.metrics import get_metrics
 from app.snapshot import SnapshotManager
+from app.test_impact import TestImpactMap, is_pytest_command
+from app.test_runner import WarmTestRunner, pytest_args, run_subprocess
+from app.unified_diff import HunkFailure, apply_patches, is_safe_path, parse_patch
+from app.workspace import WorkspaceManager
+
+FILE_BLOCK = "### FILE: {path}\n{content}\n"
+# Candidate diffs requested (and evaluated in parallel) per cycle
+DEFAULT_CANDIDATES = int(os.getenv("SELF_IMPROVE_CANDIDATES", "1"))
+_OUTCOME_RANK = {'success': 0, 'partial': 1, 'fail': 2}
+
+
+def _outcome(returncode: int) -> str:
+    if returncode == 0:
+        return 'success'
+    return 'partial' if returncode < 2 else 'fail'
+
+
+def _is_app_source(path: str) -> bool:
+    return path is not None and path.startswith("app/") and path.endswith(".py") and is_safe_path(path)
+
+
+class _Candidate:
+    """One LLM diff within a cycle, with its workspace and test outcome."""
+
+    def __init__(self, index: int, options, patches: list):
+        self.index = index
+        self.options = options
+        self.patches = patches
+        self.workspace = None
+        self.outcome = 'fail'
+        self.verified = False   # outcome comes from the full suite, not just the affected tests
+
+    def changed_paths(self) -> list:
+        return [p.path for p in self.patches] + [p.old_path for p in self.patches if p.old_path]
+
+    def rank(self):
+        # success > partial > fail, then the smallest diff
+        return _OUTCOME_RANK[self.outcome], sum(p.changed_lines() for p in self.patches), self.index
+
 
 class SelfImproveEngine:
-    def __init__(self, agent, use_real_llm: bool = True, test_cmd="pytest", skip_backups: bool = False):
+    def __init__(self, agent, use_real_llm: bool = True, test_cmd="pytest", skip_backups: bool = False,
+                 select_tests: bool = True, warm_tests: bool = True, candidates: int = DEFAULT_CANDIDATES,
+                 recorder: CycleRecorder = None, metrics=None, use_cache: bool = True):
         self.agent = agent
         self.snapshot = SnapshotManager("app", "backups")
+        self.code_index = get_index("app")
+        self.context = ContextBuilder(self.code_index)
         self.test_cmd = test_cmd
         self.skip_backups = skip_backups
+        self.last_patch_result = None
+        self._workspaces = None
+        self.select_tests = select_tests
+        self._impact = None
+        self.warm_tests = warm_tests
+        self._test_runner = None
+        self.candidates = max(1, candidates)
+        self._lock = threading.Lock()  # lazy helpers shared by parallel evaluations
+        # Real cycles are logged as training data for the surrogate reward model
+        # when a recorder is given (the app entry point passes one, see app.main)
+        self.recorder = recorder
+        self.last_cycle = {"durations": {}}
+        self.metrics = metrics if metrics is not None else get_metrics()
+        # False: every cycle asks the LLM for fresh diffs instead of reusing cached replies
+        self.use_cache = use_cache
 
     def run_cycle(self):
-        # 1) Take a snapshot of current app/ for rollback
-        if not self.skip_backups:
-            backup_path = self.snapshot.create()
-        else:
-            backup_path = self.snapshot.get_latest() or self.snapshot.create()
-
-        # 2) Collect code context and file list
-        code_snippets = []
-        file_list = []
-        for dirpath, _, files in os.walk('app'):
-            for fname in files:
-                if fname.endswith('.py'):
-                    rel_path = os.path.join(dirpath, fname).replace('\\', '/')
-                    file_list.append(rel_path)
+        self.last_cycle = {"durations": {}}
+        with self.metrics.span("cycle", candidates=self.candidates) as span:
+            # 1) Take a snapshot of current app/ for rollback
+            with self._phase("snapshot"):
+                if not self.skip_backups:
+                    backup_path = self.snapshot.create()
+                else:
+                    backup_path = self.snapshot.get_latest() or self.snapshot.create()
+
+            start = time.perf_counter()
+            result = self._cycle(backup_path)
+            self.last_cycle["durations"]["total"] = time.perf_counter() - start
+            span.outcome = outcome_name(result)
+            with self._phase("record"):
+                self._record(result)
+            if not self.skip_backups:
+                # Record the outcome so retention can keep successful snapshots
+                with self._phase("gc"):
                     try:
-                        with open(rel_path, 'r', encoding='utf-8') as f:
-                            code_snippets.append(f"### FILE: {rel_path}\n{f.read()}\n")
-                    except Exception:
-                        continue
+                        self.snapshot.mark(backup_path, result if isinstance(result, str) else "fail")
+                        self.snapshot.gc()
+                    except OSError as e:   # retention is best effort; the cycle's result stands
+                        print(f"[SelfImprove] Snapshot cleanup failed: {e}")
+        return result
+
+    def _cycle(self, backup_path):
+        # 2-3) Build the prompt from the code context and pending features
+        with self._phase("context"):
+            prompt = self._build_prompt()
+        self.last_cycle["prompt_tokens"] = estimate_tokens(prompt)
+
+        # 4-5) Ask for one or more diffs; keep patches for .py files under app/
+        with self._phase("llm"):
+            outputs = self._request(prompt)
+        with self._phase("parse") as span:
+            candidates = self._parse(outputs)
+            span.outcome = "ok" if candidates else "empty"
+        if not candidates:
+            print("[SelfImprove] No valid diff found; aborting self-improve.")
+            return False
+
+        # 6) Apply each candidate in its own isolated workspace; the live tree is
+        #    untouched unless a candidate is promoted, so failures need no rollback
+        try:
+            applied = []
+            with self._phase("apply") as span:
+                for candidate in candidates:
+                    candidate.workspace = self.workspaces.create()
+                    if self._apply_patch(candidate.patches, root=candidate.workspace.root):
+                        applied.append(candidate)
+                span.outcome = "ok" if applied else "fail"
+            if not applied:
+                return False
+
+            # 7) Test the candidates in parallel on their affected tests; only the
+            #    one about to be promoted also runs the full suite
+            with self._phase("tests") as span:
+                self._evaluate_all(applied)
+                best = self._select(applied)
+                span.outcome = best.outcome
+            if best.outcome != 'success':
+                # failing tests never reach the live tree; every workspace is discarded below
+                return best.outcome
+
+            # 8) Promote the passing candidate with an atomic directory swap
+            if len(candidates) > 1:
+                print(f"[SelfImprove] Promoting candidate {best.index} (options={best.options})")
+            with self._phase("promote"):
+                self.workspaces.promote(best.workspace)
+                self.code_index.invalidate()
+            return 'success'
+        except Exception as e:
+            print(f"Error in improvement cycle: {e}")
+            return 'fail'
+        finally:
+            with self._phase("cleanup"):
+                for candidate in candidates:
+                    if candidate.workspace is not None and not candidate.workspace.promoted:
+                        candidate.workspace.discard()
+
+    @contextlib.contextmanager
+    def _phase(self, name: str):
+        """Time one cycle phase as a ``cycle.<name>`` span and in ``last_cycle["durations"]``."""
+        span = self.metrics.span(f"cycle.{name}")
+        try:
+            with span:
+                yield span
+        finally:
+            self.last_cycle["durations"][name] = span.duration
+
+    def _record(self, result):
+        if self.recorder is None:
+            return
+        try:
+            self.recorder.record(
+                temperature=getattr(self.agent, "temperature", 0.5),
+                pending=self.last_cycle.get("pending", 0),
+                prompt_tokens=self.last_cycle.get("prompt_tokens", 0),
+                outcome=result,
+                durations=self.last_cycle["durations"],
+            )
+        except OSError as e:
+            print(f"[SelfImprove] Could not record cycle: {e}")
+
+    def _build_prompt(self) -> str:
+        file_list = self.code_index.paths()
         files_header = "\n".join(f"- {p}" for p in file_list)
-        context = "".join(code_snippets)
 
-        # 3) Build a precise prompt that references actual file names and contents
+        # Build a precise prompt that references actual file names and contents
         features = self.agent.get_features()
-        feature_block = ''
-        if features:
-            feature_block = "Implement these features using existing code structure:\n" + \
-                "\n".join(f"* {f}" for f in features) + "\n"
-
-        prompt = (
-            "You have these Python files (paths + contents):\n"
-            f"{files_header}\n\n"
-            f"{context}\n\n"
+        self.last_cycle["pending"] = len(features)
+        requests = "\n".join(f"- {f}" for f in features)
+        instructions = (
             "Implement these feature requests exactly:\n"
-            + "\n".join(f"- {f}" for f in features) + "\n\n"
+            + requests + "\n\n"
             "Now, produce *only* a unified Git diff (GitHub style) that "
             "modifies or creates any needed .py files under app/ to satisfy "
             "those requests. Do NOT output any explanations, commentary, or "
             "fences—output must start with `diff --git a/...` and be valid "
             "patch input to `patch -p1`."
         )
+        # Files most relevant to the requests go in whole, the rest as outlines
+        context = self.context.build(requests, FILE_BLOCK,
+                                     reserved=estimate_tokens(files_header + instructions))
+        return (
+            "You have these Python files (paths + contents):\n"
+            f"{files_header}\n\n"
+            f"{context}\n\n"
+            + instructions
+        )
 
-        raw_diff = self.agent.ask_llm(prompt)
-        print("[SelfImprove] Raw diff from LLM:\n", raw_diff)
-
-        # 4) Clean diff: remove any fences or notes
-        lines = raw_diff.splitlines()
-        diff_lines = [l for l in lines if not re.match(r'^(```|Note:|#)', l.strip())]
-
-        # 5) Split into diff chunks
-        chunks = []
-        current = []
-        for line in diff_lines:
-            if line.startswith('diff --git '):
-                if current:
-                    chunks.append(current)
-                current = [line]
-            elif current:
-                current.append(line)
-        if current:
-            chunks.append(current)
-
-        # 6) Keep only chunks for existing or new .py files under app/
-        valid_chunks = []
-        for chunk in chunks:
-            header = chunk[0]
-            m = re.search(r'diff --git a/(?P<path>app/.*\.py) b/(?P<path2>app/.*\.py)', header)
-            if m:
-                path = m.group('path')
-                # accept both new and existing files
-                valid_chunks.append("\n".join(chunk))
-            else:
-                continue
+    def _request(self, prompt: str) -> list:
+        """Request ``self.candidates`` diffs (concurrently, with varied sampling) as ``(options, text)``."""
+        kwargs = {} if self.use_cache else {"use_cache": False}
+        if self.candidates == 1:
+            outputs = [(None, self.agent.ask_llm(prompt, **kwargs))]
+        else:
+            options = self._sampling_options(self.candidates)
+            with ThreadPoolExecutor(max_workers=len(options)) as pool:
+                ask = self.metrics.bind(self.agent.ask_llm)
+                futures = [pool.submit(ask, prompt, options=o, **kwargs) for o in options]
+            outputs = []
+            for opts, future in zip(options, futures):
+                try:
+                    outputs.append((opts, future.result()))
+                except CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[SelfImprove] Candidate request {opts} failed: {e}")
+        return outputs
 
-        diff_text = "\n".join(valid_chunks)
-        print("[SelfImprove] Filtered diff to apply:\n", diff_text)
-        if not diff_text.strip():
-            print("[SelfImprove] No valid diff found; aborting self-improve.")
-            return False
+    def _parse(self, outputs: list) -> list:
+        """Candidates for the replies that contain patches to .py files under app/."""
+        candidates = []
+        for index, (opts, raw_diff) in enumerate(outputs):
+            print("[SelfImprove] Raw diff from LLM:\n", raw_diff)
+            # Parse the diff once; fences and prose outside hunks are ignored
+            patches = [p for p in parse_patch(raw_diff) if _is_app_source(p.path)
+                       and (p.old_path is None or _is_app_source(p.old_path))]
+            print("[SelfImprove] Patches to apply:", ", ".join(p.path for p in patches) or "none")
+            if patches:
+                candidates.append(_Candidate(index, opts, patches))
+        return candidates
 
-        # 7) Dry-run patch
-        strip = 1
-        dry = subprocess.Popen(["patch", f"-p{strip}", "--dry-run"], stdin=subprocess.PIPE, text=True)
-        out, _ = dry.communicate(diff_text)
-        if dry.returncode != 0:
-            print("[SelfImprove] Patch dry-run failed:\n", out)
-            return False
+    def _sampling_options(self, k: int) -> list:
+        """Spread ``k`` temperatures around the agent's current one, each with its own seed."""
+        base = float(getattr(self.agent, "temperature", 0.5))
+        step = 0.6 / (k - 1)
+        return [{"temperature": round(min(1.0, max(0.0, base - 0.3 + i * step)), 3), "seed": i}
+                for i in range(k)]
 
-        # 8) Apply patch
+    def _evaluate_all(self, candidates: list):
+        """Run each candidate's tests, in parallel across cores when there are several."""
+        if len(candidates) == 1:
+            self._evaluate(candidates[0])
+            return
+        with ThreadPoolExecutor(max_workers=min(len(candidates), os.cpu_count() or 1)) as pool:
+            evaluate = self.metrics.bind(self._evaluate)   # test_run spans stay under cycle.tests
+            futures = [pool.submit(evaluate, c) for c in candidates]
+        for candidate, future in zip(candidates, futures):
+            try:
+                future.result()
+            except CancelledError:
+                raise
+            except Exception as e:
+                print(f"[SelfImprove] Candidate {candidate.index} evaluation failed: {e}")
+
+    def _evaluate(self, candidate):
+        """
+        Set ``candidate.outcome`` from the tests affected by its changes alone;
+        any failure there rejects it. The full suite runs here only when no
+        tests were selected (or none were collected); otherwise :meth:`_select`
+        runs it for the candidate about to be promoted.
+        """
+        root = candidate.workspace.root
+        selected = self._affected_tests(root, candidate.changed_paths())
+        if selected:
+            print(f"[SelfImprove] Running {len(selected)} affected test file(s)")
+            quick = self._run_tests(cwd=root, paths=selected)
+            if quick.returncode != 5:  # 5: no tests collected
+                candidate.outcome = _outcome(quick.returncode)
+                return
+        candidate.outcome = _outcome(self._run_tests(cwd=root).returncode)
+        candidate.verified = True
+
+    def _select(self, candidates: list) -> _Candidate:
+        """The best candidate; a success on the affected tests must also pass the full suite."""
+        while True:
+            best = min(candidates, key=_Candidate.rank)
+            if best.outcome != 'success' or best.verified:
+                return best
+            print(f"[SelfImprove] Running the full suite before promoting candidate {best.index}")
+            best.outcome = _outcome(self._run_tests(cwd=best.workspace.root).returncode)
+            best.verified = True
+
+    def _affected_tests(self, root, changed_paths):
+        if not self.select_tests or not is_pytest_command(self.test_cmd):
+            return []
         try:
-            patch_result = self._apply_patch(diff_text)
-            if not patch_result:
-                self._restore(backup_path)
-                return 'fail'
-
-            # 9) Run tests
-            test_result = self._run_tests()
-            if test_result.returncode == 0:
-                return 'success'
-            elif test_result.returncode < 2:
-                return 'partial'
-            else:
-                self._restore(backup_path)
-                return 'fail'
+            with self._lock:
+                if self._impact is None:
+                    cache = os.path.join(self.workspaces.base_dir, "test_impact.json")
+                    self._impact = TestImpactMap("app", "tests", cache_path=cache)
+                return self._impact.affected_tests(root, changed_paths)
         except Exception as e:
-            print(f"Error in improvement cycle: {e}")
-            self._restore(backup_path)
-            return 'fail'
+            print(f"[SelfImprove] Test selection failed, running full suite: {e}")
+            return []
+
+    @property
+    def workspaces(self) -> WorkspaceManager:
+        if self._workspaces is None:
+            self._workspaces = WorkspaceManager("app")
+        return self._workspaces
+
+    @property
+    def test_runner(self):
+        """Warm forkserver pytest runner, or None where it is unavailable."""
+        with self._lock:
+            if self._test_runner is None and self.warm_tests:
+                try:
+                    self._test_runner = WarmTestRunner()
+                except (RuntimeError, ValueError) as e:
+                    print(f"[SelfImprove] Warm test runner unavailable, using subprocesses: {e}")
+                    self.warm_tests = False
+            return self._test_runner
 
     def _restore(self, backup_path):
-        shutil.rmtree('app')
-        shutil.copytree(backup_path, 'app')
-
-    def _apply_patch(self, diff_text: str) -> bool:
-        """Apply a unified diff using the patch command."""
-        proc = subprocess.Popen(
-            ["patch", "-p1"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-        )
-        out, _ = proc.communicate(diff_text)
-        if proc.returncode != 0:
-            print("[SelfImprove] Patch failed:\n", out)
+        try:
+            self.snapshot.restore(backup_path)
+        finally:
+            self.code_index.invalidate()
+
+    def _apply_patch(self, diff, root: str = ".") -> bool:
+        """
+        Apply a unified diff (text or parsed patches) in-process.
+        The structured result is kept in ``self.last_patch_result``.
+        """
+        patches = parse_patch(diff) if isinstance(diff, str) else diff
+        result = apply_patches(patches, root=root, base="app")
+        if not patches:
+            result.failures.append(HunkFailure(None, None, "no file patches found"))
+        self.last_patch_result = result
+        if result and result.files and os.path.abspath(root) == os.getcwd():
+            self.code_index.invalidate()
+        if not result:
+            print("[SelfImprove] Patch failed:\n", "\n".join(map(repr, result.failures)))
             return False
         return True
 
-    def _run_tests(self):
-        """Run the configured test command."""
-        return subprocess.run(
-            self.test_cmd,
-            shell=True,
-            text=True,
-            capture_output=True,
-        )
+    def _run_tests(self, cwd: str = None, paths=None):
+        """
+        Run the configured test command, restricted to ``paths`` when given,
+        and return a :class:`app.test_runner.TestRunResult`. pytest commands
+        go to the warm forked runner; anything else runs as a shell command.
+        Polls the agent's ``cancel_event`` (if any) and kills the test process
+        (group) when it is set, raising ``CancelledError``.
+        """
+        cancel_event = getattr(self.agent, "cancel_event", None)
+        args = pytest_args(self.test_cmd) if self.warm_tests else None
+        with self.metrics.span("cycle.test_run", scope="affected" if paths else "full") as span:
+            if args is not None and self.test_runner is not None:
+                result = self.test_runner.run(args + list(paths or ()), cwd=cwd, cancel_event=cancel_event)
+            else:
+                cmd = self.test_cmd
+                if paths:
+                    cmd += " " + " ".join(shlex.quote(p) for p in paths)
+                result = run_subprocess(cmd, cwd=cwd, cancel_event=cancel_event)
+            span.outcome = "passed" if result.returncode == 0 else f"rc{result.returncode}"
+        print(f"[SelfImprove] Tests: {result!r}")
+        return result
@@ -35,7 +35,8 @@ class SelfImproveEnv(gym.Env):
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         self.last_reward = 0.0
-        self.pending = len(self.agent.get_features())
+        # other processes (e.g. the chat UI) may have added features since the last episode
+        self.pending = self._pending_features(refresh=True)
         self.step_count = 0
         self.current_episode += 1
 
@@ -50,11 +51,13 @@ class SelfImproveEnv(gym.Env):
     def step(self, action):
         # 1) Apply the chosen temperature
         temp = float(action[0])
-        self.agent.temperature = temp
+        self.temperature = temp
+        if self.agent is not None:
+            self.agent.temperature = temp
 
         # 2) Run the self-improve step (unless we’re still in warm-up)
         try:
-            result = self.agent.improver.run_cycle() if self.current_episode > self.warmup_episodes else True
+            result = self._run_cycle(temp) if self.current_episode > self.warmup_episodes else True
         except Exception:
             result = False
 
@@ -81,7 +84,7 @@ class SelfImproveEnv(gym.Env):
 
         # 5) Update bookkeeping
         self.last_reward = reward
-        self.pending     = len(self.agent.get_features())
+        self.pending     = self._pending_features()
 
         # 6) Build new observation
         progress = self.step_count / self.max_steps
@@ -95,9 +98,16 @@ class SelfImproveEnv(gym.Env):
 
 
 
+    def _run_cycle(self, temperature: float):
+        """One self-improve cycle at ``temperature``; subclasses may simulate it."""
+        return self.agent.improver.run_cycle()
+
+    def _pending_features(self, refresh: bool = False) -> int:
+        return self.agent.count_features(refresh=refresh)
+
     def render(self, mode='human'):
         print(
             f"Episode {self.current_episode} | Step {self.step_count} | "
-            f"Temp {getattr(self.agent, 'temperature', None):.2f} | "
+            f"Temp {getattr(self, 'temperature', 0.0):.2f} | "
             f"Reward {self.last_reward} | Pending {self.pending}"
         )
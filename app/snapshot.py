@@ -1,16 +1,46 @@
+import hashlib
+import json
 import os
 import shutil
+import time
 from datetime import datetime
 
+_IGNORED_DIRS = {"__pycache__"}
+# A file's (size, mtime) is only trusted if it was last modified this long
+# before the previous manifest was written (same-tick rewrites are invisible).
+_RACY_WINDOW_NS = 2_000_000_000
+# Unreferenced blobs younger than this are kept by gc(): a concurrent create()
+# may have stored them without having written its manifest yet.
+_BLOB_GRACE_SECONDS = 600
+
+
 class SnapshotManager:
-    def __init__(self, src_dir: str, backup_dir: str):
+    """
+    Content-addressed snapshots of ``src_dir``.
+
+    Every file is stored once under ``backup_dir/objects/<sha256>``; a snapshot
+    is a JSON manifest in ``backup_dir/manifests/`` plus a browsable
+    ``backup_dir/snapshot_*`` directory whose files are hard links to those
+    blobs (copies where linking is not supported). Files whose size and mtime
+    match the previous manifest are not even re-hashed, so creating a snapshot
+    costs roughly the number of changed bytes. Treat snapshot directories as
+    read-only: editing a linked file in place would alter the stored blob.
+    """
+
+    def __init__(self, src_dir: str, backup_dir: str, keep_last: int = 20, keep_successful: bool = True):
         self.src_dir = src_dir
         self.backup_dir = backup_dir
-        os.makedirs(self.backup_dir, exist_ok=True)
+        self.keep_last = keep_last
+        self.keep_successful = keep_successful
+        self.objects_dir = os.path.join(backup_dir, "objects")
+        self.manifests_dir = os.path.join(backup_dir, "manifests")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        self._last_manifest = None
 
     def create(self) -> str:
         """
-        Copy the entire src_dir into a timestamped folder under backup_dir.
+        Snapshot src_dir into a timestamped folder under backup_dir.
         Returns the path to the new snapshot folder.
         """
         now = datetime.utcnow()
@@ -18,16 +48,208 @@ class SnapshotManager:
         dst = os.path.join(self.backup_dir, base)
         i = 1
         # ensure unique folder name
-        while os.path.exists(dst):
+        while os.path.exists(dst) or os.path.exists(self._manifest_path(dst)):
             dst = os.path.join(self.backup_dir, f"{base}_{i}")
             i += 1
-        shutil.copytree(self.src_dir, dst)
+
+        previous = self._last_manifest or self._load_latest_manifest()
+        prev_files = previous["files"] if previous else {}
+        trusted_before_ns = int(previous["created"] * 1e9) - _RACY_WINDOW_NS if previous else 0
+        files = {}
+        for rel, path, st in self._walk(self.src_dir):
+            prev = prev_files.get(rel)
+            if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns \
+                    and st.st_mtime_ns < trusted_before_ns \
+                    and os.path.exists(self._object_path(prev["hash"])):
+                digest = prev["hash"]
+            else:
+                digest = self._store_blob(path)
+            files[rel] = {"hash": digest, "size": st.st_size,
+                          "mtime_ns": st.st_mtime_ns, "mode": st.st_mode & 0o777}
+
+        os.makedirs(dst)
+        for rel, meta in files.items():
+            target = os.path.join(dst, rel)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self._link_or_copy(self._object_path(meta["hash"]), target)
+
+        manifest = {"name": os.path.basename(dst), "created": time.time(), "status": None, "files": files}
+        self._write_manifest(dst, manifest)
+        self._last_manifest = manifest
         return dst
 
     def restore(self, snapshot_path: str):
         """
-        Restore the src_dir from a given snapshot folder.
+        Restore the src_dir from a given snapshot folder. Only files whose
+        content differs from the snapshot are rewritten; files that are not in
+        the snapshot are removed.
         """
-        if os.path.exists(self.src_dir):
-            shutil.rmtree(self.src_dir)
-        shutil.copytree(snapshot_path, self.src_dir)
+        manifest = self._read_manifest(snapshot_path)
+        if manifest is None:
+            # Legacy full-copy snapshot without a manifest
+            if os.path.exists(self.src_dir):
+                shutil.rmtree(self.src_dir)
+            shutil.copytree(snapshot_path, self.src_dir)
+            return
+
+        files = manifest["files"]
+        for rel, path, st in list(self._walk(self.src_dir)):
+            if rel not in files:
+                os.remove(path)
+        for rel, meta in files.items():
+            target = os.path.join(self.src_dir, rel)
+            if os.path.isfile(target) and os.path.getsize(target) == meta["size"] \
+                    and _hash_file(target) == meta["hash"]:
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp = target + ".restore-tmp"
+            shutil.copyfile(self._object_path(meta["hash"]), tmp)
+            os.chmod(tmp, meta["mode"])
+            os.replace(tmp, target)
+        _remove_empty_dirs(self.src_dir)
+
+    def get_latest(self):
+        """Return the path of the most recent snapshot, or None if there is none."""
+        manifests = self._manifests()
+        if not manifests:
+            return None
+        return os.path.join(self.backup_dir, manifests[-1]["name"])
+
+    def mark(self, snapshot_path: str, status: str):
+        """Record the outcome of the cycle a snapshot was taken for (e.g. ``success``)."""
+        manifest = self._read_manifest(snapshot_path)
+        if manifest is not None:
+            manifest["status"] = status
+            self._write_manifest(snapshot_path, manifest)
+
+    def gc(self, keep_last: int = None, keep_successful: bool = None,
+           blob_grace: float = _BLOB_GRACE_SECONDS) -> int:
+        """
+        Delete snapshots beyond the newest ``keep_last`` (successful ones are kept
+        when ``keep_successful``), then drop blobs no manifest references and
+        that were not stored or reused in the last ``blob_grace`` seconds.
+        Returns the number of snapshots removed.
+        """
+        keep_last = self.keep_last if keep_last is None else keep_last
+        keep_successful = self.keep_successful if keep_successful is None else keep_successful
+        manifests = self._manifests()
+        cutoff = max(len(manifests) - keep_last, 0)
+        removed = 0
+        kept = []
+        for i, manifest in enumerate(manifests):
+            if i >= cutoff or (keep_successful and manifest.get("status") == "success"):
+                kept.append(manifest)
+                continue
+            path = os.path.join(self.backup_dir, manifest["name"])
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.remove(self._manifest_path(path))
+            except FileNotFoundError:   # another gc got there first
+                continue
+            removed += 1
+        if self._last_manifest is not None and \
+                self._last_manifest["name"] not in {m["name"] for m in kept}:
+            self._last_manifest = None
+
+        referenced = {meta["hash"] for m in kept for meta in m["files"].values()}
+        expire_before = time.time() - blob_grace
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            try:
+                names = os.listdir(prefix_dir)
+            except FileNotFoundError:
+                continue
+            for name in names:
+                # skip blobs another process is still writing
+                if name.endswith(".tmp") or prefix + name in referenced:
+                    continue
+                blob = os.path.join(prefix_dir, name)
+                try:
+                    if os.stat(blob).st_mtime < expire_before:
+                        os.remove(blob)
+                except FileNotFoundError:
+                    pass
+            try:
+                os.rmdir(prefix_dir)   # only succeeds once the prefix is empty
+            except OSError:
+                pass
+        return removed
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _walk(self, root):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if d not in _IGNORED_DIRS)
+            for fname in sorted(filenames):
+                path = os.path.join(dirpath, fname)
+                rel = os.path.relpath(path, root).replace("\\", "/")
+                yield rel, path, os.stat(path)
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _store_blob(self, path: str) -> str:
+        digest = _hash_file(path)
+        blob = self._object_path(digest)
+        try:
+            os.utime(blob)   # reused: restart gc's grace period until our manifest exists
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            tmp = f"{blob}.{os.getpid()}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, blob)
+        return digest
+
+    @staticmethod
+    def _link_or_copy(blob: str, target: str):
+        try:
+            os.link(blob, target)
+        except OSError:
+            shutil.copyfile(blob, target)
+
+    def _manifest_path(self, snapshot_path: str) -> str:
+        return os.path.join(self.manifests_dir, os.path.basename(os.path.normpath(snapshot_path)) + ".json")
+
+    def _read_manifest(self, snapshot_path: str):
+        try:
+            with open(self._manifest_path(snapshot_path), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_manifest(self, snapshot_path: str, manifest: dict):
+        path = self._manifest_path(snapshot_path)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, path)
+
+    def _manifests(self) -> list:
+        """All manifests, oldest first."""
+        manifests = []
+        for fname in os.listdir(self.manifests_dir):
+            if fname.endswith(".json"):
+                m = self._read_manifest(fname[:-len(".json")])
+                if m is not None:
+                    manifests.append(m)
+        manifests.sort(key=lambda m: (m["created"], m["name"]))
+        return manifests
+
+    def _load_latest_manifest(self):
+        manifests = self._manifests()
+        return manifests[-1] if manifests else None
+
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _remove_empty_dirs(root: str):
+    for dirpath, _, _ in os.walk(root, topdown=False):
+        if dirpath != root and not os.listdir(dirpath):
+            os.rmdir(dirpath)
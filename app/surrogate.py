@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from app.cycle_recorder import CYCLE_LOG_PATH, OUTCOMES, CycleRecorder
+from app.self_improve_env import SelfImproveEnv
+from app.vec_env import FAIL, PARTIAL, SUCCESS
+
+SURROGATE_PATH = os.getenv("SURROGATE_PATH", "surrogate_model.json")
+
+
+def _features(temperature, pending, prompt_tokens) -> np.ndarray:
+    t = np.asarray(temperature, dtype=np.float64)
+    p = np.broadcast_to(np.asarray(pending, dtype=np.float64), t.shape)
+    n = np.broadcast_to(np.asarray(prompt_tokens, dtype=np.float64), t.shape)
+    return np.stack([t, t * t, p, np.log1p(n)], axis=-1)
+
+
+class SurrogateModel:
+    """
+    Multinomial logistic regression of P(fail, partial, success) on
+    temperature, temperature², pending features and log prompt size, fitted
+    by full-batch gradient descent with L2 regularisation. Also keeps the mean
+    recorded duration of each cycle phase.
+    """
+
+    def __init__(self, weights=None, mean=None, scale=None, durations=None):
+        self.weights = np.zeros((5, 3)) if weights is None else np.asarray(weights, dtype=np.float64)
+        self.mean = np.zeros(4) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.scale = np.ones(4) if scale is None else np.asarray(scale, dtype=np.float64)
+        self.durations = durations or {}
+
+    def fit(self, records: list, l2: float = 1e-2, lr: float = 0.5, iterations: int = 2000):
+        if not records:
+            raise ValueError("no cycle records to fit")
+        x = _features([r["temperature"] for r in records], [r["pending"] for r in records],
+                      [r["prompt_tokens"] for r in records])
+        y = np.array([OUTCOMES.index(r["outcome"]) for r in records])
+        self.mean = x.mean(axis=0)
+        self.scale = np.where(x.std(axis=0) > 0, x.std(axis=0), 1.0)
+        design = self._design(x)
+        onehot = np.eye(3)[y]
+        w = np.zeros((design.shape[1], 3))
+        for _ in range(iterations):
+            grad = design.T @ (_softmax(design @ w) - onehot) / len(y)
+            grad[1:] += l2 * w[1:]
+            w -= lr * grad
+        self.weights = w
+        keys = {k for r in records for k in r.get("durations", {})}
+        self.durations = {k: float(np.mean([r["durations"][k] for r in records if k in r.get("durations", {})]))
+                          for k in sorted(keys)}
+        return self
+
+    def predict_proba(self, temperature, pending, prompt_tokens) -> np.ndarray:
+        """``(..., 3)`` array of fail/partial/success probabilities."""
+        return _softmax(self._design(_features(temperature, pending, prompt_tokens)) @ self.weights)
+
+    def sample(self, rng, temperature, pending, prompt_tokens) -> np.ndarray:
+        """Draw outcome codes (vectorised inverse-CDF sampling)."""
+        cdf = np.cumsum(self.predict_proba(temperature, pending, prompt_tokens), axis=-1)
+        u = rng.random(cdf.shape[:-1])[..., None]
+        return np.minimum((u > cdf).sum(axis=-1), SUCCESS).astype(np.int8)
+
+    def save(self, path: str = SURROGATE_PATH):
+        data = {"weights": self.weights.tolist(), "mean": self.mean.tolist(), "scale": self.scale.tolist(),
+                "durations": self.durations}
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = SURROGATE_PATH) -> "SurrogateModel":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def _design(self, x: np.ndarray) -> np.ndarray:
+        z = (x - self.mean) / self.scale
+        return np.concatenate([np.ones(z.shape[:-1] + (1,)), z], axis=-1)
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    e = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+class SurrogateCycleExecutor:
+    """:class:`app.vec_env.VecSelfImproveEnv` executor that samples outcomes from a surrogate."""
+
+    def __init__(self, model: SurrogateModel, prompt_tokens: int = 4000, seed=None):
+        self.model = model
+        self.prompt_tokens = prompt_tokens
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, temperatures: np.ndarray, pending: np.ndarray):
+        return self.model.sample(self.rng, temperatures, pending, self.prompt_tokens), pending
+
+
+class SurrogateSelfImproveEnv(SelfImproveEnv):
+    """SelfImproveEnv whose cycles are sampled from a :class:`SurrogateModel` instead of run."""
+
+    def __init__(self, model: SurrogateModel, pending: int = 1, prompt_tokens: int = 4000, seed=None,
+                 max_steps: int = 50, warmup_episodes: int = 0):
+        super().__init__(agent=None, use_real_llm=False, max_steps=max_steps, warmup_episodes=warmup_episodes)
+        self.model = model
+        self.fixed_pending = pending
+        self.prompt_tokens = prompt_tokens
+        self.rng = np.random.default_rng(seed)
+
+    def reset(self, seed=None, options=None):
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        return super().reset(seed=seed, options=options)
+
+    def _pending_features(self, refresh: bool = False) -> int:
+        return self.fixed_pending
+
+    def _run_cycle(self, temperature: float):
+        code = int(self.model.sample(self.rng, np.array([temperature]), self.fixed_pending, self.prompt_tokens)[0])
+        return OUTCOMES[code] if code != FAIL else False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the surrogate reward model from recorded cycles")
+    parser.add_argument("--log", default=CYCLE_LOG_PATH, help="JSONL written by CycleRecorder")
+    parser.add_argument("--out", default=SURROGATE_PATH)
+    args = parser.parse_args()
+
+    records = CycleRecorder.load(args.log)
+    model = SurrogateModel().fit(records)
+    model.save(args.out)
+    counts = {o: sum(r["outcome"] == o for r in records) for o in OUTCOMES}
+    print(f"[Surrogate] Fitted on {len(records)} cycles {counts}; saved to {args.out}")
+    for temp in (0.1, 0.5, 0.9):
+        p = model.predict_proba(temp, records[-1]["pending"], records[-1]["prompt_tokens"])
+        print(f"  T={temp:.1f}: fail {p[FAIL]:.2f}  partial {p[PARTIAL]:.2f}  success {p[SUCCESS]:.2f}")
+    print("  mean durations (s):", ", ".join(f"{k} {v:.1f}" for k, v in model.durations.items()) or "n/a")
+
+
+if __name__ == "__main__":
+    main()
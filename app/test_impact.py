@@ -0,0 +1,161 @@
+import ast
+import json
+import os
+
+from app.test_runner import pytest_args
+
+_IGNORED_DIRS = {"__pycache__"}
+
+
+class TestImpactMap:
+    """
+    Import-dependency map from ``src_dir`` modules to the ``tests_dir`` files
+    that exercise them (directly or through other modules).
+
+    Parsed imports are cached per file by ``(mtime_ns, size)`` and persisted to
+    ``cache_path``, so rebuilding the map for a candidate workspace only
+    re-parses the files its patch touched.
+    """
+    __test__ = False  # not a pytest test class
+
+    def __init__(self, src_dir: str = "app", tests_dir: str = "tests", cache_path: str = None):
+        self.src_dir = src_dir
+        self.tests_dir = tests_dir
+        self.cache_path = cache_path
+        self._cache = self._load_cache()
+        self._dirty = False
+
+    def affected_tests(self, root: str, changed_paths) -> list[str]:
+        """
+        Return the test files under ``root`` affected by ``changed_paths``
+        (paths relative to ``root``), sorted. Changed test files select
+        themselves.
+        """
+        modules = {}   # module name -> relative path
+        imports = {}   # relative path -> set of imported module names
+        for rel in self._python_files(root):
+            imports[rel] = self._imports_of(root, rel)
+            if rel.startswith(self.src_dir + "/"):
+                modules[_module_name(rel)] = rel
+        self._save_cache()
+
+        # reverse edges: module path -> files importing it
+        importers = {}
+        for rel, names in imports.items():
+            for name in names:
+                target = modules.get(name)
+                if target is not None and target != rel:
+                    importers.setdefault(target, set()).add(rel)
+
+        affected = set()
+        seen = set()
+        pending = [p.replace("\\", "/") for p in changed_paths]
+        while pending:
+            rel = pending.pop()
+            if rel in seen:
+                continue
+            seen.add(rel)
+            if _is_test_file(rel, self.tests_dir):
+                affected.add(rel)
+            pending.extend(importers.get(rel, ()))
+        return sorted(affected)
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _python_files(self, root: str):
+        for top in (self.src_dir, self.tests_dir):
+            for dirpath, dirnames, filenames in os.walk(os.path.join(root, top), followlinks=True):
+                dirnames[:] = sorted(d for d in dirnames if d not in _IGNORED_DIRS)
+                for fname in sorted(filenames):
+                    if fname.endswith(".py"):
+                        yield os.path.relpath(os.path.join(dirpath, fname), root).replace("\\", "/")
+
+    def _imports_of(self, root: str, rel: str) -> set:
+        path = os.path.join(root, rel)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return set()
+        cached = self._cache.get(rel)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return set(cached[2])
+        names = _parse_imports(path, _module_name(rel))
+        self._cache[rel] = [st.st_mtime_ns, st.st_size, sorted(names)]
+        self._dirty = True
+        return names
+
+    def _load_cache(self) -> dict:
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        if not self.cache_path or not self._dirty:
+            return
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f)
+        os.replace(tmp, self.cache_path)
+        self._dirty = False
+
+
+def _module_name(rel: str) -> str:
+    name = rel[:-3].replace("/", ".")
+    return name[:-len(".__init__")] if name.endswith(".__init__") else name
+
+
+def _is_test_file(rel: str, tests_dir: str) -> bool:
+    fname = rel.rsplit("/", 1)[-1]
+    return rel.startswith(tests_dir + "/") and (fname.startswith("test_") or fname == "conftest.py")
+
+
+def _parse_imports(path: str, module: str) -> set:
+    """Module names imported by a file; ``from a import b`` yields both ``a`` and ``a.b``."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+    package = module if path.endswith("__init__.py") else module.rpartition(".")[0]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                parts = alias.name.split(".")
+                names.update(".".join(parts[:i]) for i in range(1, len(parts) + 1))
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                anchor = package.split(".") if package else []
+                anchor = anchor[:len(anchor) - node.level + 1] if node.level > 1 else anchor
+                base = ".".join(p for p in anchor + ([base] if base else []) if p)
+            if base:
+                names.add(base)
+            for alias in node.names:
+                names.add(f"{base}.{alias.name}" if base else alias.name)
+    return names
+
+
+# pytest options whose value is the following token
+_VALUE_OPTIONS = {
+    "-k", "-m", "-p", "-c", "-o", "-W", "-r", "-n", "--rootdir", "--maxfail", "--tb",
+    "--durations", "--deselect", "--ignore", "--junitxml", "--basetemp", "--import-mode",
+}
+
+
+def is_pytest_command(cmd: str) -> bool:
+    """True if ``cmd`` runs pytest without already naming test paths."""
+    args = pytest_args(cmd)
+    if args is None:
+        return False
+    previous = None
+    for arg in args:
+        if not arg.startswith("-") and previous not in _VALUE_OPTIONS:
+            return False  # positional test path
+        previous = arg
+    return True
@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import CancelledError
+
+# Heavy third-party modules imported once by the fork server; every test run
+# forks from that warm parent instead of paying interpreter + import startup.
+# Project modules (app.*) are deliberately NOT preloaded so each run sees the
+# candidate's code.
+PRELOAD = ("numpy", "sqlalchemy", "requests", "pytest")
+_OUTPUT_LIMIT = 64 * 1024
+
+
+class TestRunResult:
+    """Structured outcome of one test run; ``returncode`` follows pytest's exit codes."""
+    __test__ = False  # not a pytest test class
+
+    def __init__(self, returncode: int, passed: int = 0, failed: int = 0, errors: int = 0,
+                 skipped: int = 0, duration: float = 0.0, durations: dict = None,
+                 stdout: str = "", stderr: str = ""):
+        self.returncode = returncode
+        self.passed = passed
+        self.failed = failed
+        self.errors = errors
+        self.skipped = skipped
+        self.duration = duration
+        self.durations = durations or {}
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def as_dict(self) -> dict:
+        return {"returncode": self.returncode, "passed": self.passed, "failed": self.failed,
+                "errors": self.errors, "skipped": self.skipped, "duration": self.duration}
+
+    def __repr__(self):
+        return (f"TestRunResult(rc={self.returncode}, passed={self.passed}, failed={self.failed}, "
+                f"errors={self.errors}, skipped={self.skipped}, {self.duration:.2f}s)")
+
+
+class WarmTestRunner:
+    """
+    Runs pytest in a fresh child forked from a long-lived, pre-imported
+    ``forkserver`` parent. Each request gets a clean process (no state leaks
+    between candidates) and results come back over a pipe as a
+    :class:`TestRunResult`. The child leads its own session, so cancelling
+    also kills any processes the tests started.
+    """
+    __test__ = False
+
+    def __init__(self, preload=PRELOAD):
+        if "forkserver" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("forkserver start method is not available on this platform")
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._ctx.set_forkserver_preload(list(preload))
+
+    def run(self, args: list, cwd: str = None, cancel_event=None) -> TestRunResult:
+        reader, writer = self._ctx.Pipe(duplex=False)
+        proc = self._ctx.Process(target=_run_pytest, args=(list(args), cwd or os.getcwd(), writer), daemon=True)
+        start = time.perf_counter()
+        proc.start()
+        writer.close()
+        try:
+            while not reader.poll(0.2):
+                if cancel_event is not None and cancel_event.is_set():
+                    kill_process_tree(proc)
+                    raise CancelledError("test run cancelled")
+                if not proc.is_alive() and not reader.poll(0):
+                    break
+            data = reader.recv() if reader.poll(0) else None
+        except EOFError:
+            data = None
+        finally:
+            reader.close()
+            proc.join()
+        if data is None:
+            # child died before reporting (segfault, os._exit, ...): pytest's "internal error"
+            return TestRunResult(3, duration=time.perf_counter() - start,
+                                 stderr=f"test worker exited with code {proc.exitcode}")
+        return TestRunResult(**data)
+
+
+class _Collector:
+    """pytest plugin that tallies outcomes and per-test durations."""
+
+    def __init__(self):
+        self.counts = {"passed": 0, "failed": 0, "errors": 0, "skipped": 0}
+        self.durations = {}
+
+    def pytest_runtest_logreport(self, report):
+        self.durations[report.nodeid] = self.durations.get(report.nodeid, 0.0) + report.duration
+        if report.when == "call":
+            key = "passed" if report.passed else "skipped" if report.skipped else "failed"
+            self.counts[key] += 1
+        elif report.failed:
+            self.counts["errors"] += 1
+        elif report.skipped and report.when == "setup":
+            self.counts["skipped"] += 1
+
+    def pytest_collectreport(self, report):
+        if report.failed:
+            self.counts["errors"] += 1
+
+
+def _run_pytest(args, cwd, conn):
+    """Child entry point: run pytest in ``cwd`` and send the results back."""
+    if os.name == "posix":
+        os.setsid()   # own process group, killed as a whole on cancel
+    # Drop project modules the fork server may have imported to unpickle us,
+    # so `import app...` resolves against the workspace under test.
+    for name in [m for m in sys.modules if m == "app" or m.startswith("app.")]:
+        del sys.modules[name]
+    os.chdir(cwd)
+    sys.path.insert(0, cwd)
+
+    out = tempfile.TemporaryFile()
+    os.dup2(out.fileno(), 1)
+    os.dup2(out.fileno(), 2)
+    import pytest
+
+    collector = _Collector()
+    start = time.perf_counter()
+    try:
+        returncode = int(pytest.main(args, plugins=[collector]))
+    except BaseException as e:
+        print(f"pytest crashed: {e!r}")
+        returncode = 3
+    duration = time.perf_counter() - start
+    sys.stdout.flush()
+    sys.stderr.flush()
+    out.seek(0)
+    text = out.read()[-_OUTPUT_LIMIT:].decode("utf-8", "replace")
+    conn.send(dict(returncode=returncode, duration=duration, durations=collector.durations,
+                   stdout=text, **collector.counts))
+    conn.close()
+
+
+def pytest_args(cmd: str):
+    """
+    Return the arguments after ``pytest`` if ``cmd`` invokes pytest
+    (``pytest ...`` or ``python -m pytest ...``), else None.
+    """
+    try:
+        tokens = shlex.split(cmd)
+    except ValueError:
+        return None
+    if not tokens:
+        return None
+    if os.path.basename(tokens[0]) in ("pytest", "py.test"):
+        return tokens[1:]
+    if len(tokens) > 2 and os.path.basename(tokens[0]).startswith("python") and tokens[1:3] == ["-m", "pytest"]:
+        return tokens[3:]
+    return None
+
+
+def kill_process_tree(proc):
+    """Kill ``proc`` together with the processes it spawned (its process group on POSIX)."""
+    if os.name == "posix":
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+            return
+        except (ProcessLookupError, PermissionError):
+            pass   # not (yet) leading its own group: kill the process itself
+    try:
+        proc.kill()
+    except (ProcessLookupError, OSError):
+        pass
+
+
+def run_subprocess(cmd: str, cwd: str = None, cancel_event=None, kill=kill_process_tree) -> TestRunResult:
+    """Run an arbitrary shell test command, polling ``cancel_event`` while it runs."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        cmd,
+        shell=True,
+        text=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=(os.name == "posix"),
+        cwd=cwd,
+    )
+    while True:
+        try:
+            out, err = proc.communicate(timeout=0.2)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel_event is not None and cancel_event.is_set():
+                kill(proc)
+                proc.communicate()
+                raise CancelledError("test run cancelled")
+    return TestRunResult(proc.returncode, duration=time.perf_counter() - start, stdout=out, stderr=err)
@@ -0,0 +1,347 @@
+import os
+import re
+import tempfile
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_DEV_NULL = "/dev/null"
+
+
+class Hunk:
+    """One ``@@`` block: ``lines`` is a list of ``(tag, text)`` with tag in `` ``, ``-``, ``+``."""
+
+    def __init__(self, old_start: int, old_len: int, new_start: int, new_len: int):
+        self.old_start = old_start
+        self.old_len = old_len
+        self.new_start = new_start
+        self.new_len = new_len
+        self.lines = []
+
+    def old_lines(self) -> list[str]:
+        return [text for tag, text in self.lines if tag != "+"]
+
+    def new_lines(self) -> list[str]:
+        return [text for tag, text in self.lines if tag != "-"]
+
+    def changed_lines(self) -> int:
+        return sum(1 for tag, _ in self.lines if tag != " ")
+
+
+class FilePatch:
+    """All hunks for one file, with paths already stripped of their ``a/``/``b/`` prefix."""
+
+    def __init__(self, old_path: str = None, new_path: str = None):
+        self.old_path = old_path
+        self.new_path = new_path
+        self.hunks = []
+
+    @property
+    def is_new(self) -> bool:
+        return self.old_path is None
+
+    @property
+    def is_delete(self) -> bool:
+        return self.new_path is None
+
+    @property
+    def path(self) -> str:
+        """The path the patch produces (the old path for deletions)."""
+        return self.new_path if self.new_path is not None else self.old_path
+
+    def changed_lines(self) -> int:
+        return sum(h.changed_lines() for h in self.hunks)
+
+
+class HunkFailure:
+    """Why a hunk (``hunk_index``, 0-based; ``None`` for file-level errors) did not apply."""
+
+    def __init__(self, path: str, hunk_index, reason: str):
+        self.path = path
+        self.hunk_index = hunk_index
+        self.reason = reason
+
+    def __repr__(self):
+        where = "file" if self.hunk_index is None else f"hunk #{self.hunk_index + 1}"
+        return f"HunkFailure({self.path!r}, {where}: {self.reason})"
+
+
+class PatchResult:
+    """Outcome of :func:`apply_patches`; truthy only if every hunk applied."""
+
+    def __init__(self, files: list, failures: list, offsets: dict):
+        self.files = files
+        self.failures = failures
+        self.offsets = offsets  # (path, hunk_index) -> (line offset, fuzz used)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def __bool__(self):
+        return self.ok
+
+
+def parse_patch(text: str, strip: int = 1) -> list[FilePatch]:
+    """
+    Parse unified/git diff text into :class:`FilePatch` objects.
+    Anything outside file headers and hunks (fences, prose, ``index`` lines) is
+    ignored. Hunk line counts are honoured when consistent, but a hunk also
+    ends at the first line that cannot belong to it, so slightly miscounted
+    LLM output still parses.
+    """
+    patches = []
+    current = None
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if line.startswith("diff --git "):
+            current = FilePatch()
+            parts = line[len("diff --git "):].split(" b/", 1)
+            if len(parts) == 2:
+                current.old_path = _strip_path(parts[0], strip)
+                current.new_path = _strip_path("b/" + parts[1], strip)
+            patches.append(current)
+        elif line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ "):
+            if current is None or current.hunks:
+                current = FilePatch()
+                patches.append(current)
+            current.old_path = _header_path(line[4:], strip)
+            current.new_path = _header_path(lines[i + 1][4:], strip)
+            i += 1
+        elif line.startswith("new file mode") and current is not None:
+            current.old_path = None
+        elif line.startswith("deleted file mode") and current is not None:
+            current.new_path = None
+        elif current is not None and _HUNK_RE.match(line):
+            hunk, i = _parse_hunk(lines, i)
+            current.hunks.append(hunk)
+            continue
+        i += 1
+    # Absolute or ``..`` paths could reach outside the tree; GNU patch refuses them too
+    return [p for p in patches if (p.hunks or p.is_delete)
+            and is_safe_path(p.old_path) and is_safe_path(p.new_path)]
+
+
+def is_safe_path(path) -> bool:
+    """True for ``None`` (/dev/null) and relative paths without ``..`` components."""
+    if path is None:
+        return True
+    parts = path.replace("\\", "/").split("/")
+    return bool(path) and not os.path.isabs(path) and ":" not in parts[0] and ".." not in parts
+
+
+def apply_patches(patches: list, root: str = ".", fuzz: int = 2, dry_run: bool = False,
+                  base: str = None) -> PatchResult:
+    """
+    Validate every hunk against the files under ``root`` and, if all of them
+    apply, write the results. Hunks are located at their stated line first,
+    then at the nearest offset, then with up to ``fuzz`` context lines ignored
+    at each end. Nothing is written unless the whole patch applies; each file
+    is replaced through a temporary file and ``os.replace``. Every path must
+    resolve (symlinks included) inside ``root/base`` (default: ``root``).
+    """
+    failures = []
+    offsets = {}
+    writes = {}      # path -> new content
+    deletes = []
+    jail = os.path.realpath(os.path.join(root, base) if base else root)
+    for patch in patches:
+        escaping = [p for p in (patch.old_path, patch.new_path)
+                    if p is not None and not _inside(jail, os.path.join(root, p))]
+        if escaping:
+            failures.append(HunkFailure(patch.path, None, f"path outside {jail}: {escaping[0]}"))
+            continue
+        source = patch.old_path if patch.old_path is not None else patch.new_path
+        src_file = os.path.join(root, source)
+        if patch.is_new and os.path.exists(src_file) and os.path.getsize(src_file) > 0:
+            failures.append(HunkFailure(patch.path, None, "file to be created already exists"))
+            continue
+        if source in writes:
+            original = writes[source]
+        elif os.path.exists(src_file):
+            with open(src_file, "r", encoding="utf-8", newline="") as f:
+                original = f.read()
+        elif all(not h.old_lines() for h in patch.hunks):
+            original = ""   # pure addition to a file the diff forgot to mark as new
+        else:
+            failures.append(HunkFailure(patch.path, None, "file not found"))
+            continue
+
+        file_lines = original.splitlines(keepends=True)
+        line_offset = 0
+        min_pos = 0
+        ok = True
+        for idx, hunk in enumerate(patch.hunks):
+            placed = _place_hunk(file_lines, hunk, line_offset, min_pos, fuzz)
+            if placed is None:
+                failures.append(HunkFailure(patch.path, idx, "context does not match"))
+                ok = False
+                continue
+            pos, old, new, used_fuzz, lead = placed
+            file_lines[pos:pos + len(old)] = new
+            expected = max(hunk.old_start - 1, 0) if hunk.old_len else hunk.old_start
+            offsets[(patch.path, idx)] = (pos - lead - expected - line_offset, used_fuzz)
+            line_offset += len(new) - len(old)
+            min_pos = pos + len(new)
+        if not ok:
+            continue
+
+        if patch.is_delete:
+            if "".join(file_lines).strip():
+                failures.append(HunkFailure(patch.path, None, "file to be deleted is not empty after patch"))
+                continue
+            deletes.append(patch.old_path)
+        else:
+            writes[patch.new_path] = "".join(file_lines)
+            if patch.old_path not in (None, patch.new_path):
+                deletes.append(patch.old_path)
+
+    files = sorted(set(writes) | set(deletes))
+    if failures or dry_run:
+        return PatchResult(files, failures, offsets)
+
+    for path, content in writes.items():
+        target = os.path.join(root, path)
+        if not _inside(jail, target):   # re-checked right before touching the file
+            raise ValueError(f"refusing to write outside {jail}: {path}")
+        _atomic_write(target, content)
+    for path in deletes:
+        target = os.path.join(root, path)
+        if not _inside(jail, target):
+            raise ValueError(f"refusing to remove outside {jail}: {path}")
+        if path not in writes and os.path.exists(target):
+            os.remove(target)
+    return PatchResult(files, failures, offsets)
+
+
+def apply_patch(text: str, root: str = ".", strip: int = 1, fuzz: int = 2, dry_run: bool = False,
+                base: str = None) -> PatchResult:
+    """Parse ``text`` and apply it; a diff with no hunks is reported as a failure."""
+    patches = parse_patch(text, strip=strip)
+    if not patches:
+        return PatchResult([], [HunkFailure(None, None, "no file patches found")], {})
+    return apply_patches(patches, root=root, fuzz=fuzz, dry_run=dry_run, base=base)
+
+
+# ---------------------------------------------------------------------- #
+# Internals
+# ---------------------------------------------------------------------- #
+def _inside(jail: str, target: str) -> bool:
+    real = os.path.realpath(target)
+    return os.path.commonpath([jail, real]) == jail
+
+
+def _strip_path(path: str, strip: int):
+    path = path.strip()
+    if path == _DEV_NULL:
+        return None
+    parts = path.split("/")
+    return "/".join(parts[strip:]) if len(parts) > strip else parts[-1]
+
+
+def _header_path(field: str, strip: int):
+    # "--- a/app/x.py\t2024-01-01 00:00:00" -> "app/x.py"
+    return _strip_path(field.split("\t", 1)[0], strip)
+
+
+def _parse_hunk(lines: list, i: int):
+    m = _HUNK_RE.match(lines[i])
+    old_len = int(m.group(2)) if m.group(2) is not None else 1
+    new_len = int(m.group(4)) if m.group(4) is not None else 1
+    hunk = Hunk(int(m.group(1)), old_len, int(m.group(3)), new_len)
+    old_seen = new_seen = 0
+    i += 1
+    while i < len(lines):
+        line = lines[i]
+        # Counts only decide where a trailing blank line belongs: LLMs often
+        # miscount, so extra +/-/context lines are still taken as hunk body.
+        counts_done = old_seen >= old_len and new_seen >= new_len
+        if line.startswith("\\"):
+            # "\ No newline at end of file" applies to the previous line
+            if hunk.lines:
+                tag, text = hunk.lines[-1]
+                hunk.lines[-1] = (tag, text[:-1] if text.endswith("\n") else text)
+            i += 1
+            continue
+        if line == "":
+            if counts_done:
+                break
+            line = " "   # blank context line whose leading space was trimmed
+        tag = line[0]
+        if tag not in " -+" or line.startswith(("--- ", "+++ ")) and _looks_like_header(lines, i):
+            break
+        hunk.lines.append((tag, line[1:] + "\n"))
+        if tag != "+":
+            old_seen += 1
+        if tag != "-":
+            new_seen += 1
+        i += 1
+    return hunk, i
+
+
+def _looks_like_header(lines: list, i: int) -> bool:
+    return lines[i].startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ ")
+
+
+def _same(a: str, b: str) -> bool:
+    return a.rstrip("\r\n") == b.rstrip("\r\n")
+
+
+def _matches_at(file_lines: list, old: list, pos: int) -> bool:
+    if pos < 0 or pos + len(old) > len(file_lines):
+        return False
+    return all(_same(file_lines[pos + k], old[k]) for k in range(len(old)))
+
+
+def _place_hunk(file_lines: list, hunk: Hunk, line_offset: int, min_pos: int, fuzz: int):
+    """Find where ``hunk`` applies; returns ``(pos, old, new, fuzz_used, lead_trimmed)`` or None."""
+    for used in range(fuzz + 1):
+        old, new, lead = _trim_context(hunk, used)
+        if used and not old:
+            break
+        expected = (max(hunk.old_start - 1, 0) if hunk.old_len else hunk.old_start) + line_offset + lead
+        if not old:
+            if min_pos <= expected <= len(file_lines):
+                return expected, old, new, used, lead
+            continue
+        # search outward from the expected position, nearest first
+        limit = max(expected - min_pos, len(file_lines) - expected) + 1
+        for delta in range(limit):
+            for pos in ((expected + delta, expected - delta) if delta else (expected,)):
+                if pos >= min_pos and _matches_at(file_lines, old, pos):
+                    return pos, old, new, used, lead
+    return None
+
+
+def _trim_context(hunk: Hunk, n: int):
+    """Drop up to ``n`` context lines from each end of the hunk (patch's fuzz)."""
+    lines = list(hunk.lines)
+    lead = 0
+    while lead < n and lines and lines[0][0] == " ":
+        lines.pop(0)
+        lead += 1
+    trail = 0
+    while trail < n and lines and lines[-1][0] == " ":
+        lines.pop()
+        trail += 1
+    old = [t for tag, t in lines if tag != "+"]
+    new = [t for tag, t in lines if tag != "-"]
+    return old, new, lead
+
+
+def _atomic_write(path: str, content: str):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".patch-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(content)
+        if os.path.exists(path):
+            os.chmod(tmp, os.stat(path).st_mode & 0o777)
+        else:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
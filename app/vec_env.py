@@ -0,0 +1,190 @@
+import time
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env import VecEnv
+
+# Cycle outcome codes returned by executors
+FAIL, PARTIAL, SUCCESS = 0, 1, 2
+OUTCOME_REWARDS = np.array([-1.0, 0.5, 1.0], dtype=np.float32)
+LIVING_PENALTY = -0.01
+
+
+def outcome_code(result) -> int:
+    """Map a ``run_cycle`` result to an outcome code (``True`` counts as success, like SelfImproveEnv)."""
+    if result is True or result == 'success':
+        return SUCCESS
+    if result == 'partial':
+        return PARTIAL
+    return FAIL
+
+
+class StubCycleExecutor:
+    """
+    Outcome of a cycle driven by ``Agent(use_real_llm=False)``: its canned diff
+    never applies, so every cycle fails. Costs nothing per step.
+    """
+
+    def __call__(self, temperatures: np.ndarray, pending: np.ndarray):
+        return np.full(len(temperatures), FAIL, dtype=np.int8), pending
+
+
+class RandomCycleExecutor:
+    """Draws outcomes independently with probabilities ``(fail, partial, success)``."""
+
+    def __init__(self, probs=(0.6, 0.2, 0.2), seed=None):
+        self.probs = np.asarray(probs, dtype=np.float64) / np.sum(probs)
+        self.rng = np.random.default_rng(seed)
+
+    def __call__(self, temperatures: np.ndarray, pending: np.ndarray):
+        return self.rng.choice(3, size=len(temperatures), p=self.probs).astype(np.int8), pending
+
+
+class EngineCycleExecutor:
+    """Runs real self-improve cycles through ``agent.improver``, one after another."""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def __call__(self, temperatures: np.ndarray, pending: np.ndarray):
+        outcomes = np.empty(len(temperatures), dtype=np.int8)
+        for i, temp in enumerate(temperatures):
+            self.agent.temperature = float(temp)
+            try:
+                outcomes[i] = outcome_code(self.agent.improver.run_cycle())
+            except Exception:
+                outcomes[i] = FAIL
+        # once per batch, so features added by other processes are seen
+        return outcomes, np.full_like(pending, self.agent.count_features(refresh=True))
+
+
+class VecSelfImproveEnv(VecEnv):
+    """
+    ``num_envs`` copies of :class:`app.self_improve_env.SelfImproveEnv` stepped
+    together: per-env state lives in NumPy arrays and one ``executor`` call
+    produces the cycle outcomes for every env that runs a cycle this step.
+
+    Rewards, warm-up episodes and observations ``[last_reward, pending,
+    progress]`` match SelfImproveEnv. Finished envs are reset automatically,
+    as SB3 expects; their final observation is in ``info["terminal_observation"]``
+    and episode stats in ``info["episode"]``.
+    """
+
+    def __init__(self, num_envs: int, executor=None, max_steps: int = 50, warmup_episodes: int = 5,
+                 pending=0):
+        observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(3,), dtype=np.float32)
+        action_space = spaces.Box(low=0.0, high=1.0, shape=(1,), dtype=np.float32)
+        super().__init__(num_envs, observation_space, action_space)
+        self.executor = executor or StubCycleExecutor()
+        self.max_steps = max_steps
+        self.warmup_episodes = warmup_episodes
+
+        self.last_reward = np.zeros(num_envs, dtype=np.float32)
+        # pending feature counts describe the code base, so they survive resets
+        self.pending = np.broadcast_to(np.asarray(pending, dtype=np.float32), (num_envs,)).copy()
+        self.step_count = np.zeros(num_envs, dtype=np.int64)
+        self.episode = np.zeros(num_envs, dtype=np.int64)
+        self.episode_return = np.zeros(num_envs, dtype=np.float64)
+        self.episode_start = np.zeros(num_envs, dtype=np.float64)
+        self._actions = None
+
+    # ------------------------------------------------------------------ #
+    # Batched API
+    # ------------------------------------------------------------------ #
+    def reset_all(self) -> np.ndarray:
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self._observations()
+
+    def step_batch(self, actions):
+        """
+        Step every env with ``actions`` (temperatures, shape ``(n,)`` or ``(n, 1)``).
+        Returns ``(obs, rewards, terminated)``; ``obs`` rows of terminated envs
+        are their final observations (they are reset before the next step).
+        """
+        temps = np.clip(np.asarray(actions, dtype=np.float32).reshape(self.num_envs), 0.0, 1.0)
+        warmup = self.episode <= self.warmup_episodes
+
+        # 1) Run cycles for envs past warm-up (warm-up steps count as success)
+        outcomes = np.full(self.num_envs, SUCCESS, dtype=np.int8)
+        active = ~warmup
+        if active.any():
+            result, pending = self.executor(temps[active], self.pending[active])
+            outcomes[active] = result
+            self.pending[active] = pending
+
+        # 2) Advance step counters
+        self.step_count += 1
+        terminated = self.step_count >= self.max_steps
+
+        # 3) Rewards: warm-up pays 1 at episode end; otherwise outcome at the end, living penalty before
+        rewards = np.where(terminated, OUTCOME_REWARDS[outcomes], LIVING_PENALTY).astype(np.float32)
+        rewards[warmup] = terminated[warmup].astype(np.float32)
+
+        self.last_reward = rewards.copy()
+        self.episode_return += rewards
+        return self._observations(), rewards, terminated
+
+    # ------------------------------------------------------------------ #
+    # SB3 VecEnv interface
+    # ------------------------------------------------------------------ #
+    def reset(self):
+        return self.reset_all()
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, terminated = self.step_batch(self._actions)
+        infos = [{} for _ in range(self.num_envs)]
+        done_idx = np.flatnonzero(terminated)
+        if len(done_idx):
+            now = time.time()
+            for i in done_idx:
+                infos[i]["terminal_observation"] = obs[i].copy()
+                infos[i]["TimeLimit.truncated"] = False
+                infos[i]["episode"] = {"r": float(self.episode_return[i]), "l": int(self.step_count[i]),
+                                       "t": round(now - self.episode_start[i], 6)}
+            self._reset_envs(terminated)
+            obs = self._observations()
+        return obs, rewards, terminated.copy(), infos
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        return [getattr(self, method_name)(*method_args, **method_kwargs) for _ in self._indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._indices(indices)]
+
+    def seed(self, seed=None):
+        if seed is not None and hasattr(self.executor, "rng"):
+            self.executor.rng = np.random.default_rng(seed)
+        return [seed] * self.num_envs
+
+    # ------------------------------------------------------------------ #
+    # Internals
+    # ------------------------------------------------------------------ #
+    def _reset_envs(self, mask: np.ndarray):
+        self.last_reward[mask] = 0.0
+        self.step_count[mask] = 0
+        self.episode[mask] += 1
+        self.episode_return[mask] = 0.0
+        self.episode_start[mask] = time.time()
+
+    def _observations(self) -> np.ndarray:
+        progress = self.step_count / self.max_steps
+        return np.stack([self.last_reward, self.pending, progress], axis=1).astype(np.float32)
+
+    def _indices(self, indices):
+        if indices is None:
+            return range(self.num_envs)
+        if isinstance(indices, int):
+            return [indices]
+        return indices
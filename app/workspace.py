@@ -0,0 +1,125 @@
+import ctypes
+import os
+import shutil
+import tempfile
+
+_IGNORED_DIRS = {"__pycache__"}
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+
+
+class Workspace:
+    """
+    A throwaway project root for one candidate patch.
+
+    ``root/<src>`` is a hard-link clone of the live source tree and every other
+    top-level entry of the project (tests, configs, ...) is symlinked, so the
+    test command can run with ``cwd=root`` against the candidate code. Patches
+    must replace files (as :func:`app.unified_diff.apply_patches` does) rather
+    than edit them in place, otherwise the shared inode of the live file
+    would change too.
+    """
+
+    def __init__(self, root: str, src_name: str):
+        self.root = root
+        self.src_dir = os.path.join(root, src_name)
+        self.promoted = False
+
+    def discard(self):
+        """Delete the workspace (a promoted tree has already been moved out)."""
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+class WorkspaceManager:
+    """
+    Creates candidate workspaces next to the live ``src_dir`` (on the same
+    filesystem, so promotion is a rename) and swaps a passing candidate in.
+    """
+
+    def __init__(self, src_dir: str = "app", base_dir: str = None):
+        self.src_dir = os.path.normpath(src_dir)
+        self.project_root = os.path.dirname(os.path.abspath(self.src_dir))
+        self.base_dir = base_dir or os.path.join(self.project_root, ".workspaces")
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.recover()
+
+    def create(self) -> Workspace:
+        root = tempfile.mkdtemp(prefix="candidate-", dir=self.base_dir)
+        src_name = os.path.basename(self.src_dir)
+        workspace = Workspace(root, src_name)
+        _clone_tree(self.src_dir, workspace.src_dir)
+        skip = {src_name, os.path.basename(self.base_dir), ".git"}
+        for name in os.listdir(self.project_root):
+            if name in skip:
+                continue
+            try:
+                os.symlink(os.path.join(self.project_root, name), os.path.join(root, name))
+            except OSError as e:
+                print(f"[Workspace] Could not link {name} into workspace: {e}")
+        return workspace
+
+    def promote(self, workspace: Workspace):
+        """
+        Make the workspace's tree the live ``src_dir``. Uses an atomic
+        ``renameat2(RENAME_EXCHANGE)`` where the OS supports it; otherwise two
+        renames, with :meth:`recover` putting the old tree back if the process
+        dies between them.
+        """
+        if _exchange(workspace.src_dir, self.src_dir):
+            # the old live tree now sits where the candidate was
+            workspace.promoted = True
+            workspace.discard()
+            return
+        retired = tempfile.mkdtemp(prefix="retired-", dir=self.base_dir)
+        retired_src = os.path.join(retired, os.path.basename(self.src_dir))
+        os.rename(self.src_dir, retired_src)
+        os.rename(workspace.src_dir, self.src_dir)
+        workspace.promoted = True
+        shutil.rmtree(retired, ignore_errors=True)
+        workspace.discard()
+
+    def recover(self):
+        """Restore the live tree if a non-atomic promotion was interrupted."""
+        src_name = os.path.basename(self.src_dir)
+        retired = sorted(
+            (os.path.join(self.base_dir, d) for d in os.listdir(self.base_dir) if d.startswith("retired-")),
+            key=os.path.getmtime,
+        )
+        if not os.path.exists(self.src_dir) and retired:
+            os.rename(os.path.join(retired[-1], src_name), self.src_dir)
+            print(f"[Workspace] Recovered {self.src_dir} after an interrupted promotion.")
+        for path in retired:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _clone_tree(src: str, dst: str):
+    """Recreate ``src`` at ``dst`` with hard links (copies where linking fails)."""
+    for dirpath, dirnames, filenames in os.walk(src):
+        dirnames[:] = [d for d in dirnames if d not in _IGNORED_DIRS]
+        target_dir = os.path.join(dst, os.path.relpath(dirpath, src))
+        os.makedirs(target_dir, exist_ok=True)
+        for fname in filenames:
+            source = os.path.join(dirpath, fname)
+            target = os.path.join(target_dir, fname)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+
+
+_renameat2 = None
+
+
+def _exchange(a: str, b: str) -> bool:
+    """Atomically swap two paths with Linux renameat2; False if unsupported."""
+    global _renameat2
+    if _renameat2 is None:
+        try:
+            func = ctypes.CDLL(None, use_errno=True).renameat2
+            func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+            _renameat2 = func
+        except (OSError, AttributeError, TypeError):
+            _renameat2 = False
+    if not _renameat2:
+        return False
+    return _renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) == 0
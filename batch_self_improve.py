@@ -3,30 +3,32 @@ import os
 from datetime import datetime
 import json
 from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import SubprocVecEnv
-from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.callbacks import CheckpointCallback
 from stable_baselines3.common.evaluation import evaluate_policy
 
-from app.agent import Agent
-from app.self_improve import SelfImproveEngine
-from app.self_improve_env import SelfImproveEnv
+from app.episode_log import EPISODE_LOG_DIR, VecEpisodeLogger
+from app.surrogate import SURROGATE_PATH, SurrogateCycleExecutor, SurrogateModel
+from app.vec_env import StubCycleExecutor, VecSelfImproveEnv
 
 
 
-def make_env(rank):
+def make_vec_env(n_envs, executor=None, log_dir=None, worker=None):
     """
-    Helper to create one env instance.
-    We'll launch N of these in parallel.
+    Helper to create N stub environments.
+    They live in one process and are stepped together as NumPy arrays;
+    the stub executor reproduces Agent(use_real_llm=False), whose canned
+    diff never applies. Episodes go to this worker's shard in ``log_dir``
+    (see app.episode_log); evaluation envs pass a separate directory.
     """
-    def _init():
-        # stub out real LLM calls during this batch run
-        agent = Agent(use_real_llm=False)
-        # Skip creating new backups during batch training
-        agent.improver = SelfImproveEngine(agent, use_real_llm=False, skip_backups=True)
-        env = SelfImproveEnv(agent, max_steps=200)
-        return Monitor(env, f"logs/monitor.csv", allow_early_resets=True)
-    return _init
+    env = VecSelfImproveEnv(n_envs, executor or default_executor(), max_steps=200)
+    return VecEpisodeLogger(env, log_dir or EPISODE_LOG_DIR, worker)
+
+def default_executor():
+    """Sample outcomes from the fitted surrogate model if there is one, else the stub."""
+    if os.path.isfile(SURROGATE_PATH):
+        print(f"Pretraining against surrogate model {SURROGATE_PATH}")
+        return SurrogateCycleExecutor(SurrogateModel.load(SURROGATE_PATH))
+    return StubCycleExecutor()
 
 def main():
     os.makedirs("logs", exist_ok=True)
@@ -34,8 +36,7 @@ def main():
 
     # launch 4 parallel envs (tune this to your CPU/GPU)
     n_envs = 12
-    envs = [make_env(i) for i in range(n_envs)]
-    vec_env = SubprocVecEnv(envs)
+    vec_env = make_vec_env(n_envs)
 
     model = PPO(
         "MlpPolicy",
@@ -88,7 +89,7 @@ def consolidate_training(model, vec_env, checkpoints_dir="checkpoints"):
     print("🔄 Consolidating training results...")
     
     # Create a fresh environment for evaluation
-    eval_env = make_env(0)()
+    eval_env = make_vec_env(1, log_dir=os.path.join("logs", "eval_episodes"))
     
     try:
         # Evaluate final model performance
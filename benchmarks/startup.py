@@ -0,0 +1,64 @@
+"""
+Startup-time benchmark.
+
+Measures, each in a fresh interpreter so import costs are included:
+  * ``agent``: importing ``app.agent`` and constructing ``Agent()``
+  * ``main``:  ``python -m app.main --cli`` up to the first prompt and exit (stdin closed)
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_AGENT_SNIPPET = (
+    "import time; t = time.perf_counter(); "
+    "from app.agent import Agent; a = Agent(); "
+    "print(time.perf_counter() - t); a.memory.close()"
+)
+
+
+def time_agent() -> float:
+    """Seconds spent importing app.agent and constructing Agent() in a fresh interpreter."""
+    out = subprocess.run([sys.executable, "-c", _AGENT_SNIPPET], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def time_main() -> float:
+    """Wall-clock seconds for ``python -m app.main --cli`` to start and exit on EOF."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "app.main", "--cli"], cwd=ROOT, check=True,
+                   stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def measure(fn, runs: int) -> dict:
+    samples = [fn() for _ in range(runs)]
+    return {"min": min(samples), "median": statistics.median(samples), "max": max(samples), "runs": runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Agent / app.main startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = {"agent": measure(time_agent, args.runs), "main": measure(time_main, args.runs)}
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, r in results.items():
+        print(f"{name:6s} min {r['min'] * 1000:8.1f} ms  median {r['median'] * 1000:8.1f} ms  "
+              f"max {r['max'] * 1000:8.1f} ms  ({r['runs']} runs)")
+
+
+if __name__ == "__main__":
+    main()
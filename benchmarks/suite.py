@@ -0,0 +1,414 @@
+"""
+Benchmark suite for the agent's hot paths.
+
+Every benchmark builds its own fixture from a fixed seed in a temporary
+directory and uses a stub LLM, so runs are reproducible and never touch the
+real tree or the network:
+
+  * ``prompt``:   ``Agent.ask_llm`` prompt assembly over generated ``app/`` trees
+  * ``memory``:   ``Memory`` message insert / list throughput
+  * ``snapshot``: ``SnapshotManager.create`` (full and incremental) and ``restore``
+  * ``cycle``:    end-to-end ``SelfImproveEngine.run_cycle`` with a real pytest run
+  * ``env``:      ``SelfImproveEnv.step`` and ``VecSelfImproveEnv.step_batch`` steps per second
+  * ``llm``:      concurrent ``Agent.ask_llm`` calls against the local fake Ollama (app.fake_ollama)
+
+Metrics in seconds are better when lower, metrics in ``*/s`` when higher.
+
+Usage:
+    python benchmarks/suite.py run [--profile quick|default|full] [--only prompt,env] [--out results.json]
+    python benchmarks/suite.py run --save-baseline
+    python benchmarks/suite.py compare [--baseline benchmarks/baseline.json] results.json [--threshold 0.2]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.2   # 20% slower than the baseline fails the gate
+SEED = 1234
+
+PROFILES = {
+    "quick": {"files": (10, 50), "rows": (10**3,), "tree": (50,), "cycles": 2, "steps": 2_000, "repeat": 3,
+              "llm_requests": 16, "llm_concurrency": 4},
+    "default": {"files": (10, 100, 400), "rows": (10**3, 10**4, 10**5), "tree": (100, 1000), "cycles": 5,
+                "steps": 20_000, "repeat": 5, "llm_requests": 64, "llm_concurrency": 8},
+    "full": {"files": (10, 100, 1000), "rows": (10**3, 10**4, 10**5, 10**6), "tree": (100, 1000, 5000),
+             "cycles": 10, "steps": 100_000, "repeat": 5, "llm_requests": 256, "llm_concurrency": 16},
+}
+
+BENCHMARKS = {}
+
+_WORDS = ("agent", "memory", "snapshot", "cycle", "reward", "policy", "prompt", "context", "feature", "patch",
+          "workspace", "episode", "cache", "token", "index", "runner", "engine", "stream", "budget", "score")
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def metric(value: float, unit: str) -> dict:
+    return {"value": value, "unit": unit}
+
+
+def higher_is_better(unit: str) -> bool:
+    return unit.endswith("/s")
+
+
+def time_median(fn, repeat: int) -> float:
+    """Median wall-clock seconds of ``repeat`` calls of ``fn``."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+@contextlib.contextmanager
+def fixture_dir():
+    """A temporary working directory, removed afterwards."""
+    cwd = os.getcwd()
+    path = tempfile.mkdtemp(prefix="aisapp-bench-")
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def make_tree(root: str, n_files: int, seed: int = SEED):
+    """Write ``n_files`` deterministic Python modules (~1.5 KB each) under ``root``."""
+    rng = random.Random(seed)
+    for i in range(n_files):
+        pkg = os.path.join(root, f"pkg{i // 50}")
+        os.makedirs(pkg, exist_ok=True)
+        lines = [f'"""Module {i}: {" ".join(rng.choices(_WORDS, k=6))}."""', "",
+                 f"LIMIT_{i} = {rng.randint(1, 1000)}", ""]
+        for j in range(3):
+            a, b = rng.sample(_WORDS, 2)
+            lines += [f"def {a}_{b}_{j}(value, {b}=None):",
+                      f"    # combine {a} with {b}",
+                      f"    total = value * {rng.randint(2, 9)}",
+                      f"    if {b} is not None:",
+                      f"        total += len(str({b}))",
+                      "    return total", ""]
+        cls = rng.choice(_WORDS).title()
+        lines += [f"class {cls}Store{i}:", "    def __init__(self):", "        self.items = []", "",
+                  "    def add(self, item):", "        self.items.append(item)", "        return len(self.items)", ""]
+        with open(os.path.join(pkg, f"mod{i}.py"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    age_tree(root)
+
+
+def age_tree(root: str, seconds: float = 60.0):
+    """
+    Backdate every file's mtime. Files modified within the last two seconds
+    are "racy" to the code index and snapshots and get re-hashed on every
+    access, which would make warm measurements look cold.
+    """
+    old = time.time() - seconds
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            os.utime(os.path.join(dirpath, name), (old, old))
+
+
+# ---------------------------------------------------------------------- #
+# Benchmarks
+# ---------------------------------------------------------------------- #
+@benchmark("prompt")
+def bench_prompt(profile) -> dict:
+    from app.agent import Agent
+    from app.context_builder import ContextBuilder
+
+    results = {}
+    for n in profile["files"]:
+        with fixture_dir():
+            make_tree("app", n)
+            agent = Agent(use_real_llm=True, cache_path="")
+            agent._chat_stream = lambda prompt, options=None: iter(("ok",))   # stub LLM
+            query = "please make the reward cache of the snapshot engine faster"
+
+            def cold():
+                agent.code_index.invalidate()
+                agent.context = ContextBuilder(agent.code_index)
+                agent.ask_llm(query)
+
+            results[f"prompt.cold.{n}_files"] = metric(time_median(cold, profile["repeat"]), "s")
+            results[f"prompt.ask_llm.{n}_files"] = metric(time_median(lambda: agent.ask_llm(query), profile["repeat"]),
+                                                          "s")
+            agent.memory.close()
+    return results
+
+
+@benchmark("memory")
+def bench_memory(profile) -> dict:
+    from app.memory import Memory
+
+    results = {}
+    for n in profile["rows"]:
+        with fixture_dir():
+            memory = Memory("bench.db", write_behind=True, flush_rows=1000)
+            start = time.perf_counter()
+            for i in range(n):
+                memory.save_message("user" if i % 2 else "ai", f"message {i} about {_WORDS[i % len(_WORDS)]}", "s")
+            memory.flush()
+            results[f"memory.insert.{n}_rows"] = metric(n / (time.perf_counter() - start), "rows/s")
+            start = time.perf_counter()
+            count = sum(1 for _ in memory.iter_messages())
+            results[f"memory.list.{n}_rows"] = metric(count / (time.perf_counter() - start), "rows/s")
+            memory.close()
+    return results
+
+
+@benchmark("snapshot")
+def bench_snapshot(profile) -> dict:
+    from app.snapshot import SnapshotManager
+
+    results = {}
+    for n in profile["tree"]:
+        with fixture_dir():
+            make_tree("app", n)
+            manager = SnapshotManager("app", "backups", keep_last=1000)
+            start = time.perf_counter()
+            first = manager.create()
+            results[f"snapshot.create_full.{n}_files"] = metric(time.perf_counter() - start, "s")
+            # the first manifest was written right after the files: re-hash once more, then trust them
+            manager.create()
+            results[f"snapshot.create_incremental.{n}_files"] = metric(
+                time_median(manager.create, profile["repeat"]), "s")
+            # touch a tenth of the files, then roll back
+            for i in range(0, n, 10):
+                with open(os.path.join("app", f"pkg{i // 50}", f"mod{i}.py"), "a", encoding="utf-8") as f:
+                    f.write("# edited\n")
+            start = time.perf_counter()
+            manager.restore(first)
+            results[f"snapshot.restore.{n}_files"] = metric(time.perf_counter() - start, "s")
+    return results
+
+
+class _CycleAgent:
+    """Stub LLM that always proposes incrementing ``VALUE`` in ``app/mod.py``."""
+
+    temperature = 0.5
+
+    def ask_llm(self, prompt, options=None):
+        with open(os.path.join("app", "mod.py"), encoding="utf-8") as f:
+            value = int(f.read().split("=")[1])
+        return (f"```diff\n--- a/app/mod.py\n+++ b/app/mod.py\n@@ -1 +1 @@\n"
+                f"-VALUE = {value}\n+VALUE = {value + 1}\n```\n")
+
+    def get_features(self):
+        return ["count upwards"]
+
+    def count_features(self, refresh=False):
+        return 1
+
+
+@benchmark("cycle")
+def bench_cycle(profile) -> dict:
+    from app.self_improve import SelfImproveEngine
+
+    with fixture_dir():
+        make_tree("app", 20)
+        with open(os.path.join("app", "mod.py"), "w", encoding="utf-8") as f:
+            f.write("VALUE = 0\n")
+        os.makedirs("tests")
+        with open(os.path.join("tests", "test_mod.py"), "w", encoding="utf-8") as f:
+            f.write("from app.mod import VALUE\n\n\ndef test_value():\n    assert VALUE > 0\n")
+        with open("pytest.ini", "w", encoding="utf-8") as f:
+            f.write("[pytest]\npythonpath = .\ntestpaths = tests\n")
+        engine = SelfImproveEngine(_CycleAgent(), use_real_llm=False, test_cmd=f"{sys.executable} -m pytest -q")
+        outcomes = []
+        seconds = time_median(lambda: outcomes.append(engine.run_cycle()), profile["cycles"])
+    if any(o != "success" for o in outcomes):
+        raise RuntimeError(f"benchmark cycles did not succeed: {outcomes}")
+    return {"cycle.run_cycle": metric(seconds, "s")}
+
+
+class _EnvAgent:
+    """Agent whose cycles cost nothing, so only the env's own overhead is measured."""
+
+    temperature = 0.5
+
+    class improver:
+        @staticmethod
+        def run_cycle():
+            return False
+
+    def count_features(self, refresh=False):
+        return 3
+
+
+@benchmark("env")
+def bench_env(profile) -> dict:
+    import numpy as np
+
+    from app.self_improve_env import SelfImproveEnv
+    from app.vec_env import RandomCycleExecutor, VecSelfImproveEnv
+
+    steps = profile["steps"]
+    env = SelfImproveEnv(_EnvAgent(), max_steps=200, warmup_episodes=0)
+    env.reset(seed=SEED)
+    action = np.array([0.5], dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(steps):
+        if env.step(action)[2]:
+            env.reset()
+    single = steps / (time.perf_counter() - start)
+
+    venv = VecSelfImproveEnv(64, RandomCycleExecutor(seed=SEED), max_steps=200, warmup_episodes=0)
+    venv.reset()
+    actions = np.full((64, 1), 0.5, dtype=np.float32)
+    batches = max(1, steps // 64)
+    start = time.perf_counter()
+    for _ in range(batches):
+        venv.step(actions)
+    vectorised = batches * 64 / (time.perf_counter() - start)
+    return {"env.step": metric(single, "steps/s"), "env.vec_step_64": metric(vectorised, "steps/s")}
+
+
+@benchmark("llm")
+def bench_llm(profile) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+
+    import app.agent
+    from app.agent import Agent
+    from app.fake_ollama import FakeOllama
+
+    n, workers = profile["llm_requests"], profile["llm_concurrency"]
+    with fixture_dir(), FakeOllama(ttft=0.05, tokens_per_sec=200, seed=SEED) as fake:
+        make_tree("app", 20)
+        url, app.agent.OLLAMA_URL = app.agent.OLLAMA_URL, fake.url
+        agent = Agent(use_real_llm=True, cache_path="")
+        agent.transport.stats.reset()
+        try:
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(lambda i: agent.ask_llm(f"question {i} about the reward cache"), range(n)))
+            elapsed = time.perf_counter() - start
+        finally:
+            app.agent.OLLAMA_URL = url
+            agent.memory.close()
+        first_token = agent.transport.stats.snapshot()["ollama.chat.first_token"]["mean"]
+    return {f"llm.ask_llm.{workers}_concurrent": metric(n / elapsed, "req/s"),
+            "llm.first_token_overhead": metric(max(first_token - fake.ttft, 0.0), "s")}
+
+
+# ---------------------------------------------------------------------- #
+# Running and comparing
+# ---------------------------------------------------------------------- #
+def run(profile_name: str = "default", only=None) -> dict:
+    profile = PROFILES[profile_name]
+    metrics = {}
+    for name, fn in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):   # the engine and agent log every step
+            metrics.update(fn(profile))
+        print(f"[Bench] {name} done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return {
+        "profile": profile_name,
+        "created": time.time(),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "metrics": metrics,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    """
+    One row per metric present in both runs, with the relative ``change``
+    (positive = better) and ``regressed`` when it is worse than ``-threshold``.
+    """
+    rows = []
+    for name, base in sorted(baseline["metrics"].items()):
+        cur = current["metrics"].get(name)
+        if cur is None or not base["value"]:
+            continue
+        ratio = cur["value"] / base["value"]
+        change = ratio - 1.0 if higher_is_better(base["unit"]) else 1.0 - ratio
+        rows.append({"metric": name, "unit": base["unit"], "baseline": base["value"], "current": cur["value"],
+                     "change": change, "regressed": change < -threshold})
+    return rows
+
+
+def print_results(results: dict):
+    for name, m in results["metrics"].items():
+        value = f"{m['value'] * 1000:10.2f} ms" if m["unit"] == "s" else f"{m['value']:10.0f} {m['unit']}"
+        print(f"{name:45s} {value}")
+
+
+def print_comparison(rows: list, threshold: float):
+    for r in rows:
+        flag = "REGRESSED" if r["regressed"] else ""
+        print(f"{r['metric']:45s} {r['change'] * 100:+7.1f}%  {flag}")
+    regressed = [r for r in rows if r["regressed"]]
+    print(f"{len(regressed)} of {len(rows)} metrics regressed by more than {threshold * 100:.0f}%")
+
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(results: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the agent's hot paths")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_p = sub.add_parser("run", help="run the benchmarks")
+    run_p.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    run_p.add_argument("--only", default="", help=f"comma-separated subset of {','.join(BENCHMARKS)}")
+    run_p.add_argument("--out", help="write results JSON here")
+    run_p.add_argument("--save-baseline", action="store_true", help=f"write results to {BASELINE_PATH}")
+    run_p.add_argument("--compare", action="store_true", help="compare against the baseline afterwards")
+    run_p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    cmp_p = sub.add_parser("compare", help="fail if results regress against a baseline")
+    cmp_p.add_argument("results")
+    cmp_p.add_argument("--baseline", default=BASELINE_PATH)
+    cmp_p.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run(args.profile, only=[n for n in args.only.split(",") if n])
+        print_results(results)
+        if args.out:
+            _save(results, args.out)
+        if args.save_baseline:
+            _save(results, BASELINE_PATH)
+            print(f"Baseline saved to {BASELINE_PATH}")
+        if not args.compare:
+            return 0
+        baseline = _load(BASELINE_PATH)
+    else:
+        baseline, results = _load(args.baseline), _load(args.results)
+
+    rows = compare(baseline, results, args.threshold)
+    print_comparison(rows, args.threshold)
+    return 1 if any(r["regressed"] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,52 +1,123 @@
 # callbacks.py
-import os
+import atexit
 import csv
+import os
+import threading
 from stable_baselines3.common.callbacks import BaseCallback
 
+# Buffered rows are written once this many are pending, or every this many seconds
+CSV_FLUSH_ROWS = int(os.getenv("CSV_FLUSH_ROWS", "1000"))
+CSV_FLUSH_SECONDS = float(os.getenv("CSV_FLUSH_SECONDS", "5"))
+
+
+def shard_path(csv_path: str, pid=None) -> str:
+    """``logs/episodes.csv`` -> ``logs/episodes-<pid>.csv`` (one shard per process)."""
+    root, ext = os.path.splitext(csv_path)
+    return f"{root}-{os.getpid() if pid is None else pid}{ext or '.csv'}"
+
+
+class BufferedCSVWriter:
+    """
+    Collects rows in memory and appends them to ``path`` in batches from a
+    background thread, when ``max_rows`` are pending or every
+    ``flush_interval`` seconds. The header is written with the first batch
+    of a new file. Pending rows are flushed on :meth:`close` and at interpreter
+    exit (including after an unhandled exception).
+    """
+
+    def __init__(self, path: str, header, max_rows: int = CSV_FLUSH_ROWS,
+                 flush_interval: float = CSV_FLUSH_SECONDS):
+        self.path = path
+        self.header = list(header)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._lock = threading.Lock()         # guards _rows
+        self._flush_lock = threading.Lock()   # one writer at a time
+        self._wake = threading.Event()
+        self._closed = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="csv-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def writerow(self, row):
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+            if not rows:
+                return
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, "a", newline="") as f:
+                writer = csv.writer(f)
+                if new_file:
+                    writer.writerow(self.header)
+                writer.writerows(rows)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"[EpisodeCSVLogger] Flush to {self.path} failed: {e}")
+
+
 class EpisodeCSVLogger(BaseCallback):
     """
-    After each episode, append a row [episode_number, total_timesteps, episode_reward, episode_length]
-    to a CSV file.
+    For each finished episode, append a row [episode_number, total_timesteps,
+    episode_reward, episode_length, episode_time, env_id] to this process's
+    shard of ``csv_path`` (see :func:`shard_path`). Rows are buffered and
+    written by a :class:`BufferedCSVWriter`, not on the training thread.
     """
-    def __init__(self, csv_path: str, verbose=0):
+    HEADER = ["episode", "timesteps", "reward", "length", "time", "env"]
+
+    def __init__(self, csv_path: str, verbose=0, max_rows: int = CSV_FLUSH_ROWS,
+                 flush_interval: float = CSV_FLUSH_SECONDS):
         super().__init__(verbose)
         self.csv_path = csv_path
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.writer = None
+        self.num_episodes = 0
         # ensure directory exists
-        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
-        # write header if new file
-        if not os.path.exists(csv_path):
-            with open(csv_path, "w", newline="") as f:
-                writer = csv.writer(f)
-                writer.writerow(["episode", "timesteps", "reward", "length"])
+        os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
 
-    def _on_step(self) -> bool:
-        # nothing to do every step
-        return True
+    def _on_training_start(self) -> None:
+        # initialize counter; the shard is opened here so forked workers get their own
+        self.num_episodes = 0
+        if self.writer is None:
+            self.writer = BufferedCSVWriter(shard_path(self.csv_path), self.HEADER,
+                                            self.max_rows, self.flush_interval)
 
-    def _on_rollout_end(self) -> None:
-        """
-        Called after each rollout collection (i.e. after n_steps), but we only want to log
-        on actual episode ends, so we'll check the Monitor info dict.
-        """
-        # infos is a list of info dicts from the last rollout
-        for info in self.locals["infos"]:
-            if "episode" in info:
-                ep_info = info["episode"]
-                episode_no = ep_info.get("r")  # SB3 packs reward in 'r'
-                # Actually SB3 Monitor stores:
-                #   info["episode"]["r"] = episode_reward
-                #   info["episode"]["l"] = episode_length
-                #   info["episode"]["t"] = total_timesteps at end
-                reward = ep_info["r"]
-                length = ep_info["l"]
-                timesteps = ep_info["t"]
-                # get a running count of the episode index
+    def _on_step(self) -> bool:
+        # Monitor/VecMonitor-style wrappers put {"r", "l", "t"} into the info of a finished env
+        for env_id, info in enumerate(self.locals.get("infos", ())):
+            ep_info = info.get("episode")
+            if ep_info is not None:
                 self.num_episodes += 1
-                with open(self.csv_path, "a", newline="") as f:
-                    writer = csv.writer(f)
-                    writer.writerow([self.num_episodes, timesteps, reward, length])
-        return None
+                self.writer.writerow([self.num_episodes, self.num_timesteps,
+                                      ep_info["r"], ep_info["l"], ep_info.get("t", ""), env_id])
+        return True
 
-    def _on_training_start(self) -> None:
-        # initialize counter
-        self.num_episodes = 0
+    def _on_training_end(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
@@ -4,6 +4,22 @@ class Env:
         return None, {}
     def step(self, action):
         return None, 0.0, True, False, {}
+    def close(self):
+        pass
+
+class Wrapper(Env):
+    def __init__(self, env):
+        self.env = env
+        self.observation_space = getattr(env, "observation_space", None)
+        self.action_space = getattr(env, "action_space", None)
+    def reset(self, seed=None, options=None):
+        return self.env.reset(seed=seed, options=options)
+    def step(self, action):
+        return self.env.step(action)
+    def close(self):
+        return self.env.close()
+    def __getattr__(self, name):
+        return getattr(self.env, name)
 
 class spaces:
     class Box:
@@ -1,88 +1,126 @@
-import pandas as pd
+import argparse
+import os
+
 import matplotlib.pyplot as plt
 import numpy as np
 
-LOG_PATH = "logs/monitor.csv"
+from app.episode_log import EPISODE_DTYPE, EPISODE_LOG_DIR, LATEST, EpisodeTail
+from app.learning_curve import LearningCurve
+
+LOG_PATH = "logs/monitor.csv"   # legacy text log, read when no episode shards exist
+WINDOW_SIZES = (20, 50)
+COLORS = ('blue', 'red')
 
 def clean_monitor_data(csv_path):
-    # Read the raw CSV content
-    with open(csv_path, 'r') as f:
-        lines = f.readlines()
-    
-    # Skip comment lines and clean data
-    cleaned_lines = []
+    """Episode records from an SB3 monitor.csv, skipping comments and corrupted rows."""
+    rows = []
     header_found = False
-    
-    for line in lines:
-        if line.startswith('#'):
-            continue
-        if not header_found:
-            if 'r,l,t' in line:
-                header_found = True
-            continue
-        
-        # Clean the line of any corrupted data
-        try:
-            reward = float(line.split(',')[0].strip())
-            cleaned_lines.append(f"{reward},100,0")  # Simplified format
-        except (ValueError, IndexError):
-            continue
-    
-    # Create DataFrame directly from cleaned data
-    df = pd.DataFrame([line.split(',') for line in cleaned_lines], 
-                     columns=['reward', 'length', 'timestamp'])
-    
-    # Convert to proper numeric types
-    df['reward'] = pd.to_numeric(df['reward'], errors='coerce')
-    df = df.dropna(subset=['reward'])
-    
-    return df
+    with open(csv_path, 'r') as f:
+        for line in f:
+            if line.startswith('#'):
+                continue
+            if not header_found:
+                if 'r,l,t' in line:
+                    header_found = True
+                continue
+            # Rows from concurrent writers may be interleaved; keep only well-formed ones
+            try:
+                reward, length, t = line.strip().split(',')[:3]
+                rows.append((float(t), float(reward), int(float(length)), 0))
+            except ValueError:
+                continue
+    return np.array(rows, dtype=EPISODE_DTYPE)
+
+def print_summary(curve):
+    stats = curve.summary()
+    print(f"Total episodes: {stats['episodes']}")
+    print(f"Average reward: {stats['mean_reward']:.2f} ± {stats['std_reward']:.2f}")
+    print(f"Max reward: {stats['max_reward']:.2f}")
+    print(f"Min reward: {stats['min_reward']:.2f}")
+    print(f"Mean length: {stats['mean_length']:.1f}")
+    print(f"EWMA reward: {stats['ewma_reward']:.2f}  " + "  ".join(
+        f"last {w}: {stats[f'rolling{w}_mean']:.2f} ± {stats[f'rolling{w}_std']:.2f}" for w in curve.windows))
+
+def draw(curve, fig=None):
+    """Create the figure, or refresh it in place with the curve's current series."""
+    x = np.arange(len(curve.reward_series))
+    if fig is None:
+        fig = plt.figure(figsize=(15, 8))
+        ax = fig.gca()
+        ax.scatter([], [], alpha=0.2, color='gray', s=5, label='Episodes')
+        for window, color in zip(curve.windows, COLORS):
+            ax.plot([], [], color=color, linewidth=2, label=f'{window}-episode Moving Average')
+        ax.plot([], [], color='black', linewidth=1, alpha=0.6, label='EWMA')
+        ax.axhline(y=0, color='green', linestyle='--', alpha=0.5)
+        ax.text(0, 0, '', verticalalignment='bottom')
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax.set_xlabel('Episode', fontsize=12)
+        ax.set_ylabel('Reward', fontsize=12)
+        ax.set_title('PPO Learning Curve', fontsize=14)
+        ax.legend(fontsize=10)
+    ax = fig.gca()
+    points = np.column_stack([x, curve.reward_series])
+    ax.collections[0].set_offsets(points)
+    for line, series in zip(ax.lines, [*curve.rolling_series.values(), curve.ewma_series]):
+        line.set_data(x, series)
+    mean_reward = curve.rewards.mean
+    ax.lines[-1].set_ydata([mean_reward] * 2)   # the mean line (axhline)
+    ax.texts[0].set_position((len(x) * 0.02, mean_reward))
+    ax.texts[0].set_text(f'Mean: {mean_reward:.1f}')
+    ax.relim()
+    if len(points):
+        ax.update_datalim(points)   # relim() only looks at lines, not the scatter
+    ax.autoscale_view()
+    fig.canvas.draw_idle()
+    return fig
 
 def main():
-    # Read and clean data
-    df = clean_monitor_data(LOG_PATH)
-    
-    if len(df) == 0:
-        print("No valid data found in the log file!")
-        return
+    parser = argparse.ArgumentParser(description="Plot the PPO learning curve from the episode log")
+    parser.add_argument("--log-dir", default=EPISODE_LOG_DIR)
+    parser.add_argument("--run", default=LATEST, help="training run id, 'latest' (default) or 'all'")
+    parser.add_argument("--csv", default=LOG_PATH, help="legacy monitor.csv used when there are no shards")
+    parser.add_argument("--follow", action="store_true", help="keep refreshing while training runs")
+    parser.add_argument("--interval", type=float, default=2.0, help="refresh interval in seconds with --follow")
+    args = parser.parse_args()
 
-    # Create the plot
-    plt.figure(figsize=(15, 8))
-    
-    # Plot raw data points
-    plt.scatter(df.index, df['reward'], alpha=0.2, color='gray', s=5, label='Episodes')
-    
-    # Calculate and plot moving averages
-    window_sizes = [20, 50]
-    colors = ['blue', 'red']
-    
-    for window, color in zip(window_sizes, colors):
-        ma = df['reward'].rolling(window=window, min_periods=1).mean()
-        plt.plot(df.index, ma, color=color, linewidth=2, 
-                label=f'{window}-episode Moving Average')
+    # Read episode data; with --follow only new records are read on each refresh
+    tail = EpisodeTail(args.log_dir, run=None if args.run == "all" else args.run)
+    curve = LearningCurve(WINDOW_SIZES)
+    curve.update(tail.poll())
+    run = tail.current
+    if run is not None:
+        print(f"Run: {run or 'unnamed (older shards)'}")
+    if curve.rewards.count == 0 and not args.follow and os.path.exists(args.csv):
+        curve.update(clean_monitor_data(args.csv))
 
-    # Customize the plot
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.xlabel('Episode', fontsize=12)
-    plt.ylabel('Reward', fontsize=12)
-    plt.title('PPO Learning Curve', fontsize=14)
-    plt.legend(fontsize=10)
+    if args.follow:
+        plt.ion()
+        fig = draw(curve)
+        try:
+            while plt.fignum_exists(fig.number):
+                records = tail.poll()
+                if tail.current != run:   # a newer training run started: plot it from scratch
+                    run, curve = tail.current, LearningCurve(WINDOW_SIZES)
+                    print(f"Run: {run}")
+                if curve.update(records):
+                    draw(curve, fig)
+                    print_summary(curve)
+                plt.pause(args.interval)
+        except KeyboardInterrupt:
+            pass
+        return
 
-    # Add mean line
-    mean_reward = df['reward'].mean()
-    plt.axhline(y=mean_reward, color='green', linestyle='--', alpha=0.5)
-    plt.text(len(df)*0.02, mean_reward, f'Mean: {mean_reward:.1f}', 
-             verticalalignment='bottom')
+    if curve.rewards.count == 0:
+        print("No valid data found in the log file!")
+        return
 
+    draw(curve)
     plt.tight_layout()
     plt.savefig('learning_curve.png', dpi=300, bbox_inches='tight')
     plt.show()
 
     # Print statistics
-    print(f"Total episodes: {len(df)}")
-    print(f"Average reward: {mean_reward:.2f}")
-    print(f"Max reward: {df['reward'].max():.2f}")
-    print(f"Min reward: {df['reward'].min():.2f}")
+    print_summary(curve)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,3 +1,7 @@
 class BaseCallback:
     def __init__(self, verbose=0):
         self.verbose = verbose
+        self.locals = {}
+        self.globals = {}
+        self.n_calls = 0
+        self.num_timesteps = 0
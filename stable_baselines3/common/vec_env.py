@@ -1,6 +1,39 @@
+class VecEnv:
+    def __init__(self, num_envs, observation_space, action_space):
+        self.num_envs = num_envs
+        self.observation_space = observation_space
+        self.action_space = action_space
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
 class SubprocVecEnv:
     def __init__(self, env_fns):
         self.env_fns = env_fns
 
 class DummyVecEnv(SubprocVecEnv):
     pass
+
+class VecMonitor:
+    def __init__(self, venv, filename=None, info_keywords=()):
+        self.venv = venv
+        self.num_envs = getattr(venv, "num_envs", 1)
+
+    def close(self):
+        self.venv.close()
+
+class VecEnvWrapper(VecEnv):
+    def __init__(self, venv, observation_space=None, action_space=None):
+        self.venv = venv
+        super().__init__(venv.num_envs, observation_space or venv.observation_space,
+                         action_space or venv.action_space)
+
+    def step_async(self, actions):
+        self.venv.step_async(actions)
+
+    def close(self):
+        self.venv.close()
+
+    def __getattr__(self, name):
+        return getattr(self.venv, name)
@@ -1,14 +1,15 @@
 import json
 import pytest
+from concurrent.futures import CancelledError
 import requests
 from unittest.mock import patch, MagicMock
 from app.agent import Agent
 
 @pytest.fixture
-def agent():
+def agent(tmp_path):
     # use_real_llm=True to ensure ask_llm calls network layer,
-    # which will be mocked during tests
-    return Agent(use_real_llm=True)
+    # which will be mocked during tests; a private cache keeps replies per test
+    return Agent(use_real_llm=True, cache_path=str(tmp_path / "llm_cache.db"))
 
 def make_response(content_lines, done=True):
     """Helper to simulate streaming lines from requests."""
@@ -26,7 +27,7 @@ def make_response(content_lines, done=True):
 
     return FakeResp(content_lines)
 
-@patch("app.agent.requests.post")
+@patch("app.http_client.requests.Session.post")
 def test_ask_llm_streaming(mock_post, agent):
     # Simulate two JSON chunks then a final done chunk
     lines = [
@@ -37,7 +38,7 @@ def test_ask_llm_streaming(mock_post, agent):
     reply = agent.ask_llm("hi")
     assert reply == "Hello world!"
 
-@patch("app.agent.requests.post")
+@patch("app.http_client.requests.Session.post")
 def test_ask_llm_fallback_raw(mock_post, agent):
     # Simulate a non-JSON response
     fake = MagicMock()
@@ -48,3 +49,105 @@ def test_ask_llm_fallback_raw(mock_post, agent):
 
     reply = agent.ask_llm("hi")
     assert reply == "not-json"
+
+@patch("app.http_client.requests.Session.post")
+def test_ask_llm_stream_yields_deltas_incrementally(mock_post, agent):
+    lines = [
+        json.dumps({"message": {"content": "Hel"}, "done": False}),
+        json.dumps({"message": {"content": "lo"}, "done": False}),
+        json.dumps({"message": {"content": ""}, "done": True}),
+    ]
+    mock_post.return_value = make_response(lines)
+    stream = agent.ask_llm_stream("hi")
+    assert next(stream) == "Hel"
+    assert list(stream) == ["lo"]
+
+@patch("app.http_client.requests.Session.post")
+def test_handle_stream_saves_joined_reply(mock_post, agent, monkeypatch):
+    lines = [
+        json.dumps({"message": {"content": "a"}, "done": False}),
+        json.dumps({"message": {"content": "b"}, "done": True}),
+    ]
+    mock_post.return_value = make_response(lines)
+    saved = []
+    monkeypatch.setattr(agent.memory, "save_message", lambda role, content, **kw: saved.append((role, content)))
+    assert list(agent.handle_stream("tell me something")) == ["a", "b"]
+    assert saved[-1] == ("ai", "ab")
+
+@patch("app.http_client.requests.Session.post")
+def test_ask_llm_adds_relevant_history(mock_post, agent, monkeypatch):
+    mock_post.return_value = make_response([json.dumps({"message": {"content": "ok"}, "done": True})])
+    monkeypatch.setattr(agent.memory, "search", lambda q, limit, kinds: [
+        {"kind": "message", "id": 1, "text": q, "score": -2.0},
+        {"kind": "message", "id": 2, "text": "earlier chat about parsers", "score": -1.0},
+    ])
+    agent.ask_llm("parsers?", history_k=1)
+    sent = mock_post.call_args.kwargs["json"]["messages"][0]["content"]
+    assert "Relevant past conversation:\n- earlier chat about parsers" in sent
+
+@patch("app.http_client.requests.Session.post")
+def test_ask_llm_passes_sampling_options(mock_post, agent):
+    mock_post.return_value = make_response([json.dumps({"message": {"content": "ok"}, "done": True})])
+    agent.ask_llm("hi", options={"temperature": 0.2, "seed": 1})
+    sent = mock_post.call_args.kwargs["json"]["options"]
+    assert sent == {"num_ctx": agent.context.num_ctx, "temperature": 0.2, "seed": 1}
+    agent.ask_llm("hi again")
+    sent = mock_post.call_args.kwargs["json"]["options"]
+    assert sent == {"num_ctx": agent.context.num_ctx, "temperature": agent.temperature}
+
+@patch("app.http_client.requests.Session.post")
+def test_ask_llm_caches_identical_prompts(mock_post, agent):
+    mock_post.return_value = make_response([json.dumps({"message": {"content": "cached"}, "done": True})])
+    assert agent.ask_llm("same prompt") == "cached"
+    assert agent.ask_llm("same prompt") == "cached"
+    assert mock_post.call_count == 1
+    agent.ask_llm("same prompt", options={"temperature": 0.9})
+    agent.ask_llm("same prompt", use_cache=False)
+    # the agent's temperature is part of what is sent, and of the key
+    agent.temperature = 0.1
+    agent.ask_llm("same prompt")
+    assert mock_post.call_count == 4
+    stats = agent.llm_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+def test_self_improve_prompt_is_served_from_cache(agent, monkeypatch):
+    calls = []
+    def chat(prompt, options=None):
+        calls.append(options)
+        return iter(("diff --git a/app/x.py b/app/x.py\n",))
+    monkeypatch.setattr(agent, "_chat_stream", chat)
+    engine = agent.improver
+    prompt = engine._build_prompt()
+    assert engine._request(prompt) == engine._request(prompt)
+    assert len(calls) == 1 and calls[0]["temperature"] == agent.temperature
+    engine.use_cache = False
+    engine._request(prompt)
+    assert len(calls) == 2
+
+def test_agent_startup_defers_rl_imports(tmp_path):
+    import os
+    import subprocess
+    import sys
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = (
+        "import sys; from app.agent import Agent; a = Agent(use_real_llm=False); "
+        "print(sorted(m for m in ('stable_baselines3', 'gymnasium', 'numpy') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+    assert out.stdout.strip().splitlines()[-1] == "[]"
+
+
+def test_policy_is_loaded_once(agent, monkeypatch):
+    loads = []
+    monkeypatch.setattr(agent, "_load_policy", lambda env: loads.append(env) or None)
+    assert agent.policy is None and agent.policy is None
+    assert loads == [agent.rl_env]
+
+
+def test_cancel_before_the_stream_is_advanced_is_not_lost(agent):
+    stream = agent.handle_stream("hello there")
+    agent.cancel()
+    with pytest.raises(CancelledError):
+        next(stream)
+    # the next request starts with a cleared event
+    assert agent.handle("please implement a faster startup").startswith("Feature request received")
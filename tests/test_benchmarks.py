@@ -0,0 +1,38 @@
+import json
+
+from benchmarks import suite
+
+
+def _results(**metrics):
+    return {"metrics": {name: {"value": v, "unit": u} for name, (v, u) in metrics.items()}}
+
+
+def test_compare_flags_regressions_in_the_right_direction():
+    baseline = _results(latency=(1.0, "s"), rate=(1000.0, "rows/s"), fast=(1.0, "s"), gone=(1.0, "s"))
+    current = _results(latency=(1.3, "s"), rate=(900.0, "rows/s"), fast=(0.5, "s"), new=(1.0, "s"))
+    rows = {r["metric"]: r for r in suite.compare(baseline, current, threshold=0.2)}
+    assert set(rows) == {"latency", "rate", "fast"}
+    assert rows["latency"]["regressed"] and round(rows["latency"]["change"], 2) == -0.3
+    assert not rows["rate"]["regressed"] and round(rows["rate"]["change"], 2) == -0.1
+    assert not rows["fast"]["regressed"] and rows["fast"]["change"] == 0.5
+
+
+def test_compare_command_exits_non_zero_on_regression(tmp_path):
+    base, cur = tmp_path / "base.json", tmp_path / "cur.json"
+    base.write_text(json.dumps(_results(step=(1000.0, "steps/s"))))
+    cur.write_text(json.dumps(_results(step=(700.0, "steps/s"))))
+    assert suite.main(["compare", str(cur), "--baseline", str(base)]) == 1
+    assert suite.main(["compare", str(cur), "--baseline", str(base), "--threshold", "0.5"]) == 0
+
+
+def test_env_benchmark_runs_on_quick_profile():
+    results = suite.run("quick", only=["env"])
+    assert set(results["metrics"]) == {"env.step", "env.vec_step_64"}
+    assert all(m["value"] > 0 for m in results["metrics"].values())
+
+
+def test_fixture_tree_is_reproducible(tmp_path):
+    suite.make_tree(str(tmp_path / "a"), 3)
+    suite.make_tree(str(tmp_path / "b"), 3)
+    a = (tmp_path / "a" / "pkg0" / "mod2.py").read_text()
+    assert a == (tmp_path / "b" / "pkg0" / "mod2.py").read_text() and "class " in a
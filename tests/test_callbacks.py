@@ -0,0 +1,43 @@
+import csv
+import os
+import time
+
+from callbacks import BufferedCSVWriter, EpisodeCSVLogger, shard_path
+
+
+def _rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_logger_buffers_rows_and_records_env_ids(tmp_path):
+    logger = EpisodeCSVLogger(str(tmp_path / "episodes.csv"), flush_interval=60)
+    logger._on_training_start()
+    path = logger.writer.path
+    assert path == shard_path(str(tmp_path / "episodes.csv")) and path.endswith(f"-{os.getpid()}.csv")
+
+    logger.num_timesteps = 8
+    logger.locals = {"infos": [{}, {"episode": {"r": 1.5, "l": 4, "t": 0.2}}, {"episode": {"r": -1.0, "l": 4}}]}
+    assert logger._on_step()
+    assert not os.path.exists(path)   # still buffered
+
+    logger._on_training_end()
+    assert _rows(path) == [EpisodeCSVLogger.HEADER, ["1", "8", "1.5", "4", "0.2", "1"], ["2", "8", "-1.0", "4", "", "2"]]
+
+
+def test_writer_flushes_on_size_in_background_and_appends(tmp_path):
+    path = str(tmp_path / "out.csv")
+    writer = BufferedCSVWriter(path, ["a"], max_rows=2, flush_interval=60)
+    writer.writerow([1])
+    writer.writerow([2])
+    deadline = time.time() + 5
+    while not os.path.exists(path) and time.time() < deadline:
+        time.sleep(0.01)
+    writer.writerow([3])
+    writer.close()
+    writer.close()
+
+    again = BufferedCSVWriter(path, ["a"], flush_interval=60)
+    again.writerow([4])
+    again.close()
+    assert _rows(path) == [["a"], ["1"], ["2"], ["3"], ["4"]]
@@ -0,0 +1,60 @@
+import os
+from app.code_context import CodeContextIndex
+
+TEMPLATE = "### FILE: {path}\n{content}\n"
+
+def test_render_includes_python_files_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app/sub")
+    (tmp_path / "app" / "a.py").write_text("A = 1\n")
+    (tmp_path / "app" / "sub" / "b.py").write_text("B = 2\n")
+    (tmp_path / "app" / "notes.txt").write_text("ignored")
+
+    index = CodeContextIndex("app")
+    assert index.paths() == ["app/a.py", "app/sub/b.py"]
+    assert index.render(TEMPLATE) == "### FILE: app/a.py\nA = 1\n\n### FILE: app/sub/b.py\nB = 2\n\n"
+
+def test_refresh_picks_up_changes_and_new_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    (tmp_path / "app" / "a.py").write_text("A = 1\n")
+    index = CodeContextIndex("app")
+    index.render(TEMPLATE)
+
+    (tmp_path / "app" / "a.py").write_text("A = 10\n")
+    (tmp_path / "app" / "c.py").write_text("C = 3\n")
+    text = index.render(TEMPLATE)
+    assert "A = 10" in text and "C = 3" in text
+
+    os.remove("app/c.py")
+    assert index.paths() == ["app/a.py"]
+
+def test_unchanged_tree_is_not_reread(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    (tmp_path / "app" / "a.py").write_text("A = 1\n")
+    index = CodeContextIndex("app")
+    index.refresh()
+    # Pretend the file is old enough that its stat signature is trusted
+    for entry in index._entries.values():
+        entry.racy = False
+    assert index.refresh() is False
+
+def test_invalidate_forces_reread_with_same_stat(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    path = tmp_path / "app" / "a.py"
+    path.write_text("A = 1\n")
+    index = CodeContextIndex("app")
+    index.render(TEMPLATE)
+    for entry in index._entries.values():
+        entry.racy = False
+
+    # Same size, restored mtime: invisible to the stat check
+    st = os.stat(path)
+    path.write_text("A = 2\n")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    assert "A = 1" in index.render(TEMPLATE)
+
+    index.invalidate()
+    assert "A = 2" in index.render(TEMPLATE)
@@ -0,0 +1,53 @@
+from app.code_context import CodeContextIndex
+from app.context_builder import ContextBuilder, estimate_tokens, identifiers, outline
+
+BLOCK = "### FILE: {path}\n{content}\n"
+
+
+def _tree(tmp_path):
+    root = tmp_path / "app"
+    root.mkdir()
+    (root / "parser.py").write_text(
+        "class TokenParser:\n"
+        "    def parse_tokens(self, text):\n"
+        "        return text.split()\n" + "# filler\n" * 200
+    )
+    (root / "gui.py").write_text("def draw_window(title: str) -> None:\n    print(title)\n" + "# filler\n" * 200)
+    (root / "util.py").write_text("LIMIT = 3\n\ndef clamp(x):\n    return min(x, LIMIT)\n")
+    return str(root)
+
+
+def test_identifiers_split_names():
+    terms = identifiers("def parse_tokens(self): TokenParser()")
+    assert {"parse_tokens", "parse", "tokens", "tokenparser", "token", "parser"} <= set(terms)
+    assert "self" not in terms and "def" not in terms
+
+
+def test_outline_keeps_signatures_only():
+    text = outline("x = 1\nLIMIT = 3\nclass A(B):\n    def f(self, y=2):\n        return y\n"
+                   "async def g() -> int:\n    return 1\n")
+    assert text.splitlines() == [
+        "LIMIT = ...", "class A(B):", "    def f(self, y=2): ...", "async def g() -> int: ...",
+    ]
+
+
+def test_rank_prefers_files_matching_the_query(tmp_path):
+    builder = ContextBuilder(CodeContextIndex(_tree(tmp_path)))
+    ranked = builder.rank("make the token parser handle quotes")
+    assert ranked[0].endswith("parser.py")
+
+
+def test_build_fills_budget_with_relevant_files_then_outlines(tmp_path):
+    root = _tree(tmp_path)
+    builder = ContextBuilder(CodeContextIndex(root), num_ctx=700, reserve=100)
+    text = builder.build("improve the token parser", BLOCK)
+    assert estimate_tokens(text) <= 600
+    sel = builder.last_selection
+    assert sel[f"{root}/parser.py"] == "full"
+    assert sel[f"{root}/gui.py"] == "outline"
+    assert f"### OUTLINE: {root}/gui.py\ndef draw_window(title: str) -> None: ..." in text
+
+    # everything fits in a large window
+    builder.num_ctx = 100_000
+    builder.build("improve the token parser", BLOCK)
+    assert set(builder.last_selection.values()) == {"full"}
@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+
+from app.episode_log import (EPISODE_DTYPE, EpisodeLog, EpisodeLogWriter, EpisodeMonitor, EpisodeTail,
+                             VecEpisodeLogger, current_run, runs)
+from app.vec_env import SUCCESS, VecSelfImproveEnv
+
+
+def test_shards_are_merged_by_time_and_ignore_torn_records(tmp_path):
+    d = str(tmp_path)
+    a = EpisodeLogWriter(d, worker="a")
+    b = EpisodeLogWriter(d, worker="b")
+    a.write([1.0, 3.0], [10, 30], [0, 1], times=[1.0, 3.0])
+    b.write(2.0, 20, 0, times=2.0)
+    b.close()
+    # a writer killed mid-record leaves a partial tail
+    with open(a.path, "ab") as f:
+        f.write(b"\x00" * (EPISODE_DTYPE.itemsize - 1))
+    a.close()
+
+    log = EpisodeLog(d)
+    assert len(log) == 3 and len(log.shards()) == 2
+    assert log.column("reward").tolist() == [1.0, 2.0, 3.0]
+    records = log.read(["length", "env"])
+    assert records["length"].tolist() == [10, 20, 30] and records["env"].tolist() == [0, 0, 1]
+    assert len(EpisodeLog(str(tmp_path / "missing")).read()) == 0
+
+
+def test_vec_logger_records_every_finished_episode(tmp_path):
+    class Success:
+        def __call__(self, temperatures, pending):
+            return np.full(len(temperatures), SUCCESS, dtype=np.int8), pending
+
+    venv = VecEpisodeLogger(VecSelfImproveEnv(3, Success(), max_steps=2, warmup_episodes=0),
+                            str(tmp_path), worker=0)
+    venv.reset()
+    for _ in range(4):
+        _, _, dones, infos = venv.step(np.full((3, 1), 0.5))
+    assert dones.all() and infos[2]["episode"]["l"] == 2
+    venv.close()
+
+    records = EpisodeLog(str(tmp_path)).read()
+    assert len(records) == 6
+    assert np.allclose(records["reward"], 0.99) and sorted(records["env"].tolist()) == [0, 0, 1, 1, 2, 2]
+    assert os.path.basename(venv.writer.path) == f"episodes-{current_run()}-0.bin"
+
+
+def test_episode_monitor_wraps_single_env(tmp_path):
+    class Env:
+        steps = 0
+
+        def reset(self, seed=None, options=None):
+            self.steps = 0
+            return 0, {}
+
+        def step(self, action):
+            self.steps += 1
+            return 0, 0.5, self.steps == 2, False, {}
+
+        def close(self):
+            pass
+
+    env = EpisodeMonitor(Env(), str(tmp_path), worker=1, env_id=7)
+    env.reset()
+    env.step(0)
+    *_, info = env.step(0)
+    env.close()
+    assert info["episode"]["r"] == 1.0
+    record = EpisodeLog(str(tmp_path)).read()[0]
+    assert (record["reward"], record["length"], record["env"]) == (1.0, 2, 7)
+
+
+def test_reader_selects_one_run_defaulting_to_the_latest(tmp_path):
+    d = str(tmp_path)
+    old = EpisodeLogWriter(d, worker=0, run="20260101T000000")
+    old.write(-1.0, 5, 0, times=1.0)
+    old.close()
+    os.utime(old.path, (1, 1))
+    legacy = os.path.join(d, "episodes-7.bin")   # written before runs were recorded
+    with open(old.path, "rb") as src, open(legacy, "wb") as dst:
+        dst.write(src.read())
+    os.utime(legacy, (0, 0))
+    new = EpisodeLogWriter(d, worker=0, run="20260102T000000")
+    new.write([1.0, 2.0], [5, 5], [0, 1], times=[2.0, 3.0])
+    new.close()
+
+    assert runs(d) == ["", "20260101T000000", "20260102T000000"]
+    assert EpisodeLog(d).column("reward").tolist() == [1.0, 2.0]
+    assert EpisodeLog(d, run="20260101T000000").column("reward").tolist() == [-1.0]
+    assert len(EpisodeLog(d, run=None)) == 4
+    tail = EpisodeTail(d)
+    assert tail.poll()["reward"].tolist() == [1.0, 2.0] and tail.current == "20260102T000000"
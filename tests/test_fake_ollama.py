@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from app.agent import Agent
+from app.fake_ollama import DEFAULT_DIFF, FakeOllama
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = Agent(use_real_llm=True, cache_path="")
+    yield agent
+    agent.memory.close()
+
+
+def _serve(monkeypatch, **kwargs):
+    fake = FakeOllama(**kwargs).start()
+    monkeypatch.setattr("app.agent.OLLAMA_URL", fake.url)
+    return fake
+
+
+def test_agent_streams_reply_over_a_real_socket(agent, monkeypatch):
+    fake = _serve(monkeypatch, ttft=0.2, tokens_per_sec=100, reply="one two three four")
+    try:
+        start = time.perf_counter()
+        stream = agent.ask_llm_stream("hello there")
+        first = next(stream)
+        first_at = time.perf_counter() - start
+        rest = "".join(stream)
+        total = time.perf_counter() - start
+    finally:
+        fake.stop()
+    assert first + rest == "one two three four"
+    assert first == "one" and first_at >= 0.2
+    assert total >= 0.2 + 3 / 100
+    assert fake.stats["completed"] == 1 and fake.requests[0]["options"]["num_ctx"] == agent.context.num_ctx
+
+
+def test_diff_prompts_get_the_canned_diff(agent, monkeypatch):
+    fake = _serve(monkeypatch)
+    try:
+        assert agent.ask_llm(agent.improver._build_prompt()) == DEFAULT_DIFF
+    finally:
+        fake.stop()
+
+
+def test_code_context_mentioning_diffs_gets_the_plain_reply(agent, monkeypatch, tmp_path):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "patcher.py").write_text(
+        'def reward_for_cycle(diff):\n'
+        '    """Reward for a cycle that applied a diff."""\n'
+        '    return ("Now, produce *only* a unified Git diff", diff)\n')
+    agent.code_index.invalidate()
+    fake = _serve(monkeypatch, reply="plain")
+    try:
+        assert agent.ask_llm("what is the reward for a cycle?") == "plain"
+        assert "a unified Git diff" in fake.requests[0]["messages"][-1]["content"]   # the code was inlined
+        assert agent.ask_llm(agent.improver._build_prompt()) == DEFAULT_DIFF
+    finally:
+        fake.stop()
+
+
+def test_injected_errors_and_stalls(agent, monkeypatch):
+    fake = _serve(monkeypatch, error_rate=1.0, error_status=500)
+    try:
+        with pytest.raises(requests.HTTPError):
+            agent.ask_llm("hi")
+        fake.error_rate, fake.stall_rate, fake.stall_seconds = 0.0, 1.0, 0.3
+        start = time.perf_counter()
+        assert agent.ask_llm("hi", use_cache=False).startswith("Fake reply to:")
+        assert time.perf_counter() - start >= 0.3
+    finally:
+        fake.stop()
+    assert fake.stats["errors"] == 1 and fake.stats["stalls"] == 1
+
+
+def test_concurrent_requests_are_served_in_parallel(agent, monkeypatch):
+    fake = _serve(monkeypatch, ttft=0.3, reply="ok")
+    replies = []
+    try:
+        threads = [threading.Thread(target=lambda i=i: replies.append(agent.ask_llm(f"q{i}"))) for i in range(4)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        fake.stop()
+    assert replies == ["ok"] * 4
+    assert elapsed < 4 * 0.3 and fake.stats["max_in_flight"] > 1
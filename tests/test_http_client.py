@@ -12,22 +12,47 @@ class DummyResponse:
 
 def test_fetch_url_success(monkeypatch):
     # Simulate a 200-OK response
-    monkeypatch.setattr(requests, "get", lambda url, timeout: DummyResponse("hello page", 200))
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, timeout: DummyResponse("hello page", 200))
     result = fetch_url("http://example.com")
     assert result == "hello page"
 
 def test_fetch_url_http_error(monkeypatch):
     # Simulate a 404 response -> ValueError
-    monkeypatch.setattr(requests, "get", lambda url, timeout: DummyResponse("not found", 404))
+    monkeypatch.setattr(requests.Session, "get", lambda self, url, timeout: DummyResponse("not found", 404))
     with pytest.raises(ValueError) as excinfo:
         fetch_url("http://example.com/missing")
     assert "Failed to fetch" in str(excinfo.value)
 
 def test_fetch_url_request_exception(monkeypatch):
     # Simulate a network error
-    def bad_get(url, timeout):
+    def bad_get(self, url, timeout):
         raise requests.ConnectionError("no network")
-    monkeypatch.setattr(requests, "get", bad_get)
+    monkeypatch.setattr(requests.Session, "get", bad_get)
     with pytest.raises(ValueError) as excinfo:
         fetch_url("http://example.com")
     assert "Failed to fetch" in str(excinfo.value)
+
+def test_transport_defaults_and_stats(monkeypatch):
+    from app.http_client import HttpTransport
+    seen = {}
+    def fake_post(self, url, timeout, **kwargs):
+        seen["timeout"] = timeout
+        return DummyResponse("ok", 200)
+    monkeypatch.setattr(requests.Session, "post", fake_post)
+
+    transport = HttpTransport(connect_timeout=1.5, read_timeout=30)
+    transport.post("http://example.com/api", stat="api")
+    transport.post("http://example.com/api", stat="api", timeout=2)
+    assert seen["timeout"] == 2
+
+    stats = transport.stats.snapshot()["api"]
+    assert stats["count"] == 2 and stats["errors"] == 0
+    assert transport.timeout == (1.5, 30)
+
+def test_transport_mounts_pooled_retrying_adapter():
+    from app.http_client import HttpTransport
+    transport = HttpTransport(max_retries=2, pool_size=4)
+    adapter = transport.session.get_adapter("http://localhost:11434")
+    assert adapter.max_retries.total == 2
+    assert "POST" not in adapter.max_retries.allowed_methods
+    assert adapter._pool_maxsize == 4
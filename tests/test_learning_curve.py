@@ -0,0 +1,64 @@
+import numpy as np
+
+from app.episode_log import EpisodeLogWriter, EpisodeTail
+from app.learning_curve import Ewma, GrowableArray, LearningCurve, RollingWindow, RunningStats
+
+
+def test_incremental_stats_match_full_recomputation():
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=250)
+    stats, window, ewma = RunningStats(), RollingWindow(20), Ewma(0.1)
+    rolling, smoothed = [], []
+    for batch in np.split(values, [1, 7, 100, 101]):
+        stats.update(batch)
+        rolling.append(window.update(batch))
+        smoothed.append(ewma.update(batch))
+
+    assert stats.count == 250 and np.isclose(stats.mean, values.mean()) and np.isclose(stats.std, values.std())
+    assert (stats.min, stats.max) == (values.min(), values.max())
+    expected = [values[max(0, i - 19):i + 1].mean() for i in range(250)]
+    assert np.allclose(np.concatenate(rolling), expected)
+    assert np.isclose(window.std, values[-20:].std())
+    manual = values[0]
+    for x in values[1:]:
+        manual += 0.1 * (x - manual)
+    assert np.isclose(np.concatenate(smoothed)[-1], manual)
+
+
+def test_tail_only_returns_new_episodes(tmp_path):
+    d = str(tmp_path)
+    tail = EpisodeTail(d)
+    assert len(tail.poll()) == 0
+
+    a = EpisodeLogWriter(d, worker="a")
+    a.write([1.0, 2.0], [5, 5], [0, 1], times=[1.0, 2.0])
+    curve = LearningCurve(windows=(2,))
+    assert curve.update(tail.poll()) == 2
+    assert curve.update(tail.poll()) == 0
+
+    b = EpisodeLogWriter(d, worker="b")
+    b.write(4.0, 7, 0, times=3.0)
+    a.write(6.0, 9, 0, times=4.0)
+    new = tail.poll()
+    assert new["reward"].tolist() == [4.0, 6.0]
+    curve.update(new)
+    summary = curve.summary()
+    assert summary["episodes"] == 4 and summary["mean_reward"] == 3.25
+    assert summary["rolling2_mean"] == 5.0 and summary["mean_length"] == 6.5
+    assert curve.rolling_series[2].tolist() == [1.0, 1.5, 3.0, 5.0]
+    a.close()
+    b.close()
+
+
+def test_growable_array_appends_in_place():
+    buf = GrowableArray(capacity=2)
+    buf.extend([1.0])
+    first = buf.values
+    buf.extend([2.0, 3.0, 4.0])
+    buf.extend(np.arange(5.0, 9.0))
+    assert buf.values.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0] and len(buf) == 8
+    assert first.tolist() == [1.0]   # earlier views stay valid
+    buf.extend([9.0])   # full at 8: capacity doubles once ...
+    capacity = len(buf._data)
+    buf.extend([10.0, 11.0])
+    assert capacity == 16 and len(buf._data) == capacity   # ... then later polls append in place
@@ -0,0 +1,40 @@
+from app.llm_cache import LLMCache, cache_key
+
+
+def test_cache_key_covers_model_prompt_and_options():
+    base = cache_key("mistral", "p", {"temperature": 0.5})
+    assert base == cache_key("mistral", "p", {"temperature": 0.5})
+    assert base != cache_key("llama3", "p", {"temperature": 0.5})
+    assert base != cache_key("mistral", "q", {"temperature": 0.5})
+    assert base != cache_key("mistral", "p", {"temperature": 0.7})
+    assert base != cache_key("mistral", "p", {"temperature": 0.5, "seed": 1})
+
+
+def test_replies_persist_across_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = LLMCache(path, memory_entries=1)
+    cache.put("a", "reply a")
+    cache.put("b", "reply b")   # pushes "a" out of the in-memory LRU
+    assert cache.get("a") == "reply a"
+    assert cache.get("missing") is None
+    assert cache.stats()["memory_hits"] == 0
+    assert cache.get("a") == "reply a"
+    assert cache.stats()["memory_hits"] == 1
+    cache.close()
+
+    reopened = LLMCache(path)
+    assert reopened.get("b") == "reply b"
+    assert reopened.stats()["bytes"] == len("reply a") + len("reply b")
+
+
+def test_size_eviction_drops_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.db"), max_bytes=25)
+    for key in ("a", "b", "c"):
+        cache.put(key, key * 10)
+    # 30 bytes > 25: the oldest entry goes
+    assert cache.stats()["bytes"] == 20
+    assert cache.get("a") is None
+    assert cache.get("c") == "c" * 10
+    cache.get("b")
+    cache.put("d", "d" * 10)
+    assert cache.get("c") is None and cache.get("b") == "b" * 10
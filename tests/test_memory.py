@@ -32,3 +32,127 @@ def test_unique_feature_descriptions(db_path):
     with pytest.raises(IntegrityError):
         session.execute(mem.features.insert().values(description="feat1"))
         session.commit()
+
+def test_connections_use_wal(db_path):
+    mem = Memory(db_path)
+    with mem.engine.connect() as conn:
+        mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    assert mode.lower() == "wal"
+
+def test_write_behind_group_commit_and_flush(db_path):
+    mem = Memory(db_path, write_behind=True, flush_interval_ms=10_000, flush_rows=1000)
+    for i in range(5):
+        mem.save_message("user", f"m{i}")
+    mem.add_reward(2)
+    mem.add_reward(3)
+
+    # Nothing is visible to other connections until the batch is flushed
+    other = Memory(db_path)
+    assert other.Session().query(other.messages).count() == 0
+
+    mem.flush()
+    assert [m["content"] for m in other.list_messages()] == [f"m{i}" for i in range(5)]
+    assert other.get_score() == 5
+    mem.close()
+
+def test_write_behind_flushes_on_row_threshold(db_path):
+    mem = Memory(db_path, write_behind=True, flush_interval_ms=10_000, flush_rows=3)
+    for i in range(3):
+        mem.save_message("ai", f"r{i}")
+    other = Memory(db_path)
+    import time
+    deadline = time.monotonic() + 5
+    while other.Session().query(other.messages).count() < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert other.Session().query(other.messages).count() == 3
+    mem.close()
+
+def test_windowed_history_queries(db_path):
+    mem = Memory(db_path)
+    for i in range(10):
+        mem.save_message("user" if i % 2 == 0 else "ai", f"m{i}", session_id="s1" if i < 6 else "s2")
+
+    last3 = mem.recent_messages(3)
+    assert [m["content"] for m in last3] == ["m7", "m8", "m9"]
+    assert last3[0]["created_at"] is not None
+
+    assert [m["content"] for m in mem.recent_messages(2, role="ai")] == ["m7", "m9"]
+    assert [m["content"] for m in mem.iter_messages(session_id="s2")] == ["m6", "m7", "m8", "m9"]
+
+    pivot = last3[0]["id"]
+    assert [m["content"] for m in mem.recent_messages(2, before_id=pivot)] == ["m5", "m6"]
+    assert [m["content"] for m in mem.iter_messages(after_id=pivot, limit=1)] == ["m8"]
+
+def test_existing_database_is_migrated(db_path):
+    import sqlite3
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE messages (id INTEGER PRIMARY KEY, role VARCHAR NOT NULL, content TEXT NOT NULL)")
+    conn.execute("INSERT INTO messages (role, content) VALUES ('user', 'old')")
+    conn.commit()
+    conn.close()
+
+    mem = Memory(db_path)
+    mem.save_message("ai", "new", session_id="s")
+    assert [m["content"] for m in mem.list_messages()] == ["old", "new"]
+    with mem.engine.connect() as c:
+        names = {row[1] for row in c.exec_driver_sql("PRAGMA index_list(messages)")}
+    assert "ix_messages_session_id" in names
+
+def test_full_text_search_ranks_messages_and_features(db_path):
+    mem = Memory(db_path)
+    mem.save_message("user", "the snapshot restore deletes my files")
+    mem.save_message("ai", "unrelated answer about weather")
+    mem.save_feature("please implement snapshot garbage collection")
+
+    hits = mem.search("snapshot restore?", limit=5)
+    assert hits[0]["kind"] == "message" and "restore" in hits[0]["text"]
+    assert {h["kind"] for h in hits} == {"message", "feature"}
+    assert all("weather" not in h["text"] for h in hits)
+
+    assert [h["kind"] for h in mem.search("snapshot", kinds=("feature",))] == ["feature"]
+    assert mem.search("!!!") == []
+
+def test_search_index_follows_deletes(db_path):
+    mem = Memory(db_path)
+    mem.save_feature("add caching layer")
+    fid = mem.search("caching")[0]["id"]
+    mem.delete_feature(fid)
+    assert mem.search("caching") == []
+
+
+def test_feature_counter_tracks_saves_and_deletes(tmp_path):
+    db = str(tmp_path / "count.db")
+    mem = Memory(db)
+    assert mem.count_features() == 0
+    mem.save_feature("a")
+    mem.save_feature("b")
+    mem.save_feature("a")   # duplicate: ignored, count unchanged
+    assert mem.count_features() == 2
+    [first, _] = mem.Session().query(mem.features).all()
+    mem.delete_feature(first.id)
+    assert mem.count_features() == 1
+
+    # another writer on the same file is picked up on refresh / reopen
+    other = Memory(db)
+    other.save_feature("c")
+    assert mem.count_features() == 1 and mem.count_features(refresh=True) == 2
+    assert Memory(db).count_features() == 2
+
+
+def test_env_reset_sees_features_added_by_other_processes(tmp_path):
+    from app.agent import Agent
+    from app.self_improve_env import SelfImproveEnv
+
+    class EnvAgent:
+        count_features = Agent.count_features
+
+        def __init__(self, memory):
+            self.memory = memory
+
+    db = str(tmp_path / "env.db")
+    env = SelfImproveEnv(EnvAgent(Memory(db)))
+    obs, _ = env.reset()
+    assert obs[1] == 0
+    Memory(db).save_feature("added from the chat UI")
+    obs, _ = env.reset()
+    assert obs[1] == 1
@@ -0,0 +1,129 @@
+import json
+import os
+import urllib.request
+from concurrent.futures import CancelledError
+
+import pytest
+
+from app.metrics import MetricsRegistry
+from app.self_improve import SelfImproveEngine
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = MetricsRegistry(str(tmp_path / "spans.jsonl"), str(tmp_path / "metrics.prom"), buckets=(0.1, 1.0))
+    yield registry
+    registry.close()
+
+
+def _spans(registry):
+    with open(registry.log_path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_spans_record_histograms_outcomes_and_nesting(registry):
+    with registry.span("outer", kind="chat"):
+        with registry.span("inner") as inner:
+            inner.outcome = "partial"
+    with pytest.raises(ValueError):
+        with registry.span("outer"):
+            raise ValueError("boom")
+    with pytest.raises(CancelledError):
+        with registry.span("outer"):
+            raise CancelledError()
+    registry.observe("slow", 5.0)
+
+    snap = registry.snapshot()
+    assert snap["outer"]["count"] == 3 and snap["outer"]["outcomes"] == {"ok": 1, "error": 1, "cancelled": 1}
+    assert snap["inner"]["outcomes"] == {"partial": 1}
+    rows = _spans(registry)
+    assert [r["span"] for r in rows] == ["inner", "outer", "outer", "outer"]
+    assert rows[0]["parent"] == "outer" and rows[1]["parent"] is None and rows[1]["kind"] == "chat"
+
+    text = registry.prometheus()
+    assert 'aisapp_span_duration_seconds_bucket{span="slow",le="1.0"} 0' in text
+    assert 'aisapp_span_duration_seconds_bucket{span="slow",le="+Inf"} 1' in text
+    assert 'aisapp_span_total{span="outer",outcome="error"} 1' in text
+    # the text file is rewritten after each top-level span
+    with open(registry.prom_path) as f:
+        assert 'aisapp_span_total{span="outer",outcome="cancelled"} 1' in f.read()
+
+
+def test_span_log_keeps_one_handle_and_follows_path_changes(tmp_path, registry):
+    with registry.span("a"):
+        pass
+    handle = registry._log_file
+    with registry.span("b"):
+        pass
+    assert registry._log_file is handle
+    assert [r["span"] for r in _spans(registry)] == ["a", "b"]   # line-buffered: readable at once
+
+    registry.log_path = str(tmp_path / "other" / "spans.jsonl")
+    with registry.span("c"):
+        pass
+    assert handle.closed and [r["span"] for r in _spans(registry)] == ["c"]
+
+
+def test_prometheus_endpoint(registry):
+    registry.observe("cycle", 0.5, "success")
+    server = registry.serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            body = resp.read().decode()
+        assert resp.headers["Content-Type"].startswith("text/plain")
+        assert 'aisapp_span_duration_seconds_count{span="cycle"} 1' in body
+    finally:
+        registry.close()
+
+
+def test_run_cycle_emits_a_span_per_phase(tmp_path, monkeypatch, registry):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    (tmp_path / "app" / "mod.py").write_text("VALUE = 1\n")
+
+    class Agent:
+        def ask_llm(self, prompt):
+            return "--- a/app/mod.py\n+++ b/app/mod.py\n@@ -1 +1 @@\n-VALUE = 1\n+VALUE = 2\n"
+
+        def get_features(self):
+            return []
+
+    engine = SelfImproveEngine(Agent(), use_real_llm=False, test_cmd="true", metrics=registry)
+    assert engine.run_cycle() == "success"
+    rows = _spans(registry)
+    phases = [r["span"] for r in rows if r["parent"] == "cycle"]
+    assert phases == ["cycle.snapshot", "cycle.context", "cycle.llm", "cycle.parse", "cycle.apply",
+                      "cycle.tests", "cycle.promote", "cycle.cleanup", "cycle.record", "cycle.gc"]
+    assert rows[-1]["span"] == "cycle" and rows[-1]["outcome"] == "success"
+    assert [r["scope"] for r in rows if r["span"] == "cycle.test_run"] == ["full"]
+    assert set(engine.last_cycle["durations"]) >= {"snapshot", "llm", "tests", "total"}
+
+
+def test_bound_pool_workers_keep_their_parent_span(registry):
+    from concurrent.futures import ThreadPoolExecutor
+
+    def work():
+        with registry.span("cycle.test_run"):
+            pass
+
+    with registry.span("cycle.tests"):
+        bound = registry.bind(work)   # captured on the submitting thread
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(lambda _: bound(), range(2)))
+        # only the top-level span rewrites the Prometheus file
+        assert not os.path.exists(registry.prom_path)
+    rows = _spans(registry)
+    assert [(r["span"], r["parent"]) for r in rows] == [("cycle.test_run", "cycle.tests")] * 2 + [("cycle.tests", None)]
+
+
+def test_agent_handle_is_instrumented(tmp_path, monkeypatch, registry):
+    from app.agent import Agent
+    monkeypatch.chdir(tmp_path)
+    agent = Agent(cache_path="")
+    agent.metrics = registry
+    agent.handle("please implement faster startup")
+    agent.memory.close()
+    rows = _spans(registry)
+    assert [(r["span"], r["parent"]) for r in rows] == [("handle.save_message", "handle"), ("handle", None)]
+    assert rows[-1]["kind"] == "feature" and rows[-1]["outcome"] == "ok"
@@ -71,3 +71,185 @@ def test_run_tests_executes_command(tmp_path):
     engine_fail = SelfImproveEngine(DummyAgent(""), test_cmd="false")
     res2 = engine_fail._run_tests()
     assert res2.returncode != 0
+
+
+def test_run_tests_cancel_kills_subprocess(tmp_path):
+    import threading
+    import time
+    from concurrent.futures import CancelledError
+
+    agent = DummyAgent("")
+    agent.cancel_event = threading.Event()
+    engine = SelfImproveEngine(agent, test_cmd="sleep 30")
+    threading.Timer(0.3, agent.cancel_event.set).start()
+    start = time.monotonic()
+    with pytest.raises(CancelledError):
+        engine._run_tests()
+    assert time.monotonic() - start < 10
+
+
+def test_run_cycle_applies_fenced_diff_in_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    (tmp_path / "app" / "mod.py").write_text("VALUE = 1\n")
+    llm_output = (
+        "```diff\n"
+        "diff --git a/app/mod.py b/app/mod.py\n"
+        "--- a/app/mod.py\n"
+        "+++ b/app/mod.py\n"
+        "@@ -1 +1 @@\n"
+        "-VALUE = 1\n"
+        "+VALUE = 2\n"
+        "```\n"
+    )
+    engine = SelfImproveEngine(DummyAgent(llm_output), test_cmd="true")
+    assert engine.run_cycle() == 'success'
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 2\n"
+
+
+def test_apply_patch_reports_hunk_failures(tmp_path, simple_app):
+    engine = SelfImproveEngine(DummyAgent(""), test_cmd="true")
+    os.makedirs("app", exist_ok=True)
+    shutil.copytree(os.path.join(simple_app, "app"), "app", dirs_exist_ok=True)
+    bad = "--- a/app/file.txt\n+++ b/app/file.txt\n@@ -1 +1 @@\n-Z\n+B\n"
+    assert engine._apply_patch(bad) is False
+    [failure] = engine.last_patch_result.failures
+    assert failure.path == "app/file.txt" and failure.hunk_index == 0
+    assert open("app/file.txt").read() == "A\n"
+
+
+def test_apply_patch_rejects_paths_outside_app(tmp_path, simple_app):
+    engine = SelfImproveEngine(DummyAgent(""), test_cmd="true")
+    os.makedirs("app", exist_ok=True)
+    evil = "--- /dev/null\n+++ b/app/../evil.py\n@@ -0,0 +1 @@\n+x\n"
+    assert engine._parse([(None, evil)]) == []
+    assert engine._apply_patch(evil) is False
+    assert not (tmp_path / "evil.py").exists()
+
+
+def _project_with_tests(tmp_path):
+    os.makedirs("app")
+    os.makedirs("tests")
+    (tmp_path / "app" / "mod.py").write_text("VALUE = 1\n")
+    (tmp_path / "pytest.ini").write_text("[pytest]\npythonpath = .\ntestpaths = tests\n")
+    (tmp_path / "tests" / "test_mod.py").write_text(
+        "from app.mod import VALUE\n\ndef test_value():\n    assert VALUE == 2\n"
+    )
+
+
+def _value_diff(new_line):
+    return (
+        "diff --git a/app/mod.py b/app/mod.py\n--- a/app/mod.py\n+++ b/app/mod.py\n"
+        f"@@ -1 +1 @@\n-VALUE = 1\n+{new_line}\n"
+    )
+
+
+def test_candidate_is_tested_in_workspace_then_promoted(tmp_path, monkeypatch):
+    import sys
+    monkeypatch.chdir(tmp_path)
+    _project_with_tests(tmp_path)
+    engine = SelfImproveEngine(DummyAgent(_value_diff("VALUE = 2")), test_cmd=f"{sys.executable} -m pytest -q")
+    assert engine.run_cycle() == 'success'
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 2\n"
+    assert not [d for d in os.listdir(tmp_path / ".workspaces") if d.startswith("candidate-")]
+
+
+def test_failed_candidate_never_touches_live_tree(tmp_path, monkeypatch):
+    import sys
+    monkeypatch.chdir(tmp_path)
+    _project_with_tests(tmp_path)
+    engine = SelfImproveEngine(DummyAgent(_value_diff("VALUE = (")), test_cmd=f"{sys.executable} -m pytest -q")
+    assert engine.run_cycle() == 'fail'
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 1\n"
+    assert not [d for d in os.listdir(tmp_path / ".workspaces") if d.startswith("candidate-")]
+
+
+def test_affected_tests_run_before_full_suite(tmp_path, monkeypatch):
+    import subprocess
+    monkeypatch.chdir(tmp_path)
+    _project_with_tests(tmp_path)
+    (tmp_path / "tests" / "test_unrelated.py").write_text("def test_ok():\n    pass\n")
+    engine = SelfImproveEngine(DummyAgent(_value_diff("VALUE = 2")), test_cmd="pytest -q")
+    calls = []
+    def fake_run(cwd=None, paths=None):
+        calls.append(paths)
+        return subprocess.CompletedProcess("pytest", 2 if paths else 0)
+    monkeypatch.setattr(engine, "_run_tests", fake_run)
+
+    # affected tests error out: no escalation to the full suite
+    assert engine.run_cycle() == 'fail'
+    assert calls == [["tests/test_mod.py"]]
+
+
+def test_full_suite_runs_only_before_promotion(tmp_path, monkeypatch):
+    import subprocess
+    monkeypatch.chdir(tmp_path)
+    _project_with_tests(tmp_path)
+    engine = SelfImproveEngine(DummyAgent(_value_diff("VALUE = 2")), test_cmd="pytest -q")
+    calls, codes = [], {}
+    def fake_run(cwd=None, paths=None):
+        calls.append(paths)
+        return subprocess.CompletedProcess("pytest", codes.get(bool(paths), 0))
+    monkeypatch.setattr(engine, "_run_tests", fake_run)
+
+    # failing affected tests reject the candidate without a full run (or promotion)
+    codes[True] = 1
+    assert engine.run_cycle() == 'partial'
+    assert calls == [["tests/test_mod.py"]]
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 1\n"
+
+    # passing affected tests are confirmed by the full suite before promotion
+    calls.clear()
+    codes[True] = 0
+    assert engine.run_cycle() == 'success'
+    assert calls == [["tests/test_mod.py"], None]
+
+
+class MultiAgent(DummyAgent):
+    """Returns a different diff per sampling seed."""
+
+    def __init__(self, diffs):
+        super().__init__(diffs[0])
+        self.diffs = diffs
+        self.options = []
+
+    def ask_llm(self, prompt, options=None):
+        self.options.append(options)
+        return self.diffs[options["seed"]]
+
+
+def test_best_of_k_promotes_passing_candidate(tmp_path, monkeypatch):
+    import sys
+    monkeypatch.chdir(tmp_path)
+    _project_with_tests(tmp_path)
+    agent = MultiAgent([_value_diff("VALUE = 3"), "no diff here", _value_diff("VALUE = 2")])
+    engine = SelfImproveEngine(agent, test_cmd=f"{sys.executable} -m pytest -q", candidates=3)
+    assert engine.run_cycle() == 'success'
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 2\n"
+    assert len({o["temperature"] for o in agent.options}) == 3
+    assert not [d for d in os.listdir(tmp_path / ".workspaces") if d.startswith("candidate-")]
+
+
+def test_best_of_k_prefers_smaller_diff_on_tie(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    (tmp_path / "app" / "mod.py").write_text("VALUE = 1\n")
+    big = _value_diff("VALUE = 2\n+EXTRA = 1").replace("@@ -1 +1 @@", "@@ -1 +1,2 @@")
+    engine = SelfImproveEngine(MultiAgent([big, _value_diff("VALUE = 2")]), test_cmd="true", candidates=2)
+    assert engine.run_cycle() == 'success'
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 2\n"
+
+
+def test_run_cycle_records_outcome_and_durations(tmp_path, monkeypatch):
+    from app.cycle_recorder import CycleRecorder
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("app")
+    (tmp_path / "app" / "mod.py").write_text("VALUE = 1\n")
+    agent = DummyAgent(_value_diff("VALUE = 2"))
+    agent.temperature = 0.3
+    recorder = CycleRecorder(str(tmp_path / "cycles.jsonl"))
+    engine = SelfImproveEngine(agent, test_cmd="true", recorder=recorder)
+    assert engine.run_cycle() == 'success'
+    [row] = CycleRecorder.load(recorder.path)
+    assert row["outcome"] == "success" and row["temperature"] == 0.3 and row["pending"] == 0
+    assert row["prompt_tokens"] > 0 and {"llm", "tests", "total"} <= set(row["durations"])
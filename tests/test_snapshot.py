@@ -25,3 +25,69 @@ def test_snapshot_and_restore(tmp_path):
     shutil.rmtree(str(app_dir))
     shutil.copytree(snap, str(app_dir))
     assert (app_dir / "dummy.txt").read_text() == "version1"
+
+def test_unchanged_files_are_stored_once(tmp_path):
+    app_dir = tmp_path / "app"
+    (app_dir / "pkg").mkdir(parents=True)
+    (app_dir / "a.py").write_text("a")
+    (app_dir / "pkg" / "b.py").write_text("b")
+    sm = SnapshotManager(str(app_dir), str(tmp_path / "backups"))
+
+    s1 = sm.create()
+    (app_dir / "a.py").write_text("changed")
+    s2 = sm.create()
+
+    # unchanged file is shared, changed one gets a new blob
+    assert os.path.samefile(os.path.join(s1, "pkg", "b.py"), os.path.join(s2, "pkg", "b.py"))
+    assert open(os.path.join(s1, "a.py")).read() == "a"
+    assert open(os.path.join(s2, "a.py")).read() == "changed"
+    blobs = [f for _, _, files in os.walk(sm.objects_dir) for f in files]
+    assert len(blobs) == 3
+    assert sm.get_latest() == s2
+
+def test_restore_rewrites_changed_and_removes_new_files(tmp_path):
+    app_dir = tmp_path / "app"
+    app_dir.mkdir()
+    (app_dir / "a.py").write_text("a")
+    sm = SnapshotManager(str(app_dir), str(tmp_path / "backups"))
+    snap = sm.create()
+
+    (app_dir / "a.py").write_text("broken")
+    (app_dir / "new").mkdir()
+    (app_dir / "new" / "extra.py").write_text("x")
+    sm.restore(snap)
+
+    assert (app_dir / "a.py").read_text() == "a"
+    assert not (app_dir / "new").exists()
+
+def test_gc_keeps_last_and_successful(tmp_path):
+    app_dir = tmp_path / "app"
+    app_dir.mkdir()
+    sm = SnapshotManager(str(app_dir), str(tmp_path / "backups"), keep_last=2)
+    snaps = []
+    for i in range(5):
+        (app_dir / "a.py").write_text(f"v{i}")
+        snaps.append(sm.create())
+    sm.mark(snaps[0], "success")
+
+    assert sm.gc(blob_grace=0) == 2
+    remaining = [s for s in snaps if os.path.exists(s)]
+    assert remaining == [snaps[0], snaps[3], snaps[4]]
+    blobs = [f for _, _, files in os.walk(sm.objects_dir) for f in files]
+    assert len(blobs) == 3
+
+def test_gc_keeps_fresh_unreferenced_blobs(tmp_path):
+    app_dir = tmp_path / "app"
+    app_dir.mkdir()
+    (app_dir / "a.py").write_text("a")
+    sm = SnapshotManager(str(app_dir), str(tmp_path / "backups"), keep_last=0, keep_successful=False)
+    sm.create()
+    # a blob stored by a create() whose manifest is not written yet
+    (app_dir / "b.py").write_text("b")
+    pending = sm._object_path(sm._store_blob(str(app_dir / "b.py")))
+    assert sm.gc() == 1
+    assert os.path.exists(pending)
+    old = os.stat(pending).st_mtime - 3600
+    os.utime(pending, (old, old))
+    assert sm.gc(blob_grace=60) == 0
+    assert not os.path.exists(pending)
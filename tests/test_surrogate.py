@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.cycle_recorder import CycleRecorder
+from app.surrogate import SurrogateCycleExecutor, SurrogateModel, SurrogateSelfImproveEnv
+from app.vec_env import SUCCESS, VecSelfImproveEnv
+
+
+def _synthetic_log(path, n=600, seed=0):
+    """Cycles that mostly succeed at low temperature and fail at high temperature."""
+    rng = np.random.default_rng(seed)
+    recorder = CycleRecorder(str(path))
+    for _ in range(n):
+        temp = rng.random()
+        outcome = 'success' if rng.random() > temp else False
+        recorder.record(temp, pending=2, prompt_tokens=3000, outcome=outcome,
+                        durations={"llm": 20.0, "tests": 5.0, "total": 26.0})
+
+
+def test_recorder_round_trip(tmp_path):
+    path = tmp_path / "logs" / "cycles.jsonl"
+    CycleRecorder(str(path)).record(0.3, 1, 1200, 'partial', {"total": 1.23456})
+    with open(path, "a") as f:
+        f.write('{"torn')
+    [row] = CycleRecorder.load(str(path))
+    assert row["outcome"] == "partial" and row["durations"] == {"total": 1.2346}
+
+
+def test_surrogate_learns_temperature_effect(tmp_path):
+    _synthetic_log(tmp_path / "cycles.jsonl")
+    model = SurrogateModel().fit(CycleRecorder.load(str(tmp_path / "cycles.jsonl")))
+    low, high = model.predict_proba(np.array([0.1, 0.9]), 2, 3000)
+    assert low[SUCCESS] > 0.75 and high[SUCCESS] < 0.25
+    assert model.durations["llm"] == 20.0
+
+    model.save(str(tmp_path / "model.json"))
+    loaded = SurrogateModel.load(str(tmp_path / "model.json"))
+    assert np.allclose(loaded.predict_proba(0.5, 2, 3000), model.predict_proba(0.5, 2, 3000))
+
+
+def test_surrogate_envs_sample_outcomes(tmp_path):
+    _synthetic_log(tmp_path / "cycles.jsonl")
+    model = SurrogateModel().fit(CycleRecorder.load(str(tmp_path / "cycles.jsonl")))
+
+    env = SurrogateSelfImproveEnv(model, pending=2, prompt_tokens=3000, seed=0, max_steps=1)
+    rewards = []
+    for _ in range(200):
+        env.reset()
+        rewards.append(env.step(np.array([0.05]))[1])
+    assert np.mean(rewards) > 0.5
+
+    vec = VecSelfImproveEnv(256, SurrogateCycleExecutor(model, prompt_tokens=3000, seed=0),
+                            max_steps=1, warmup_episodes=0, pending=2)
+    vec.reset()
+    _, low, _ = vec.step_batch(np.full(256, 0.05))
+    _, high, _ = vec.step_batch(np.full(256, 0.95))
+    assert low.mean() > high.mean()
@@ -0,0 +1,44 @@
+from app.test_impact import TestImpactMap, is_pytest_command
+
+def write(root, rel, text):
+    path = root / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+def make_tree(root):
+    write(root, "app/base.py", "X = 1\n")
+    write(root, "app/mid.py", "from app.base import X\n")
+    write(root, "app/pkg/__init__.py", "")
+    write(root, "app/pkg/leaf.py", "from . import helper\n")
+    write(root, "app/pkg/helper.py", "")
+    write(root, "app/other.py", "import json\n")
+    write(root, "tests/test_mid.py", "from app.mid import X\n")
+    write(root, "tests/test_leaf.py", "import app.pkg.leaf\n")
+    write(root, "tests/test_other.py", "from app import other\n")
+
+def test_transitive_and_relative_imports(tmp_path):
+    make_tree(tmp_path)
+    impact = TestImpactMap()
+    assert impact.affected_tests(str(tmp_path), ["app/base.py"]) == ["tests/test_mid.py"]
+    assert impact.affected_tests(str(tmp_path), ["app/pkg/helper.py"]) == ["tests/test_leaf.py"]
+    assert impact.affected_tests(str(tmp_path), ["app/other.py"]) == ["tests/test_other.py"]
+    assert impact.affected_tests(str(tmp_path), ["tests/test_mid.py"]) == ["tests/test_mid.py"]
+    assert impact.affected_tests(str(tmp_path), ["app/unused.py"]) == []
+
+def test_cache_is_persisted_and_reused(tmp_path):
+    make_tree(tmp_path / "proj")
+    cache = str(tmp_path / "impact.json")
+    TestImpactMap(cache_path=cache).affected_tests(str(tmp_path / "proj"), ["app/base.py"])
+
+    impact = TestImpactMap(cache_path=cache)
+    assert "app/mid.py" in impact._cache
+    # an edit that adds a new dependency is picked up
+    write(tmp_path / "proj", "app/other.py", "import app.base\n")
+    assert impact.affected_tests(str(tmp_path / "proj"), ["app/base.py"]) == [
+        "tests/test_mid.py", "tests/test_other.py"]
+
+def test_is_pytest_command():
+    assert is_pytest_command("pytest")
+    assert is_pytest_command("python -m pytest -q -k smoke")
+    assert not is_pytest_command("pytest tests/test_smoke.py -q")
+    assert not is_pytest_command("true")
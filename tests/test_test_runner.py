@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from concurrent.futures import CancelledError
+
+import pytest
+
+from app.test_runner import WarmTestRunner, pytest_args, run_subprocess
+
+
+def _write_suite(root, body):
+    (root / "tests").mkdir()
+    (root / "tests" / "test_sample.py").write_text(body)
+
+
+def test_warm_runner_returns_structured_results(tmp_path):
+    _write_suite(tmp_path, (
+        "import pytest\n"
+        "def test_ok(): assert True\n"
+        "def test_bad(): assert False\n"
+        "@pytest.mark.skip\n"
+        "def test_skipped(): pass\n"
+        "@pytest.fixture\n"
+        "def broken(): raise RuntimeError\n"
+        "def test_error(broken): pass\n"
+    ))
+    res = WarmTestRunner().run(["-q", "-p", "no:cacheprovider"], cwd=str(tmp_path))
+    assert res.returncode == 1
+    assert (res.passed, res.failed, res.errors, res.skipped) == (1, 1, 1, 1)
+    assert "tests/test_sample.py::test_ok" in res.durations
+    assert "1 failed" in res.stdout
+
+
+def test_warm_runner_uses_fresh_project_modules(tmp_path):
+    # each run must import the workspace's app package, not a cached one
+    runner = WarmTestRunner()
+    (tmp_path / "app").mkdir()
+    _write_suite(tmp_path, "from app.mod import VALUE\ndef test_value(): assert VALUE == 2\n")
+    for value, rc in ((1, 1), (2, 0)):
+        (tmp_path / "app" / "mod.py").write_text(f"VALUE = {value}\n")
+        res = runner.run(["-q", "-p", "no:cacheprovider", "--rootdir", str(tmp_path)], cwd=str(tmp_path))
+        assert res.returncode == rc
+
+
+def test_warm_runner_cancel_kills_child(tmp_path):
+    _write_suite(tmp_path, "import time\ndef test_slow(): time.sleep(30)\n")
+    event = threading.Event()
+    threading.Timer(0.5, event.set).start()
+    start = time.monotonic()
+    with pytest.raises(CancelledError):
+        WarmTestRunner().run(["-q", "-p", "no:cacheprovider"], cwd=str(tmp_path), cancel_event=event)
+    assert time.monotonic() - start < 10
+
+
+def _alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"   # zombies are dead but unreaped
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc"), reason="needs /proc")
+def test_warm_runner_cancel_kills_processes_started_by_tests(tmp_path):
+    _write_suite(tmp_path, (
+        "import subprocess, sys, time\n"
+        "def test_spawns():\n"
+        "    p = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+        "    open('child.pid', 'w').write(str(p.pid))\n"
+        "    time.sleep(30)\n"
+    ))
+    event = threading.Event()
+    pid_file = tmp_path / "child.pid"
+    threading.Thread(target=lambda: (_wait_for(pid_file.exists), event.set()), daemon=True).start()
+    with pytest.raises(CancelledError):
+        WarmTestRunner().run(["-q", "-p", "no:cacheprovider"], cwd=str(tmp_path), cancel_event=event)
+    pid = int(pid_file.read_text())
+    assert _wait_for(lambda: not _alive(pid))
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def test_pytest_args_and_subprocess_fallback():
+    assert pytest_args("pytest -q") == ["-q"]
+    assert pytest_args("python3 -m pytest -x tests") == ["-x", "tests"]
+    assert pytest_args("make test") is None
+    res = run_subprocess("echo hi; exit 3")
+    assert res.returncode == 3 and res.stdout.strip() == "hi"
@@ -0,0 +1,94 @@
+import os
+from app.unified_diff import apply_patch, parse_patch
+
+ORIGINAL = "".join(f"line{i}\n" for i in range(1, 21))
+
+def write(tmp_path, rel, text):
+    path = tmp_path / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+def test_parse_ignores_fences_and_prose():
+    text = (
+        "Here is the patch:\n"
+        "```diff\n"
+        "diff --git a/app/x.py b/app/x.py\n"
+        "index 111..222 100644\n"
+        "--- a/app/x.py\n"
+        "+++ b/app/x.py\n"
+        "@@ -1,2 +1,2 @@\n"
+        " keep\n"
+        "-old\n"
+        "+new\n"
+        "```\n"
+        "Note: done\n"
+    )
+    [patch] = parse_patch(text)
+    assert patch.old_path == patch.new_path == "app/x.py"
+    [hunk] = patch.hunks
+    assert hunk.old_lines() == ["keep\n", "old\n"]
+    assert hunk.new_lines() == ["keep\n", "new\n"]
+
+def test_apply_with_offset_and_fuzz(tmp_path):
+    path = write(tmp_path, "app/x.py", ORIGINAL)
+    # stated at line 3, real location is line 10; first context line is wrong
+    diff = (
+        "--- a/app/x.py\n+++ b/app/x.py\n"
+        "@@ -3,4 +3,4 @@\n"
+        " WRONG\n line11\n-line12\n+LINE12\n line13\n"
+    )
+    result = apply_patch(diff, root=str(tmp_path))
+    assert result.ok
+    offset, fuzz = result.offsets[("app/x.py", 0)]
+    assert offset == 7 and fuzz == 1
+    assert "LINE12\n" in path.read_text() and "line12\n" not in path.read_text()
+
+def test_failure_is_atomic_and_structured(tmp_path):
+    a = write(tmp_path, "app/a.py", "a1\na2\n")
+    b = write(tmp_path, "app/b.py", "b1\nb2\n")
+    diff = (
+        "--- a/app/a.py\n+++ b/app/a.py\n@@ -1,2 +1,2 @@\n a1\n-a2\n+A2\n"
+        "--- a/app/b.py\n+++ b/app/b.py\n@@ -1,2 +1,2 @@\n nope\n-nope2\n+B2\n"
+    )
+    result = apply_patch(diff, root=str(tmp_path), fuzz=0)
+    assert not result
+    [failure] = result.failures
+    assert failure.path == "app/b.py" and failure.hunk_index == 0
+    # the hunk that did fit was not written either
+    assert a.read_text() == "a1\na2\n" and b.read_text() == "b1\nb2\n"
+
+def test_new_and_deleted_files(tmp_path):
+    write(tmp_path, "app/old.py", "x\n")
+    diff = (
+        "diff --git a/app/new.py b/app/new.py\n"
+        "new file mode 100644\n"
+        "--- /dev/null\n+++ b/app/new.py\n@@ -0,0 +1,2 @@\n+hello\n+world\n"
+        "diff --git a/app/old.py b/app/old.py\n"
+        "deleted file mode 100644\n"
+        "--- a/app/old.py\n+++ /dev/null\n@@ -1 +0,0 @@\n-x\n"
+    )
+    result = apply_patch(diff, root=str(tmp_path))
+    assert result.ok and result.files == ["app/new.py", "app/old.py"]
+    assert (tmp_path / "app" / "new.py").read_text() == "hello\nworld\n"
+    assert not os.path.exists(tmp_path / "app" / "old.py")
+
+def test_no_newline_marker(tmp_path):
+    path = write(tmp_path, "f.txt", "a\nb")
+    diff = "--- a/f.txt\n+++ b/f.txt\n@@ -1,2 +1,2 @@\n a\n-b\n\\ No newline at end of file\n+c\n\\ No newline at end of file\n"
+    assert apply_patch(diff, root=str(tmp_path)).ok
+    assert path.read_text() == "a\nc"
+
+def test_paths_escaping_root_are_rejected(tmp_path):
+    (tmp_path / "app").mkdir()
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    os.symlink(outside, tmp_path / "app" / "link")
+    escaping = "--- a/app/../evil.py\n+++ b/app/../evil.py\n@@ -0,0 +1 @@\n+x\n"
+    absolute = "--- /tmp/evil.py\n+++ /tmp/evil.py\n@@ -0,0 +1 @@\n+x\n"
+    assert parse_patch(escaping) == [] and parse_patch(absolute, strip=0) == []
+    # a symlink under app/ must not lead the write outside it either
+    linked = "--- /dev/null\n+++ b/app/link/evil.py\n@@ -0,0 +1 @@\n+x\n"
+    result = apply_patch(linked, root=str(tmp_path), base="app")
+    assert not result and "outside" in result.failures[0].reason
+    assert not (outside / "evil.py").exists()
@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.vec_env import (
+    FAIL, PARTIAL, SUCCESS, EngineCycleExecutor, RandomCycleExecutor, StubCycleExecutor, VecSelfImproveEnv,
+)
+
+
+class FixedExecutor:
+    def __init__(self, outcomes):
+        self.outcomes = np.asarray(outcomes, dtype=np.int8)
+        self.calls = 0
+
+    def __call__(self, temperatures, pending):
+        self.calls += 1
+        return self.outcomes[:len(temperatures)], pending + 1
+
+
+def test_rewards_match_single_env_rules():
+    env = VecSelfImproveEnv(3, FixedExecutor([SUCCESS, PARTIAL, FAIL]), max_steps=2, warmup_episodes=0)
+    obs = env.reset()
+    assert obs.shape == (3, 3) and not obs.any()
+
+    obs, rewards, terminated = env.step_batch(np.full(3, 0.5))
+    assert np.allclose(rewards, -0.01) and not terminated.any()
+    assert np.allclose(obs[:, 1], 1) and np.allclose(obs[:, 2], 0.5)
+
+    obs, rewards, terminated, infos = env.step(np.full((3, 1), 0.5))
+    assert np.allclose(rewards, [1.0, 0.5, -1.0]) and terminated.all()
+    # auto-reset: fresh observations, final ones in the infos
+    assert np.allclose(obs[:, 0], 0) and np.allclose(obs[:, 2], 0)
+    assert np.allclose(infos[1]["terminal_observation"], [0.5, 2, 1.0])
+    assert infos[0]["episode"]["l"] == 2 and np.isclose(infos[0]["episode"]["r"], 0.99)
+
+
+def test_warmup_episodes_skip_cycles():
+    executor = FixedExecutor([FAIL, FAIL])
+    env = VecSelfImproveEnv(2, executor, max_steps=2, warmup_episodes=1)
+    env.reset()
+    rewards = [env.step(np.zeros(2))[1] for _ in range(2)]
+    assert executor.calls == 0
+    assert np.allclose(rewards, [[0, 0], [1, 1]])
+    env.step(np.zeros(2))
+    assert executor.calls == 1
+
+
+def test_builtin_executors():
+    outcomes, _ = StubCycleExecutor()(np.zeros(4), np.zeros(4))
+    assert (outcomes == FAIL).all()
+    outcomes, _ = RandomCycleExecutor(probs=(0, 0, 1), seed=1)(np.zeros(4), np.zeros(4))
+    assert (outcomes == SUCCESS).all()
+
+    class Agent:
+        def __init__(self):
+            self.improver = self
+            self.results = iter(['success', 'partial', False])
+        def run_cycle(self):
+            return next(self.results)
+        def count_features(self, refresh=False):
+            return 1
+
+    outcomes, pending = EngineCycleExecutor(Agent())(np.array([0.1, 0.2, 0.3]), np.zeros(3))
+    assert list(outcomes) == [SUCCESS, PARTIAL, FAIL] and list(pending) == [1, 1, 1]
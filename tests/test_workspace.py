@@ -0,0 +1,51 @@
+import os
+from app import workspace as ws_module
+from app.workspace import WorkspaceManager
+
+def make_project(tmp_path):
+    (tmp_path / "app").mkdir()
+    (tmp_path / "app" / "mod.py").write_text("VALUE = 1\n")
+    (tmp_path / "tests").mkdir()
+    (tmp_path / "tests" / "test_x.py").write_text("def test_x():\n    pass\n")
+    return WorkspaceManager(str(tmp_path / "app"))
+
+def test_workspace_is_linked_clone_with_project_files(tmp_path):
+    manager = make_project(tmp_path)
+    ws = manager.create()
+    clone = os.path.join(ws.src_dir, "mod.py")
+    assert os.path.samefile(clone, tmp_path / "app" / "mod.py")
+    assert os.path.islink(os.path.join(ws.root, "tests"))
+
+    # replacing the file in the workspace leaves the live tree alone
+    tmp = clone + ".tmp"
+    with open(tmp, "w") as f:
+        f.write("VALUE = 2\n")
+    os.replace(tmp, clone)
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 1\n"
+    ws.discard()
+    assert not os.path.exists(ws.root)
+
+def test_promote_swaps_tree(tmp_path):
+    manager = make_project(tmp_path)
+    ws = manager.create()
+    with open(os.path.join(ws.src_dir, "new.py"), "w") as f:
+        f.write("NEW = True\n")
+    manager.promote(ws)
+    assert (tmp_path / "app" / "new.py").exists()
+    assert not os.path.exists(ws.root)
+
+def test_promote_without_renameat2_and_recovery(tmp_path, monkeypatch):
+    monkeypatch.setattr(ws_module, "_exchange", lambda a, b: False)
+    manager = make_project(tmp_path)
+    ws = manager.create()
+    (tmp_path / "app" / "mod.py").write_text("VALUE = 1\n")
+    manager.promote(ws)
+    assert (tmp_path / "app" / "mod.py").read_text() == "VALUE = 1\n"
+
+    # simulate a crash between the two renames: live tree only in retired-*
+    retired = tmp_path / ".workspaces" / "retired-crash"
+    retired.mkdir()
+    os.rename(tmp_path / "app", retired / "app")
+    WorkspaceManager(str(tmp_path / "app"))
+    assert (tmp_path / "app" / "mod.py").exists()
+    assert not retired.exists()
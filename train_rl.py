@@ -1,8 +1,8 @@
 from stable_baselines3 import PPO
 from app.self_improve_env import SelfImproveEnv
-from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.vec_env import DummyVecEnv
 from app.agent import Agent
+from app.episode_log import EPISODE_LOG_DIR, EpisodeMonitor
 import os
 
 def main():
@@ -11,9 +11,9 @@ def main():
     # Set up a logs folder
     log_dir = "logs"
     os.makedirs(log_dir, exist_ok=True)
-    # Wrap with Monitor to auto‐record episode reward to logs/monitor.csv
+    # Wrap with EpisodeMonitor to auto‐record episode reward to logs/episodes/
     raw_env = SelfImproveEnv(agent=agent, use_real_llm=False, max_steps=50, warmup_episodes=5)
-    mon_env = Monitor(raw_env, log_dir, allow_early_resets=True)
+    mon_env = EpisodeMonitor(raw_env, EPISODE_LOG_DIR)
     env = DummyVecEnv([lambda: mon_env])
     model = PPO(
         "MlpPolicy",